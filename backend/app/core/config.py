@@ -0,0 +1,164 @@
+# Archivo: backend/app/core/config.py
+import os
+
+# Directorio de la caché persistente (docker-compose monta el volumen en /app/.cache)
+CACHE_DIR = os.getenv("QUANTDESK_CACHE_DIR", ".cache")
+
+# --- CACHÉ DE DATOS DE MERCADO ---
+# Entradas máximas en la LRU en memoria (por delante de diskcache)
+CACHE_MEMORY_ITEMS = int(os.getenv("QUANTDESK_CACHE_MEMORY_ITEMS", "2048"))
+# Límite de tamaño del store en disco (bytes)
+CACHE_DISK_SIZE_LIMIT = int(os.getenv("QUANTDESK_CACHE_DISK_SIZE_LIMIT", str(2 * 1024 ** 3)))
+# Las cadenas agregadas van a un store columnar en mmap compartido por todos los procesos
+# (ContractStore) en vez de a diskcache: contratos por arena antes de compactarla (0 = desactivado)
+CONTRACT_STORE_ROWS = int(os.getenv("QUANTDESK_CONTRACT_STORE_ROWS", str(4_000_000)))
+
+# TTLs (segundos). El histórico diario caduca en el próximo cierre de sesión.
+CACHE_TTL_SPOT = float(os.getenv("QUANTDESK_CACHE_TTL_SPOT", "15"))
+CACHE_TTL_CHAIN = float(os.getenv("QUANTDESK_CACHE_TTL_CHAIN", "300"))
+CACHE_TTL_UNIVERSE = float(os.getenv("QUANTDESK_CACHE_TTL_UNIVERSE", "86400"))
+
+# Ventana durante la que un valor caducado se sirve mientras se refresca en segundo plano
+CACHE_STALE_SPOT = float(os.getenv("QUANTDESK_CACHE_STALE_SPOT", "300"))
+CACHE_STALE_CHAIN = float(os.getenv("QUANTDESK_CACHE_STALE_CHAIN", "1800"))
+CACHE_STALE_HISTORY = float(os.getenv("QUANTDESK_CACHE_STALE_HISTORY", str(3 * 86400)))
+CACHE_STALE_UNIVERSE = float(os.getenv("QUANTDESK_CACHE_STALE_UNIVERSE", str(7 * 86400)))
+
+# Hilos dedicados a refrescos en segundo plano
+CACHE_REFRESH_WORKERS = int(os.getenv("QUANTDESK_CACHE_REFRESH_WORKERS", "4"))
+
+# --- RESPUESTAS HTTP ---
+# Respuestas renderizadas (por ticker y versión de los datos) guardadas en memoria
+RESPONSE_CACHE_ITEMS = int(os.getenv("QUANTDESK_RESPONSE_CACHE_ITEMS", "256"))
+RESPONSE_CACHE_TTL = float(os.getenv("QUANTDESK_RESPONSE_CACHE_TTL", "60"))
+# Tamaño (bytes) a partir del cual se comprime con gzip
+HTTP_GZIP_MIN_SIZE = int(os.getenv("QUANTDESK_HTTP_GZIP_MIN_SIZE", "1024"))
+
+# --- OBSERVABILIDAD ---
+# Nivel (DEBUG muestra el detalle por ticker del scanner) y formato de los logs: "text" o "json"
+LOG_LEVEL = os.getenv("QUANTDESK_LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("QUANTDESK_LOG_FORMAT", "text")
+# Profiler de muestreo para peticiones lentas: umbral en ms (0 = desactivado), fracción
+# de peticiones muestreadas, intervalo entre muestras (s) y carpeta de los perfiles
+PROFILE_SLOW_MS = float(os.getenv("QUANTDESK_PROFILE_SLOW_MS", "0"))
+PROFILE_SAMPLE_RATE = float(os.getenv("QUANTDESK_PROFILE_SAMPLE_RATE", "1"))
+PROFILE_INTERVAL = float(os.getenv("QUANTDESK_PROFILE_INTERVAL", "0.005"))
+PROFILE_DIR = os.getenv("QUANTDESK_PROFILE_DIR", os.path.join(CACHE_DIR, "profiles"))
+
+# --- UNIVERSO S&P 500 ---
+# Snapshot local versionado (se refresca en segundo plano cada CACHE_TTL_UNIVERSE s)
+UNIVERSE_PATH = os.getenv("QUANTDESK_UNIVERSE_PATH", os.path.join(CACHE_DIR, "universe.json"))
+# Una descarga con menos tickers se considera rota y no sustituye al snapshot
+UNIVERSE_MIN_SIZE = int(os.getenv("QUANTDESK_UNIVERSE_MIN_SIZE", "400"))
+# Espera (s) antes de reintentar un refresco fallido
+UNIVERSE_RETRY = float(os.getenv("QUANTDESK_UNIVERSE_RETRY", "600"))
+
+# --- CADENAS DE OPCIONES ---
+# Presupuesto de descargas de vencimientos en paralelo (compartido por todos los tickers)
+CHAIN_FETCH_WORKERS = int(os.getenv("QUANTDESK_CHAIN_FETCH_WORKERS", "8"))
+# Ventana de DTE por defecto (coincide con ScannerConfig.max_dte)
+DEFAULT_MAX_DTE = int(os.getenv("QUANTDESK_DEFAULT_MAX_DTE", "45"))
+
+# --- ORIGEN DE LOS DATOS DE MERCADO ---
+# "yahoo" (real) o "replay" (snapshot grabado con python -m app.services.replay record)
+MARKET_DATA = os.getenv("QUANTDESK_MARKET_DATA", "yahoo")
+REPLAY_DIR = os.getenv("QUANTDESK_REPLAY_DIR", os.path.join(CACHE_DIR, "replay"))
+# Latencia simulada por llamada: mediana (s) y dispersión log-normal (0 = fija)
+REPLAY_LATENCY = float(os.getenv("QUANTDESK_REPLAY_LATENCY", "0.05"))
+REPLAY_JITTER = float(os.getenv("QUANTDESK_REPLAY_JITTER", "0.5"))
+# Probabilidad de que una llamada falle con un 429 simulado; semilla de latencias y errores
+REPLAY_ERROR_RATE = float(os.getenv("QUANTDESK_REPLAY_ERROR_RATE", "0"))
+REPLAY_SEED = int(os.getenv("QUANTDESK_REPLAY_SEED", "0"))
+
+# --- UPSTREAM HTTP (proveedor asíncrono) ---
+YAHOO_BASE_URL = os.getenv("QUANTDESK_YAHOO_BASE_URL", "https://query2.finance.yahoo.com")
+# Página que entrega la cookie necesaria para obtener el crumb ("" para omitirla)
+YAHOO_COOKIE_URL = os.getenv("QUANTDESK_YAHOO_COOKIE_URL", "https://fc.yahoo.com")
+SP500_CSV_URL = os.getenv("QUANTDESK_SP500_CSV_URL",
+                          "https://raw.githubusercontent.com/datasets/s-and-p-500-companies/master/data/constituents.csv")
+# Conexiones keep-alive del pool y peticiones simultáneas en vuelo contra el upstream
+HTTP_MAX_CONNECTIONS = int(os.getenv("QUANTDESK_HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_IN_FLIGHT = int(os.getenv("QUANTDESK_HTTP_MAX_IN_FLIGHT", "64"))
+HTTP_TIMEOUT = float(os.getenv("QUANTDESK_HTTP_TIMEOUT", "10"))
+HTTP_USER_AGENT = os.getenv("QUANTDESK_HTTP_USER_AGENT",
+                            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36")
+
+# --- GOVERNOR DEL UPSTREAM (tasa, concurrencia adaptativa y reintentos) ---
+# Token bucket: peticiones/s sostenidas y ráfaga máxima
+UPSTREAM_RATE = float(os.getenv("QUANTDESK_UPSTREAM_RATE", "20"))
+UPSTREAM_BURST = float(os.getenv("QUANTDESK_UPSTREAM_BURST", "40"))
+# Límite AIMD de peticiones simultáneas: arranque, suelo y techo
+UPSTREAM_CONCURRENCY_INITIAL = int(os.getenv("QUANTDESK_UPSTREAM_CONCURRENCY_INITIAL", "8"))
+UPSTREAM_CONCURRENCY_MIN = int(os.getenv("QUANTDESK_UPSTREAM_CONCURRENCY_MIN", "2"))
+UPSTREAM_CONCURRENCY_MAX = int(os.getenv("QUANTDESK_UPSTREAM_CONCURRENCY_MAX", "32"))
+# Latencia (s) a partir de la cual una respuesta cuenta como señal de saturación
+UPSTREAM_LATENCY_TARGET = float(os.getenv("QUANTDESK_UPSTREAM_LATENCY_TARGET", "4"))
+# Reintentos ante 429/5xx/timeouts, con backoff exponencial con jitter (s)
+UPSTREAM_RETRIES = int(os.getenv("QUANTDESK_UPSTREAM_RETRIES", "4"))
+UPSTREAM_BACKOFF_BASE = float(os.getenv("QUANTDESK_UPSTREAM_BACKOFF_BASE", "0.5"))
+UPSTREAM_BACKOFF_MAX = float(os.getenv("QUANTDESK_UPSTREAM_BACKOFF_MAX", "20"))
+# Parte de la concurrencia/ráfaga que pueden usar escaneos y refrescos en segundo plano
+# mientras haya peticiones interactivas (páginas de activo) en curso
+UPSTREAM_BACKGROUND_SHARE = float(os.getenv("QUANTDESK_UPSTREAM_BACKGROUND_SHARE", "0.5"))
+# Segundos que una petición interactiva mantiene cedido el upstream en todos los procesos
+UPSTREAM_INTERACTIVE_WINDOW = float(os.getenv("QUANTDESK_UPSTREAM_INTERACTIVE_WINDOW", "3"))
+UPSTREAM_BEACON_PATH = os.getenv("QUANTDESK_UPSTREAM_BEACON_PATH", os.path.join(CACHE_DIR, "interactive.beacon"))
+# Si el upstream sigue fallando: servir datos simulados (marcados como mock) o vacío
+ALLOW_MOCK_DATA = os.getenv("QUANTDESK_ALLOW_MOCK_DATA", "1") == "1"
+
+# --- GEX ---
+# Malla gruesa y tolerancia (en unidades de precio) del solver del gamma flip
+GEX_FLIP_GRID_POINTS = int(os.getenv("QUANTDESK_GEX_FLIP_GRID_POINTS", "200"))
+GEX_FLIP_TOL = float(os.getenv("QUANTDESK_GEX_FLIP_TOL", "0.001"))
+# Precisión del kernel de griegas: "float64" o "float32" (mitad de memoria y ancho de banda)
+GREEKS_DTYPE = os.getenv("QUANTDESK_GREEKS_DTYPE", "float64")
+# IV de los contratos: "solve" la invierte desde el precio (mid o último) y sólo usa la de
+# Yahoo donde no converge; "yahoo" se fía de la columna impliedVolatility tal cual
+IV_SOURCE = os.getenv("QUANTDESK_IV_SOURCE", "solve")
+# Escenarios (/asset/{ticker}/scenarios): cadenas ya convertidas a arrays (K, T, IV, OI, signo)
+# que se guardan en memoria, precisión del kernel y tamaño máximo de la malla (días × IV × spots)
+CONTRACT_ARRAYS_ITEMS = int(os.getenv("QUANTDESK_CONTRACT_ARRAYS_ITEMS", "64"))
+SCENARIO_DTYPE = os.getenv("QUANTDESK_SCENARIO_DTYPE", "float32")
+SCENARIO_MAX_POINTS = int(os.getenv("QUANTDESK_SCENARIO_MAX_POINTS", "20000"))
+
+# --- HISTÓRICO OHLCV EN DISCO ---
+HISTORY_DIR = os.getenv("QUANTDESK_HISTORY_DIR", os.path.join(CACHE_DIR, "history"))
+# Profundidad de la primera descarga de cada ticker (periodos mayores no se sirven del store)
+HISTORY_BACKFILL = os.getenv("QUANTDESK_HISTORY_BACKFILL", "5y")
+
+# --- HISTÓRICO DE GEX ---
+GEX_HISTORY_DIR = os.getenv("QUANTDESK_GEX_HISTORY_DIR", os.path.join(CACHE_DIR, "gex_history"))
+# Tickers que fotografía python -m app.services.gex_snapshots y cada cuánto (s), en sesión
+GEX_WATCHLIST = [t.strip().upper() for t in os.getenv("QUANTDESK_GEX_WATCHLIST", "SPY,QQQ,IWM").split(",") if t.strip()]
+GEX_SNAPSHOT_INTERVAL = float(os.getenv("QUANTDESK_GEX_SNAPSHOT_INTERVAL", "900"))
+# Rango por defecto (días hacia atrás) de /asset/{ticker}/gex/history
+GEX_HISTORY_DEFAULT_DAYS = int(os.getenv("QUANTDESK_GEX_HISTORY_DEFAULT_DAYS", "30"))
+
+# --- SCANNER ---
+# Tickers por petición de histórico masivo
+HISTORY_BATCH_SIZE = int(os.getenv("QUANTDESK_HISTORY_BATCH_SIZE", "100"))
+# Tickers por petición al endpoint spark de Yahoo (cierres diarios de varios símbolos en una
+# sola llamada; Yahoo no admite más de 20)
+HISTORY_SPARK_SYMBOLS = int(os.getenv("QUANTDESK_HISTORY_SPARK_SYMBOLS", "20"))
+# Hilos de análisis por ticker (opciones) durante un escaneo
+SCAN_WORKERS = int(os.getenv("QUANTDESK_SCAN_WORKERS", "5"))
+# Registro de escaneos: máximo de tareas guardadas, vida de los resultados (s) y franja
+# (s) dentro de la cual un escaneo con la misma config reutiliza el ya terminado
+SCAN_REGISTRY_MAX = int(os.getenv("QUANTDESK_SCAN_REGISTRY_MAX", "32"))
+SCAN_RESULT_TTL = float(os.getenv("QUANTDESK_SCAN_RESULT_TTL", "1800"))
+SCAN_DEDUP_WINDOW = float(os.getenv("QUANTDESK_SCAN_DEDUP_WINDOW", "60"))
+# Dónde se ejecutan los escaneos: "queue" (cola SQLite + procesos worker, sirve con
+# varios workers de uvicorn o varios contenedores) o "inline" (event loop de la API)
+SCAN_BACKEND = os.getenv("QUANTDESK_SCAN_BACKEND", "queue")
+SCAN_QUEUE_PATH = os.getenv("QUANTDESK_SCAN_QUEUE_PATH", os.path.join(CACHE_DIR, "scan_queue.db"))
+# Workers que arranca la propia API (0 si se lanzan aparte con python -m app.services.scan_worker)
+SCAN_LOCAL_WORKERS = int(os.getenv("QUANTDESK_SCAN_LOCAL_WORKERS", "1"))
+# Un trabajo sin latido durante SCAN_JOB_LEASE s se da por perdido; espera entre sondeos de la cola
+SCAN_JOB_LEASE = float(os.getenv("QUANTDESK_SCAN_JOB_LEASE", "60"))
+SCAN_WORKER_POLL = float(os.getenv("QUANTDESK_SCAN_WORKER_POLL", "0.5"))
+
+# Apertura y cierre de sesión del mercado americano
+MARKET_TZ = "America/New_York"
+MARKET_OPEN_HOUR = 9
+MARKET_OPEN_MINUTE = 30
+MARKET_CLOSE_HOUR = 16
@@ -0,0 +1,90 @@
+# Archivo: backend/app/core/cross_section.py
+import numpy as np
+import pandas as pd
+
+# Columnas de tendencia/volatilidad que produce la etapa transversal del scanner
+METRIC_COLUMNS = ["Price", "SMA20_val", "SMA50_val", "Dist SMA20 %", "Dist SMA50 %", "RV", "Bars"]
+
+
+def rolling_mean(x, window):
+    """
+    Media móvil por suma acumulada a lo largo del último eje (tickers × fechas).
+    Ventanas con algún NaN (histórico más corto, huecos) quedan a NaN.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    valid = ~np.isnan(x)
+    pad = [(0, 0)] * (x.ndim - 1) + [(1, 0)]
+    cs = np.pad(np.cumsum(np.where(valid, x, 0.0), axis=-1), pad)
+    cnt = np.pad(np.cumsum(valid, axis=-1), pad)
+    s = cs[..., window:] - cs[..., :-window]
+    n = cnt[..., window:] - cnt[..., :-window]
+    out = np.full(x.shape, np.nan)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        out[..., window - 1:] = np.where(n == window, s / window, np.nan)
+    return out
+
+
+def last_valid(x):
+    """Último valor no-NaN de cada fila (NaN si la fila está vacía) y su posición."""
+    x = np.asarray(x, dtype=np.float64)
+    valid = ~np.isnan(x)
+    idx = x.shape[-1] - 1 - np.argmax(valid[..., ::-1], axis=-1)
+    vals = np.take_along_axis(x, idx[..., np.newaxis], axis=-1)[..., 0]
+    return np.where(valid.any(axis=-1), vals, np.nan), idx
+
+
+def trend_vol_metrics(close, lookback, min_bars=50):
+    """
+    Métricas de tendencia y volatilidad para todo el universo en unas pocas operaciones:
+    close es un array 2-D alineado (tickers × fechas) con NaN donde no hay vela.
+    - Price: último cierre válido; SMA20/SMA50 en esa misma fecha (suma acumulada)
+    - RV: desviación típica (ddof=1) de los últimos `lookback` log-retornos, anualizada en %
+    Retorna un dict de arrays 1-D por ticker más la máscara 'valid' (>= min_bars velas).
+    """
+    close = np.atleast_2d(np.asarray(close, dtype=np.float64))
+    price, last = last_valid(close)
+    rows = np.arange(close.shape[0])
+    sma20 = rolling_mean(close, 20)[rows, last]
+    sma50 = rolling_mean(close, 50)[rows, last]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        log_ret = np.log(close[:, 1:] / close[:, :-1])
+        # Últimos `lookback` retornos de cada fila (los NaN del principio no cuentan)
+        cols = np.arange(log_ret.shape[1])
+        window = (cols > last[:, np.newaxis] - 1 - lookback) & (cols <= last[:, np.newaxis] - 1)
+        r = np.where(window & ~np.isnan(log_ret), log_ret, np.nan)
+        n = np.sum(~np.isnan(r), axis=1)
+        mean = np.nansum(r, axis=1) / n
+        var = np.nansum((r - mean[:, np.newaxis]) ** 2, axis=1) / (n - 1)
+        rv = np.where(n > 1, np.sqrt(var) * np.sqrt(252) * 100, 0.0)
+
+        dist20 = np.where(sma20 != 0, (price - sma20) / sma20 * 100, 0.0)
+        dist50 = np.where(sma50 != 0, (price - sma50) / sma50 * 100, 0.0)
+
+    bars = np.sum(~np.isnan(close), axis=1)
+    return {
+        "Price": price,
+        "SMA20_val": np.where(np.isnan(sma20), price, sma20),
+        "SMA50_val": np.where(np.isnan(sma50), price, sma50),
+        "Dist SMA20 %": dist20,
+        "Dist SMA50 %": dist50,
+        "RV": rv,
+        "Bars": bars,
+        "valid": (bars >= min_bars) & ~np.isnan(price),
+    }
+
+
+def close_matrix(panel: pd.DataFrame, field: str = "Close"):
+    """Panel ancho (Ticker, campo) -> (tickers, array 2-D tickers × fechas)."""
+    if panel is None or panel.empty: return [], np.empty((0, 0))
+    close = panel.xs(field, axis=1, level=1)
+    return list(close.columns), close.to_numpy(dtype=np.float64).T
+
+
+def metrics_table(tickers, close, lookback, min_bars=50) -> pd.DataFrame:
+    """Tabla columnar (una fila por ticker válido) con las METRIC_COLUMNS."""
+    m = trend_vol_metrics(close, lookback, min_bars)
+    valid = m.pop("valid")
+    table = pd.DataFrame({c: m[c][valid] for c in METRIC_COLUMNS},
+                         index=pd.Index(np.asarray(tickers, dtype=object)[valid], name="Ticker"))
+    return table
@@ -1,6 +1,38 @@
 # Archivo: backend/app/core/engine.py
 import numpy as np
-from scipy.stats import norm
+from scipy.special import ndtr
+from scipy.optimize import brentq
+
+from app.core.metrics import stage
+
+INV_SQRT_2PI = 1.0 / np.sqrt(2.0 * np.pi)
+GREEK_FIELDS = ("delta", "gamma", "vega", "vanna", "charm")
+# erfc(x) ≈ poly(1/(1 + p·x))·exp(-x²), x >= 0 (Abramowitz-Stegun 7.1.26)
+_AS_P = 0.3275911
+_AS_A = (0.254829592, -0.284496736, 1.421413741, -1.453152027, 1.061405429)
+
+
+class GreeksBuffer:
+    """
+    Buffers de salida preasignados para BlackScholes.greeks (uno por hilo).
+    Crece bajo demanda y retorna vistas [:n], así que no asigna memoria en cada cadena.
+    """
+    def __init__(self, capacity=0, dtype=np.float64):
+        self.dtype = np.dtype(dtype)
+        self._capacity = 0
+        self._arrays = {}
+        self.reserve(capacity)
+
+    def reserve(self, n):
+        if n <= self._capacity: return
+        n = max(n, int(self._capacity * 1.5))
+        self._arrays = {f: np.empty(n, dtype=self.dtype) for f in GREEK_FIELDS + ("_d1", "_d2", "_pdf", "_tmp")}
+        self._capacity = n
+
+    def views(self, n):
+        self.reserve(n)
+        return {f: a[:n] for f, a in self._arrays.items()}
+
 
 class BlackScholes:
     @staticmethod
@@ -13,11 +45,358 @@ class BlackScholes:
             T = np.maximum(T, 1e-4)
             
             # Evitamos errores con inputs inválidos
-            with np.errstate(divide='ignore', invalid='ignore'):
-                d1 = (np.log(S / K) + (r + 0.5 * sigma ** 2) * T) / (sigma * np.sqrt(T))
-                gamma = norm.pdf(d1) / (S * sigma * np.sqrt(T))
+            with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+                sig_sqrt_t = sigma * np.sqrt(T)
+                d1 = (np.log(S / K) + (r + 0.5 * sigma ** 2) * T) / sig_sqrt_t
+                # φ(d1) directo: norm.pdf tiene mucho overhead por llamada
+                gamma = np.exp(-0.5 * d1 * d1) * INV_SQRT_2PI / (S * sig_sqrt_t)
             
-            # Limpiamos resultados NaN o infinitos que puedan surgir
-            return np.nan_to_num(gamma, nan=0.0, posinf=0.0, neginf=0.0)
+            # Limpiamos resultados NaN o infinitos que puedan surgir (sólo si los hay)
+            gamma = np.asarray(gamma, dtype=np.float64)
+            if gamma.ndim == 0: return float(gamma) if np.isfinite(gamma) else 0.0
+            bad = ~np.isfinite(gamma)
+            if bad.any(): gamma[bad] = 0.0
+            return gamma
         except Exception:
-            return 0.0
\ No newline at end of file
+            return 0.0
+
+    @staticmethod
+    def greeks(S, K, T, r, sigma, is_call, dtype=np.float64, out: GreeksBuffer = None):
+        """
+        Kernel fusionado: d1/d2 y φ(d1) se calculan una sola vez y de ahí salen
+        delta, gamma, vega, vanna y charm (sin dividendos). S puede ser escalar.
+        Vega por 1.00 de vol; charm en unidades de delta por año.
+        dtype=np.float32 reduce a la mitad memoria y ancho de banda; con out se reutilizan
+        los buffers (las vistas retornadas se sobreescriben en la siguiente llamada).
+        Valores no finitos (inputs inválidos) se retornan como 0.
+        """
+        dtype = np.dtype(dtype)
+        K = np.asarray(K, dtype=dtype); sigma = np.asarray(sigma, dtype=dtype)
+        T = np.maximum(np.asarray(T, dtype=dtype), dtype.type(1e-4))
+        is_call = np.asarray(is_call, dtype=bool)
+        n = K.shape[0]
+        buf = (out if out is not None and out.dtype == dtype else GreeksBuffer(dtype=dtype)).views(n)
+        d1, d2, pdf, tmp = buf["_d1"], buf["_d2"], buf["_pdf"], buf["_tmp"]
+        S = dtype.type(S); r = dtype.type(r)
+
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            sqrt_t = np.sqrt(T)
+            sig_sqrt_t = np.multiply(sigma, sqrt_t, out=tmp)
+            # d1 = (ln(S/K) + (r + σ²/2)T) / σ√T ; d2 = d1 - σ√T
+            np.divide(S, K, out=d1); np.log(d1, out=d1)
+            d1 += (r + 0.5 * sigma * sigma) * T
+            d1 /= sig_sqrt_t
+            np.subtract(d1, sig_sqrt_t, out=d2)
+            np.multiply(d1, d1, out=pdf); pdf *= -0.5; np.exp(pdf, out=pdf); pdf *= INV_SQRT_2PI
+
+            delta = buf["delta"]
+            delta[:] = ndtr(d1)
+            delta[~is_call] -= 1.0
+            gamma = np.divide(pdf, S * sig_sqrt_t, out=buf["gamma"])
+            vega = np.multiply(pdf, S * sqrt_t, out=buf["vega"])
+            vanna = np.multiply(pdf, d2, out=buf["vanna"]); np.divide(vanna, sigma, out=vanna); vanna *= -1.0
+            # charm (q=0, igual para call y put): -φ(d1)·(2rT - d2·σ√T) / (2T·σ√T)
+            charm = buf["charm"]
+            np.multiply(d2, sig_sqrt_t, out=charm)
+            np.subtract(2.0 * r * T, charm, out=charm)
+            charm *= pdf
+            charm /= (2.0 * T) * sig_sqrt_t
+            charm *= -1.0
+
+        result = {f: buf[f] for f in GREEK_FIELDS}
+        for v in result.values():
+            bad = ~np.isfinite(v)
+            if bad.any(): v[bad] = 0.0
+        return result
+
+
+    @staticmethod
+    def price(S, K, T, r, sigma, is_call):
+        """Prima Black-Scholes (sin dividendos), vectorizada."""
+        K = np.asarray(K, dtype=np.float64); sigma = np.asarray(sigma, dtype=np.float64)
+        T = np.maximum(np.asarray(T, dtype=np.float64), 1e-4)
+        sig_sqrt_t = sigma * np.sqrt(T)
+        d1 = (np.log(S / K) + (r + 0.5 * sigma * sigma) * T) / sig_sqrt_t
+        X = K * np.exp(-r * T)
+        call = S * ndtr(d1) - X * ndtr(d1 - sig_sqrt_t)
+        return np.where(is_call, call, call - S + X)
+
+    @staticmethod
+    def implied_vol(price, S, K, T, r, is_call, tol=1e-6, max_iter=16, lo=1e-4, hi=5.0, min_time_value=1e-4):
+        """
+        IV de una cadena entera a la vez. Retorna (iv, converged): iv es NaN donde no hay
+        solución o no converge. Sin solución: precio fuera de los límites de arbitraje o
+        valor temporal por debajo de min_time_value (la prima ya no dice nada de la vol).
+
+        Las puts se pasan a call por paridad (C = P + S - K·e^(-rT)), así que hay una sola
+        fórmula. Punto de partida de Corrado-Miller y pasos de Halley vectorizados dentro de
+        un intervalo [lo, hi] que se estrecha en cada iteración; si el paso sale del
+        intervalo (vega ~ 0 en las alas) se biseca. Los contratos ya resueltos salen del
+        conjunto activo, así que las iteraciones finales sólo tocan a los rezagados.
+        Convergencia: |precio modelo - precio| <= tol·valor temporal, o intervalo colapsado.
+        """
+        price = np.asarray(price, dtype=np.float64)
+        K = np.asarray(K, dtype=np.float64)
+        T = np.maximum(np.asarray(T, dtype=np.float64), 1e-4)
+        S = np.broadcast_to(np.asarray(S, dtype=np.float64), K.shape)
+        X = K * np.exp(-r * T)
+        c = np.where(is_call, price, price + S - X)
+        iv = np.full(K.shape, np.nan)
+        converged = np.zeros(K.shape, dtype=bool)
+
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            time_value = c - np.maximum(S - X, 0.0)
+            valid = (K > 0) & (price > 0) & np.isfinite(c) & (time_value > min_time_value) & (c < S)
+            idx = np.flatnonzero(valid)
+            S, K, T, X, c = S[idx], K[idx], T[idx], X[idx], c[idx]
+            sqrt_t = np.sqrt(T)
+            log_sk = np.log(S / K)
+            # Corrado-Miller: σ√T ≈ √(2π)/(S+X)·[m + √(m² - (S-X)²/π)], m = C - (S-X)/2
+            m = c - 0.5 * (S - X)
+            guess = np.sqrt(2 * np.pi) / (S + X) * (m + np.sqrt(np.maximum(m * m - (S - X) ** 2 / np.pi, 0.0))) / sqrt_t
+            sigma = np.clip(np.where(np.isfinite(guess) & (guess > 0), guess, 0.3), lo * 2, hi / 2)
+            low = np.full(idx.size, lo); high = np.full(idx.size, hi)
+            # Suelo de 1e-12·S: por debajo el redondeo de S·N(d1) - X·N(d2) ya no deja ver la diferencia
+            atol = np.maximum(tol * time_value[idx], 1e-12 * S)
+
+            for _ in range(max_iter):
+                if idx.size == 0: break
+                sig_sqrt_t = sigma * sqrt_t
+                d1 = (log_sk + (r + 0.5 * sigma * sigma) * T) / sig_sqrt_t
+                d2 = d1 - sig_sqrt_t
+                diff = S * ndtr(d1) - X * ndtr(d2) - c
+                done = (np.abs(diff) <= atol) | (high - low <= 1e-10 * sigma)
+                iv[idx[done]] = sigma[done]
+                converged[idx[done]] = True
+
+                high = np.where(diff > 0, sigma, high); low = np.where(diff < 0, sigma, low)
+                vega = S * np.exp(-0.5 * d1 * d1) * INV_SQRT_2PI * sqrt_t
+                # Halley: Δ = (f/f') / (1 - f·f''/(2f'²)), con f''/f' = vomma/vega = d1·d2/σ
+                newton = diff / vega
+                step = newton / (1.0 - 0.5 * newton * d1 * d2 / sigma)
+                nxt = sigma - step
+                bisect = ~np.isfinite(nxt) | (nxt <= low) | (nxt >= high)
+                nxt = np.where(bisect, 0.5 * (low + high), nxt)
+
+                keep = ~done
+                idx, sigma, low, high = idx[keep], nxt[keep], low[keep], high[keep]
+                S, K, T, X, c, sqrt_t, log_sk, atol = (a[keep] for a in (S, K, T, X, c, sqrt_t, log_sk, atol))
+        return iv, converged
+
+class GammaFlipSolver:
+    """
+    Gamma flip por búsqueda de raíces, con memoria acotada.
+
+    El gamma neto en dólares Σ gamma·OI·sign·S·100 no depende de S salvo por d1:
+    f(S) = Σ c_i · φ((ln S - a_i) / b_i), con c_i = OI·sign·100/(σ√T), a_i = ln K - (r + σ²/2)T
+    y b_i = σ√T. Esos términos se precalculan una vez (ya escalados: φ ∝ exp(-(q·ln S - a·q)²)
+    con q = 1/(b√2)); la malla gruesa se evalúa por bloques de contratos de unos
+    block_elements puntos × contratos (caben en la caché L2), operando en sitio sobre un
+    único buffer, y cada cambio de signo se refina con Brent hasta la tolerancia pedida
+    (con un solo spot, el bloque es la cadena entera).
+    """
+    def __init__(self, K, T, iv, oi, sign, r=0.045, block_elements=1 << 17):
+        T = np.maximum(np.asarray(T, dtype=np.float64), 1e-4)
+        iv = np.asarray(iv, dtype=np.float64)
+        b = iv * np.sqrt(T)
+        a = np.log(np.asarray(K, dtype=np.float64)) - (r + 0.5 * iv ** 2) * T
+        self.c = np.asarray(oi, dtype=np.float64) * np.asarray(sign, dtype=np.float64) * 100 / (b * np.sqrt(2 * np.pi))
+        self.q = np.sqrt(0.5) / b
+        self.aq = a * self.q
+        self.block_elements = block_elements
+
+    def net_gamma(self, spots):
+        """Gamma neto (dólares) para un array de spots."""
+        log_s = np.log(np.atleast_1d(np.asarray(spots, dtype=np.float64)))
+        out = np.zeros(log_s.shape[0])
+        step = max(1, min(self.block_elements // log_s.shape[0], self.c.size))
+        buf = np.empty((log_s.shape[0], step))
+        for i in range(0, self.c.size, step):
+            j = min(i + step, self.c.size)
+            u = buf[:, :j - i]
+            np.multiply(log_s[:, np.newaxis], self.q[i:j], out=u)
+            u -= self.aq[i:j]
+            np.square(u, out=u); np.negative(u, out=u); np.exp(u, out=u)
+            out += u @ self.c[i:j]
+        return out
+
+    def solve(self, spot, lo=0.7, hi=1.3, grid_points=200, tol=1e-3, all_roots=False):
+        """
+        Retorna el flip más cercano a spot (o la lista de todos si all_roots=True).
+        Sin cruce en el rango se retorna el punto de la malla con |gamma neto| mínimo.
+        """
+        grid = np.linspace(spot * lo, spot * hi, grid_points)
+        values = self.net_gamma(grid)
+        # Por debajo del ruido de redondeo (cadenas casi simétricas) el signo no significa nada
+        values[np.abs(values) <= np.abs(values).max() * 1e-12] = 0.0
+        crosses = np.where(np.sign(values[:-1]) * np.sign(values[1:]) < 0)[0]
+        exact = grid[values == 0]
+
+        if len(crosses) == 0 and len(exact) == 0:
+            best = float(grid[np.abs(values).argmin()])
+            return [best] if all_roots else best
+
+        f = lambda x: float(self.net_gamma(x)[0])
+
+        def refine(i):
+            try:
+                return brentq(f, grid[i], grid[i + 1], xtol=tol)
+            except ValueError:
+                # La evaluación escalar no reproduce el cambio de signo de la malla: interpolación lineal
+                return grid[i] - values[i] * (grid[i + 1] - grid[i]) / (values[i + 1] - values[i])
+
+        if not all_roots:
+            roots = list(exact)
+            if len(crosses):
+                i = crosses[np.abs((grid[crosses] + grid[crosses + 1]) / 2 - spot).argmin()]
+                roots.append(refine(i))
+            return float(min(roots, key=lambda x: abs(x - spot)))
+
+        roots = [refine(i) for i in crosses] + list(exact)
+        return sorted(float(x) for x in roots)
+
+
+class GexEngine:
+    @staticmethod
+    def aggregate_by_strike(K, values):
+        """
+        Agrupa por strike con ordenación + bincount (sin groupby de pandas).
+        values: lista de arrays alineados con K. Retorna (strikes únicos, [sumas]).
+        """
+        strikes, inv = np.unique(K, return_inverse=True)
+        return strikes, [np.bincount(inv, weights=v, minlength=len(strikes)) for v in values]
+
+    @staticmethod
+    def compute(spot, K, T, iv, oi, sign, r=0.045, band=(0.4, 1.6), flip_range=(0.7, 1.3),
+                flip_points=200, flip_tol=1e-3, all_flips=False, dtype=np.float64, out=None):
+        """
+        Perfil de exposiciones completo en una pasada vectorizada: griegas por contrato con
+        el kernel fusionado (BlackScholes.greeks), agregadas por strike, walls (máximo OI
+        por lado), gamma flip (GammaFlipSolver; all_flips=True retorna todos los cruces) e IV ATM.
+        Todos los inputs son arrays numpy alineados por contrato.
+
+        Convención dealer (sign: +1 calls, -1 puts), todas en dólares:
+        GEX = Γ·OI·100·S·sign | DEX = Δ·OI·100·S·sign | VEX = vega·OI·100·sign por punto de vol
+        Vanna = vanna·OI·100·S·sign por punto de vol | Charm = charm·OI·100·S·sign por día
+        """
+        K = np.asarray(K, dtype=np.float64); T = np.asarray(T, dtype=np.float64)
+        iv = np.asarray(iv, dtype=np.float64); oi = np.asarray(oi, dtype=np.float64)
+        sign = np.asarray(sign, dtype=np.float64)
+
+        valid = (oi > 0) & (iv > 0) & (K > 0)
+        if not valid.all():
+            K, T, iv, oi, sign = K[valid], T[valid], iv[valid], oi[valid], sign[valid]
+        if K.size == 0: return None
+
+        is_call = sign > 0
+        with stage("greeks"): g = BlackScholes.greeks(spot, K, T, r, iv, is_call, dtype=dtype, out=out)
+        w = oi * sign * 100
+        ws = w * spot
+
+        with stage("aggregate"):
+            strikes, (net_gex, net_dex, net_vex, net_vanna, net_charm, call_oi, put_oi) = GexEngine.aggregate_by_strike(
+                K, [g["gamma"] * ws, g["delta"] * ws, g["vega"] * (w * 0.01), g["vanna"] * (ws * 0.01),
+                    g["charm"] * (ws / 365.0), np.where(is_call, oi, 0.0), np.where(is_call, 0.0, oi)])
+        total_oi = call_oi + put_oi
+
+        call_wall = float(strikes[call_oi.argmax()]) if is_call.any() else 0.0
+        put_wall = float(strikes[put_oi.argmax()]) if (~is_call).any() else 0.0
+
+        # Gamma Flip: raíz del gamma neto al desplazar el spot
+        with stage("flip"):
+            solver = GammaFlipSolver(K, T, iv, oi, sign, r)
+            flips = solver.solve(spot, flip_range[0], flip_range[1], grid_points=flip_points,
+                                 tol=flip_tol, all_roots=all_flips)
+        gamma_flip = min(flips, key=lambda x: abs(x - spot)) if all_flips else flips
+
+        near = np.abs(K / spot - 1.0) < 0.05
+        iv_atm = float(iv[near].mean()) if near.any() else float(iv.mean())
+
+        in_band = (strikes >= spot * band[0]) & (strikes <= spot * band[1])
+        return {
+            "strikes": strikes[in_band],
+            "net_gex": net_gex[in_band],
+            "net_dex": net_dex[in_band],
+            "net_vex": net_vex[in_band],
+            "net_vanna": net_vanna[in_band],
+            "net_charm": net_charm[in_band],
+            "total_oi": total_oi[in_band],
+            "totals": {"gex": float(net_gex.sum()), "dex": float(net_dex.sum()),
+                       "vex": float(net_vex.sum()), "vanna": float(net_vanna.sum()),
+                       "charm": float(net_charm.sum())},
+            "call_wall": call_wall,
+            "put_wall": put_wall,
+            "gamma_flip": float(gamma_flip),
+            "gamma_flips": flips if all_flips else [float(gamma_flip)],
+            "iv_atm": iv_atm,
+        }
+
+    @staticmethod
+    def scenarios(K, T, iv, oi, sign, spots, iv_shifts=(0.0,), days=(0.0,), r=0.045, chunk_elements=1 << 16,
+                  dtype=np.float64):
+        """
+        NetGEX y NetDEX (dólares, misma convención que compute) en la malla completa
+        días × desplazamiento de IV × spot, en una pasada por bloques de contratos.
+
+        Cada escenario (d, v) es una fila de parámetros por contrato: T' = T - d/365 y
+        σ' = max(σ + v, 1%) (sticky strike); los contratos que vencen antes de d días no
+        cuentan. Como en GammaFlipSolver, GEX(S) = Σ c·φ(d1) y sólo d1 depende de S: por
+        bloque hay un exp y un matmul por lotes. N(d1) sale del mismo exp(-d1²/2) con la
+        aproximación racional de Abramowitz-Stegun 7.1.26 (error < 1e-7), bastante más
+        barata que ndtr. Se recorren grupos de escenarios y, dentro, bloques de contratos
+        de unos chunk_elements (escenarios × spots × contratos): los parámetros se calculan
+        por bloque, así que la memoria no crece con el tamaño de la malla ni de la cadena.
+        Retorna {"net_gex", "net_dex"} con forma (días, shifts, spots).
+        """
+        dtype = np.dtype(dtype)
+        K = np.asarray(K, dtype=np.float64); T = np.asarray(T, dtype=np.float64)
+        iv = np.asarray(iv, dtype=np.float64); sign = np.asarray(sign, dtype=np.float64)
+        oi = np.asarray(oi, dtype=np.float64)
+        valid = (oi > 0) & (iv > 0) & (K > 0)
+        if not valid.all():
+            K, T, iv, oi, sign = K[valid], T[valid], iv[valid], oi[valid], sign[valid]
+        w, log_k, is_put = oi * sign * 100, np.log(K), sign < 0
+        spots = np.asarray(spots, dtype=np.float64)
+        shifts = np.asarray(iv_shifts, dtype=np.float64); days = np.asarray(days, dtype=np.float64)
+        nd, nv, ns = days.size, shifts.size, spots.size
+
+        log_s = np.log(spots).astype(dtype)[np.newaxis, :, np.newaxis]
+        coef = [dtype.type(0.5 * x) for x in reversed(_AS_A)]
+        gex = np.zeros((nd * nv, ns)); dex = np.zeros((nd * nv, ns)); put_w = np.zeros(nd * nv)
+        # Grupos de escenarios que dejan bloques de al menos 64 contratos
+        rows = max(1, min(nd * nv, chunk_elements // (max(ns, 1) * 64)))
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore', under='ignore'):
+            for r0 in range(0, nd * nv, rows):
+                g = slice(r0, min(r0 + rows, nd * nv))
+                idx = np.arange(g.start, g.stop)
+                el = (days[idx // nv] / 365.0)[:, np.newaxis]
+                sh = shifts[idx % nv][:, np.newaxis]
+                block = max(1, chunk_elements // (idx.size * max(ns, 1)))
+                for i in range(0, K.size, block):
+                    j = i + block
+                    # Parámetros del escenario (filas) para el bloque de contratos (columnas)
+                    t = T[i:j] - el
+                    wl = np.where(t > 0, w[i:j], 0.0)
+                    put_w[g] += np.where(is_put[i:j], wl, 0.0).sum(axis=1)
+                    t = np.maximum(t, 1e-4)
+                    sig = np.maximum(iv[i:j] + sh, 0.01)
+                    b = sig * np.sqrt(t)
+                    a = (log_k[i:j] - (r + 0.5 * sig * sig) * t).astype(dtype)
+                    c = (wl * INV_SQRT_2PI / b).astype(dtype)
+                    # z = d1/√2: exp(-z²) = √(2π)·φ(d1) y u = 1/(1 + p|z|)
+                    inv_b = (1.0 / (b * np.sqrt(2.0))).astype(dtype)
+                    wl = wl.astype(dtype)
+
+                    z = log_s - a[:, np.newaxis, :]
+                    z *= inv_b[:, np.newaxis, :]                 # (escenarios, spots, bloque)
+                    e = np.square(z); np.negative(e, out=e); np.exp(e, out=e)
+                    gex[g] += (e @ c[:, :, np.newaxis])[..., 0]
+                    # N(d1) = [d1 >= 0] - sign(d1)·Q(|d1|), Q = ½·poly(u)·exp(-z²)
+                    u = np.abs(z); u *= dtype.type(_AS_P); u += 1.0; np.reciprocal(u, out=u)
+                    q = u * coef[0]
+                    for k in coef[1:]: q += k; q *= u
+                    q *= e; np.copysign(q, z, out=q)
+                    n = (z >= 0).astype(dtype); n -= q
+                    dex[g] += (n @ wl[:, :, np.newaxis])[..., 0]
+        dex = (dex - put_w[:, np.newaxis]) * spots
+        return {"net_gex": gex.reshape(nd, nv, ns), "net_dex": dex.reshape(nd, nv, ns)}
@@ -0,0 +1,83 @@
+# Archivo: backend/app/core/http_cache.py
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Hashable, NamedTuple, Optional
+
+from fastapi import Request, Response
+
+from app.core import config
+
+
+class Rendered(NamedTuple):
+    """Respuesta ya serializada, lista para reenviar sin recalcular."""
+    body: bytes
+    media_type: str
+    etag: str
+    cache_control: str
+    headers: Optional[dict] = None
+
+
+def etag_for(body: bytes) -> str:
+    # Débil (W/): la compresión cambia los bytes en el cable pero no el contenido
+    return 'W/"%s"' % hashlib.blake2b(body, digest_size=12).hexdigest()
+
+
+def render(body: bytes, media_type: str, cache_control: str, headers: dict = None) -> Rendered:
+    return Rendered(body, media_type, etag_for(body), cache_control, headers)
+
+
+def not_modified(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header: return False
+    tags = [t.strip() for t in header.split(",")]
+    # Comparación débil: W/"x" y "x" son la misma representación
+    return "*" in tags or etag.removeprefix("W/") in (t.removeprefix("W/") for t in tags)
+
+
+def respond(request: Request, rendered: Rendered) -> Response:
+    """200 con ETag y Cache-Control, o 304 sin cuerpo si el cliente ya tiene esa versión."""
+    headers = {"ETag": rendered.etag, "Cache-Control": rendered.cache_control, **(rendered.headers or {})}
+    if not_modified(request, rendered.etag): return Response(status_code=304, headers=headers)
+    return Response(rendered.body, media_type=rendered.media_type, headers=headers)
+
+
+class ResponseCache:
+    """
+    LRU de respuestas renderizadas con TTL corto. La clave debe incluir la versión de
+    los datos de origen: un dato nuevo cambia la clave y la entrada vieja simplemente
+    deja de pedirse (y sale por LRU o por TTL).
+    """
+    def __init__(self, max_items: int = None, ttl: float = None):
+        self.max_items = max_items or config.RESPONSE_CACHE_ITEMS
+        self.ttl = ttl or config.RESPONSE_CACHE_TTL
+        self._items: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counts = {"hit": 0, "miss": 0}
+
+    def get(self, key: Hashable) -> Optional[Rendered]:
+        now = time.time()
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and now < item[1]:
+                self._items.move_to_end(key)
+                self._counts["hit"] += 1
+                return item[0]
+            if item is not None: del self._items[key]
+            self._counts["miss"] += 1
+            return None
+
+    def set(self, key: Hashable, rendered: Rendered, ttl: float = None):
+        with self._lock:
+            self._items[key] = (rendered, time.time() + (ttl or self.ttl))
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items: self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock: self._items.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._counts, "items": len(self._items),
+                    "bytes": sum(len(r.body) for r, _ in self._items.values())}
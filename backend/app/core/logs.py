@@ -0,0 +1,46 @@
+# Archivo: backend/app/core/logs.py
+"""
+Logging estructurado: cada línea lleva nivel, logger, mensaje y los campos pasados en
+extra= (ticker, task_id, ms...). QUANTDESK_LOG_FORMAT=json emite una línea JSON por
+evento (para agregadores de logs); "text" la deja legible como clave=valor.
+"""
+import json
+import logging
+import sys
+import time
+
+from app.core import config
+
+# Atributos propios de LogRecord: el resto son los campos de extra=
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+
+def _fields(record: logging.LogRecord) -> dict:
+    return {k: v for k, v in vars(record).items() if k not in _RESERVED}
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        out = {"ts": round(record.created, 3), "level": record.levelname, "logger": record.name,
+               "msg": record.getMessage(), **_fields(record)}
+        if record.exc_info: out["exc"] = self.formatException(record.exc_info)
+        return json.dumps(out, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        ts = time.strftime("%H:%M:%S", time.localtime(record.created))
+        extra = " ".join(f"{k}={v}" for k, v in _fields(record).items())
+        line = f"{ts} {record.levelname:<7} {record.name}: {record.getMessage()}" + (f" {extra}" if extra else "")
+        if record.exc_info: line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+def setup_logging(level: str = None, fmt: str = None):
+    """Configura el logger 'app' (idempotente: se llama al arrancar la API y cada worker)."""
+    root = logging.getLogger("app")
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(JSONFormatter() if (fmt or config.LOG_FORMAT) == "json" else TextFormatter())
+    root.handlers[:] = [handler]
+    root.setLevel((level or config.LOG_LEVEL).upper())
+    root.propagate = False
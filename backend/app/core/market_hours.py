@@ -0,0 +1,38 @@
+# Archivo: backend/app/core/market_hours.py
+import time
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from app.core import config
+
+
+def market_today() -> date:
+    return datetime.now(ZoneInfo(config.MARKET_TZ)).date()
+
+
+def next_session_close(now: float = None) -> float:
+    """
+    Timestamp (epoch) del próximo cierre de sesión (16:00 NY, lunes a viernes).
+    No contempla festivos: en el peor caso el histórico se refresca un día de más.
+    """
+    tz = ZoneInfo(config.MARKET_TZ)
+    dt = datetime.fromtimestamp(now if now is not None else time.time(), tz)
+    close = dt.replace(hour=config.MARKET_CLOSE_HOUR, minute=0, second=0, microsecond=0)
+    if dt >= close: close += timedelta(days=1)
+    while close.weekday() >= 5: close += timedelta(days=1)
+    return close.timestamp()
+
+
+def session_closed(d: date, now: float = None) -> bool:
+    """True si la sesión del día d ya ha cerrado (su vela diaria es definitiva)."""
+    tz = ZoneInfo(config.MARKET_TZ)
+    close = datetime(d.year, d.month, d.day, config.MARKET_CLOSE_HOUR, tzinfo=tz)
+    return (now if now is not None else time.time()) >= close.timestamp()
+
+
+def session_open(now: float = None) -> bool:
+    """True entre la apertura y el cierre de un día laborable (sin festivos, como next_session_close)."""
+    dt = datetime.fromtimestamp(now if now is not None else time.time(), ZoneInfo(config.MARKET_TZ))
+    if dt.weekday() >= 5: return False
+    opens = dt.replace(hour=config.MARKET_OPEN_HOUR, minute=config.MARKET_OPEN_MINUTE, second=0, microsecond=0)
+    return opens <= dt < dt.replace(hour=config.MARKET_CLOSE_HOUR, minute=0, second=0, microsecond=0)
@@ -0,0 +1,177 @@
+# Archivo: backend/app/core/metrics.py
+"""
+Métricas en proceso expuestas en formato de texto de Prometheus (GET /metrics), sin
+dependencias. El camino caliente sólo hace un bisect y una suma bajo un lock; lo que ya
+se contaba en otra parte (caché, governor, cola de escaneos) no se duplica: se lee en
+el momento del scrape con collectors registrados.
+
+Cada proceso (API y workers de escaneo) tiene su propio registro; con varios procesos
+Prometheus debe rascar cada uno o agregarse por instancia.
+"""
+import time
+import asyncio
+import bisect
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Tuple
+
+# Límites (s) de los histogramas: de 0.5 ms (kernels numpy) a 30 s (escaneos enteros)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# (nombre, tipo, ayuda, [(etiquetas, valor)])
+Family = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt(value: float) -> str:
+    if value == float("inf"): return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List["_Metric"] = []
+        self._collectors: List[Callable[[], Iterable[Family]]] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: "_Metric"):
+        with self._lock: self._metrics.append(metric)
+
+    def collector(self, fn: Callable[[], Iterable[Family]]):
+        """fn se llama en cada scrape y produce familias ya calculadas (gauges, contadores externos)."""
+        with self._lock: self._collectors.append(fn)
+        return fn
+
+    def render(self) -> str:
+        lines = []
+        with self._lock: metrics, collectors = list(self._metrics), list(self._collectors)
+        families = [m.family() for m in metrics]
+        for fn in collectors:
+            try: families.extend(fn())
+            except Exception: continue  # un collector roto no debe tumbar el scrape
+        for name, kind, help, samples in families:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                name_ = labels.pop("__name__", name)
+                lbl = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+                lines.append(f"{name_}{{{lbl}}} {_fmt(value)}" if lbl else f"{name_} {_fmt(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), registry: Registry = REGISTRY):
+        self.name, self.help, self.labelnames = name, help, tuple(labels)
+        self._lock = threading.Lock()
+        self._series: Dict[tuple, object] = {}
+        registry.register(self)
+
+    def _labels(self, values: tuple) -> Dict[str, str]:
+        return dict(zip(self.labelnames, values))
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, n: float = 1.0):
+        with self._lock: self._series[labels] = self._series.get(labels, 0.0) + n
+
+    def family(self) -> Family:
+        with self._lock: series = dict(self._series)
+        return self.name, self.kind, self.help, [(self._labels(k), v) for k, v in series.items()]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS,
+                 registry: Registry = REGISTRY):
+        super().__init__(name, help, labels, registry)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(labels)
+            if s is None: s = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            s[0][i] += 1
+            s[1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        start = time.perf_counter()
+        try: yield
+        finally: self.observe(time.perf_counter() - start, *labels)
+
+    def family(self) -> Family:
+        with self._lock: series = {k: (list(c), t) for k, (c, t) in self._series.items()}
+        samples = []
+        for key, (counts, total) in series.items():
+            base, cum = self._labels(key), 0
+            for bound, c in zip(self.buckets + (float("inf"),), counts):
+                cum += c
+                samples.append(({**base, "le": _fmt(bound), "__name__": self.name + "_bucket"}, cum))
+            samples.append(({**base, "__name__": self.name + "_sum"}, total))
+            samples.append(({**base, "__name__": self.name + "_count"}, cum))
+        return self.name, self.kind, self.help, samples
+
+
+# --- MÉTRICAS DE LA APLICACIÓN ---
+STAGE_SECONDS = Histogram("quantdesk_stage_seconds",
+                          "Duración por etapa: fetch.* (descarga real, fallo de caché), greeks, aggregate, "
+                          "flip, serialize, scan.*", ("stage",))
+HTTP_SECONDS = Histogram("quantdesk_http_request_seconds", "Latencia de las peticiones HTTP por ruta",
+                         ("method", "route", "status"))
+UPSTREAM_SECONDS = Histogram("quantdesk_upstream_seconds",
+                             "Duración de cada intento contra el upstream por resultado (ok, throttled, error) "
+                             "y prioridad", ("outcome", "priority"))
+SCAN_TICKERS = Counter("quantdesk_scan_tickers_total", "Tickers analizados por el scanner por resultado",
+                       ("outcome",))
+
+
+def stage(name: str):
+    """with stage("greeks"): ... -> una observación en quantdesk_stage_seconds{stage="greeks"}."""
+    return STAGE_SECONDS.time(name)
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI (no BaseHTTPMiddleware: no envuelve el cuerpo ni rompe el SSE) que mide
+    cada petición hasta el último byte, etiquetada con la plantilla de ruta (/asset/{ticker})
+    para no crear una serie por ticker. Si el profiler está activo, lo arranca y lo cierra.
+    """
+    def __init__(self, app, profiler=None):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500
+
+        async def _send(message):
+            nonlocal status
+            if message["type"] == "http.response.start": status = message["status"]
+            await send(message)
+
+        session = self.profiler.start() if self.profiler is not None else None
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            elapsed = time.perf_counter() - start
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            HTTP_SECONDS.observe(elapsed, scope["method"], route, str(status))
+            if session is not None:
+                # Parar el hilo muestreador (join) y escribir el perfil bloquean: a un hilo, sin
+                # esperar (la respuesta ya salió entera y así tampoco lo corta una cancelación)
+                asyncio.get_running_loop().run_in_executor(None, session.finish, elapsed, f"{scope['method']} {route}")
@@ -0,0 +1,103 @@
+# Archivo: backend/app/core/profiling.py
+"""
+Profiler de muestreo opt-in para peticiones lentas (QUANTDESK_PROFILE_SLOW_MS > 0).
+Mientras dura una petición muestreada, un hilo aparte lee la pila de todos los hilos
+del proceso cada PROFILE_INTERVAL s (así entra también el cálculo enviado a
+asyncio.to_thread); si la petición supera el umbral se guardan las pilas en formato
+"collapsed" (una línea por pila con su nº de muestras, lo que leen flamegraph.pl y
+speedscope) en PROFILE_DIR. Las peticiones concurrentes aparecen en la misma muestra.
+"""
+import os
+import re
+import sys
+import time
+import random
+import logging
+import threading
+from collections import Counter
+from typing import Optional
+
+from app.core import config
+
+log = logging.getLogger(__name__)
+
+# Hojas de pila de hilos parados esperando trabajo: no aportan nada al perfil
+IDLE_LEAVES = {"threading.py:Condition.wait", "threading.py:Event.wait", "thread.py:_worker",
+               "queue.py:Queue.get", "selectors.py:EpollSelector.select", "selectors.py:KqueueSelector.select",
+               "selectors.py:SelectSelector.select"}
+
+
+class StackSampler:
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def _run(self):
+        me = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for tid, frame in sys._current_frames().items():
+                if tid == me: continue
+                if tid not in names:
+                    names.update({t.ident: t.name for t in threading.enumerate()})
+                code = frame.f_code
+                if f"{os.path.basename(code.co_filename)}:{code.co_qualname}" in IDLE_LEAVES: continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_qualname}")
+                    frame = frame.f_back
+                stack.append(names.get(tid, str(tid)))
+                self.samples[";".join(reversed(stack))] += 1
+
+    def start(self) -> "StackSampler":
+        self._thread.start()
+        return self
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.samples
+
+
+class ProfileSession:
+    def __init__(self, profiler: "RequestProfiler"):
+        self.profiler = profiler
+        self.sampler = StackSampler(profiler.interval).start()
+
+    def finish(self, elapsed: float, label: str):
+        samples = self.sampler.stop()
+        if elapsed * 1000 < self.profiler.slow_ms or not samples: return
+        path = self.profiler.save(samples, label)
+        log.warning("petición lenta perfilada", extra={"request": label, "ms": round(elapsed * 1000, 1),
+                                                        "samples": sum(samples.values()), "profile": path})
+
+
+class RequestProfiler:
+    """Decide qué peticiones muestrear (fracción PROFILE_SAMPLE_RATE) y dónde guardar los perfiles."""
+    def __init__(self, slow_ms: float = None, sample_rate: float = None, interval: float = None,
+                 directory: str = None):
+        self.slow_ms = config.PROFILE_SLOW_MS if slow_ms is None else slow_ms
+        self.sample_rate = config.PROFILE_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.interval = interval or config.PROFILE_INTERVAL
+        self.directory = directory or config.PROFILE_DIR
+
+    @property
+    def enabled(self) -> bool:
+        return self.slow_ms > 0 and self.sample_rate > 0
+
+    def start(self) -> Optional[ProfileSession]:
+        if not self.enabled or random.random() >= self.sample_rate: return None
+        return ProfileSession(self)
+
+    def save(self, samples: Counter, label: str) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", label).strip("_")
+        now = time.time()
+        stamp = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}.{int(now * 1000) % 1000:03d}"
+        path = os.path.join(self.directory, f"{stamp}-{slug}-{os.getpid()}.collapsed")
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, n in samples.most_common(): f.write(f"{stack} {n}\n")
+        return path
@@ -0,0 +1,85 @@
+# Archivo: backend/app/core/serialization.py
+import io
+import json
+import math
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Dependencias opcionales: orjson acelera el volcado JSON; pyarrow habilita format=arrow
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+FORMATS = ("rows", "columnar", "arrow")
+
+
+def sanitize_json(data):
+    """NaN/inf -> 0.0 y tipos numpy/pandas -> nativos, para que la respuesta sea JSON válido."""
+    if isinstance(data, dict): return {k: sanitize_json(v) for k, v in data.items()}
+    elif isinstance(data, list): return [sanitize_json(v) for v in data]
+    elif isinstance(data, float):
+        if math.isnan(data) or math.isinf(data): return 0.0
+        return data
+    elif isinstance(data, (np.int64, np.int32)): return int(data)
+    elif isinstance(data, pd.Timestamp): return data.strftime('%Y-%m-%d')
+    return data
+
+
+def column_values(values, nan=None) -> list:
+    """
+    Array -> lista JSON de una sola vez: los no finitos se sustituyen por `nan` con una
+    máscara (sin recorrer valor a valor en Python) y tolist() da tipos nativos.
+    """
+    arr = np.asarray(values)
+    if arr.dtype.kind == "M": return np.datetime_as_string(arr, unit="D").tolist()
+    if arr.dtype.kind != "f": return arr.tolist()
+    bad = ~np.isfinite(arr)
+    if not bad.any(): return arr.tolist()
+    if nan is not None: return np.where(bad, nan, arr).tolist()
+    out = arr.astype(object)
+    out[bad] = nan
+    return out.tolist()
+
+
+def frame_columns(df: pd.DataFrame, columns: Dict[str, str], index: Optional[str] = None, nan=None) -> Dict[str, list]:
+    """Formato columnar {nombre: [valores]} a partir de las columnas (origen -> nombre) de df."""
+    out = {index: column_values(df.index.to_numpy(), nan)} if index else {}
+    for src, name in columns.items(): out[name] = column_values(df[src].to_numpy(), nan)
+    return out
+
+
+def columns_to_rows(cols: Dict[str, list]) -> List[dict]:
+    """Inverso de frame_columns: lista de filas (el formato clásico de la API)."""
+    keys = list(cols)
+    return [dict(zip(keys, vals)) for vals in zip(*cols.values())]
+
+
+def rows_to_columns(rows: List[dict]) -> Dict[str, list]:
+    """Filas ya saneadas -> columnas (las claves que falten en una fila quedan a null)."""
+    keys = {}
+    for r in rows: keys.update(dict.fromkeys(r))
+    return {k: [r.get(k) for r in rows] for k in keys}
+
+
+def dumps(content) -> bytes:
+    """JSON compacto. Con orjson, numpy y NaN (-> null) se serializan sin pasar por sanitize_json."""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def arrow_ipc(rows: List[dict]) -> bytes:
+    """Tabla de filas -> stream IPC de Apache Arrow (requiere pyarrow)."""
+    if pa is None: raise RuntimeError("pyarrow no está instalado")
+    table = pa.Table.from_pandas(pd.DataFrame(rows), preserve_index=False)
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer: writer.write_table(table)
+    return sink.getvalue()
@@ -1,8 +1,35 @@
-from fastapi import FastAPI
+import multiprocessing
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from app.core import config
+from app.core.logs import setup_logging
+from app.core.metrics import REGISTRY, MetricsMiddleware
+from app.core.profiling import RequestProfiler
 from app.routes import router
+from app.services import scan_worker
+from app.services.factory import get_async_provider, get_scan_backend
 
-app = FastAPI(title="QuantDesk API")
+setup_logging()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Workers de escaneo locales (procesos aparte, reclaman de la cola SQLite compartida)
+    workers = []
+    if not get_scan_backend().inline:
+        ctx = multiprocessing.get_context("spawn")
+        for _ in range(config.SCAN_LOCAL_WORKERS):
+            proc = ctx.Process(target=scan_worker.main, name="scan-worker", daemon=True)
+            proc.start()
+            workers.append(proc)
+    yield
+    for proc in workers: proc.terminate()
+    for proc in workers: proc.join(timeout=5)
+    # Cierra el pool HTTP compartido del proveedor asíncrono
+    await get_async_provider().aclose()
+
+app = FastAPI(title="QuantDesk API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -12,8 +39,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Historial y tablas de escaneo comprimen ~5x; el SSE (text/event-stream) queda excluido
+app.add_middleware(GZipMiddleware, minimum_size=config.HTTP_GZIP_MIN_SIZE)
+
+# El más externo: la latencia medida incluye compresión y CORS (y el profiler, si está activo)
+app.add_middleware(MetricsMiddleware, profiler=RequestProfiler())
+
 app.include_router(router, prefix="/api/v1")
 
 @app.get("/")
 def read_root():
-    return {"message": "QuantDesk API Running"}
\ No newline at end of file
+    return {"message": "QuantDesk API Running"}
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Métricas de este proceso en formato de texto de Prometheus."""
+    return Response(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
\ No newline at end of file
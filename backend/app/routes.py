@@ -1,23 +1,30 @@
-from fastapi import APIRouter, HTTPException
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 import pandas as pd
 import numpy as np
-import math
-from app.services.data_provider import YFinanceProvider
+import time
+import asyncio
+import logging
+from app.core import config
+from app.core.http_cache import ResponseCache, render, respond
+from app.core.metrics import REGISTRY, stage
+from app.core.serialization import (ARROW_MEDIA_TYPE, arrow_ipc, column_values, columns_to_rows, dumps,
+                                    frame_columns, pa, rows_to_columns, sanitize_json)
+from app.services.data_provider import is_mock
+from app.services.gex_store import SNAPSHOT_COLUMNS
+from app.services.factory import (get_provider, get_async_provider, get_governor, get_gex_store, get_scan_backend,
+                                  get_universe)
+from app.services.quant_engine import QuantService
+from app.services.scan_registry import FINISHED
 from app.services.screener import scan_market
 
+log = logging.getLogger(__name__)
 router = APIRouter()
-provider = YFinanceProvider()
-
-def sanitize_json(data):
-    if isinstance(data, dict): return {k: sanitize_json(v) for k, v in data.items()}
-    elif isinstance(data, list): return [sanitize_json(v) for v in data]
-    elif isinstance(data, float):
-        if math.isnan(data) or math.isinf(data): return 0.0
-        return data
-    elif isinstance(data, (np.int64, np.int32)): return int(data)
-    elif isinstance(data, pd.Timestamp): return data.strftime('%Y-%m-%d')
-    return data
+provider = get_provider()
+aprovider = get_async_provider()
+quant = QuantService(provider)
 
 class ScannerConfig(BaseModel):
     sector: str
@@ -25,101 +32,303 @@ class ScannerConfig(BaseModel):
     max_dte: int
     lookback: int
 
-tasks = {}
+# Escaneos en curso y recientes (acotado, deduplicado por config). Con el backend "queue"
+# el estado vive en SQLite y cualquier proceso de la API puede responder por cualquier escaneo
+scans = get_scan_backend()
 
-async def update_task_status(task_id, status, progress=None, data=None, error=None):
-    if task_id not in tasks: tasks[task_id] = {}
-    tasks[task_id]["status"] = status
-    if progress is not None: tasks[task_id]["progress"] = progress
-    if data is not None: tasks[task_id]["data"] = sanitize_json(data)
-    if error is not None: tasks[task_id]["error"] = error
+async def _scans(fn, *args):
+    """Llamada al backend de escaneos: las de la cola SQLite bloquean y van a un hilo; el registro inline es memoria."""
+    return fn(*args) if scans.inline else await asyncio.to_thread(fn, *args)
+
+# Respuestas ya renderizadas de /asset (por versión de los datos) y de escaneos terminados
+responses = ResponseCache()
+
+# Ventana de DTE de /asset y /scenarios: la misma, para compartir la cadena en caché y sus arrays
+ASSET_MAX_DTE = config.DEFAULT_MAX_DTE
+
+@REGISTRY.collector
+def _collect_metrics():
+    """Contadores que ya llevan la caché, el governor y el backend de escaneos, leídos en cada scrape."""
+    cache = provider.cache_stats()
+    store = cache.pop("contract_store", None)
+    yield ("quantdesk_cache_events_total", "counter", "Consultas a la caché de datos de mercado por tipo y evento",
+           [({"kind": kind, "event": ev}, n) for kind, b in cache.items() for ev, n in b.items() if ev != "hit_ratio"])
+    if store:
+        yield ("quantdesk_contract_store", "gauge", "Store compartido de contratos: generación, entradas, filas y bytes",
+               [({"field": k}, v) for k, v in store.items()])
+    resp = responses.stats()
+    yield ("quantdesk_response_cache_total", "counter", "Consultas a la caché de respuestas renderizadas",
+           [({"result": r}, resp[r]) for r in ("hit", "miss")])
+    yield ("quantdesk_response_cache_bytes", "gauge", "Bytes en la caché de respuestas", [({}, resp["bytes"])])
+    gov = get_governor().stats()
+    yield ("quantdesk_upstream_calls_total", "counter", "Llamadas al upstream, reintentos y abandonos",
+           [({"event": k}, v) for k, v in gov["calls"].items()])
+    conc = gov["concurrency"]
+    yield ("quantdesk_upstream_concurrency", "gauge", "Límite AIMD, peticiones en vuelo e interactivas en espera",
+           [({"field": k}, conc[k]) for k in ("limit", "in_flight", "waiting_interactive")])
+    yield ("quantdesk_scan_jobs", "gauge", "Escaneos por estado (pending = profundidad de la cola)",
+           [({"status": k}, v) for k, v in scans.counts().items()])
 
 @router.post("/scanner/start")
 async def start_scanner_endpoint(config: ScannerConfig):
-    import uuid
-    import asyncio
-    task_id = str(uuid.uuid4())
-    tasks[task_id] = {"status": "pending", "progress": 0, "data": []}
-    asyncio.create_task(scan_market(config, task_id))
-    return {"task_id": task_id}
+    # Un escaneo idéntico en curso (o recién terminado) se reutiliza en vez de lanzar otro
+    task_id, new = await _scans(scans.start, config)
+    if new and scans.inline: scans.attach(task_id, asyncio.create_task(scan_market(config, task_id, scans.reporter(task_id))))
+    return {"task_id": task_id, "deduplicated": not new}
+
+@router.post("/scanner/cancel/{task_id}")
+async def cancel_scanner(task_id: str):
+    """Detiene el escaneo y libera el upstream (p. ej. al cerrar el usuario la página)."""
+    cancelled = await _scans(scans.cancel, task_id)
+    if cancelled is None: raise HTTPException(status_code=404)
+    return {"task_id": task_id, "cancelled": cancelled}
 
 @router.get("/scanner/status/{task_id}")
-async def get_scanner_status(task_id: str):
-    if task_id not in tasks: raise HTTPException(status_code=404)
-    return tasks[task_id]
+async def get_scanner_status(task_id: str, request: Request, offset: int = Query(0, ge=0),
+                             limit: Optional[int] = Query(None, ge=1),
+                             format: str = Query("rows", pattern="^(rows|columnar|arrow)$")):
+    """
+    format=columnar devuelve data como {columna: [valores]}; format=arrow, la página de
+    resultados como stream IPC de Arrow (estado en cabeceras X-Scan-*). Con If-None-Match
+    responde 304 si la página no cambió; las de escaneos terminados se sirven de caché.
+    """
+    if format == "arrow" and pa is None: raise HTTPException(status_code=501, detail="pyarrow no está instalado")
+    key = ("scan", task_id, offset, limit, format)
+    rendered = responses.get(key)
+    if rendered is None:
+        status = await _scans(scans.status, task_id, offset, limit)
+        if status is None: raise HTTPException(status_code=404)
+        finished = status["status"] in FINISHED
+        # Terminado: ya no cambia. En curso: el cliente revalida siempre (304 si no hay filas nuevas)
+        cache_control = f"private, max-age={int(config.RESPONSE_CACHE_TTL)}" if finished else "no-cache"
+        with stage("serialize"):
+            if format == "arrow":
+                rendered = render(arrow_ipc(status["data"]), ARROW_MEDIA_TYPE, cache_control,
+                                  {"X-Scan-Status": status["status"], "X-Scan-Progress": str(status["progress"]),
+                                   "X-Scan-Total": str(status["total"])})
+            else:
+                # Las filas ya se sanearon al publicarse: se vuelcan tal cual, sin jsonable_encoder
+                if format == "columnar": status["data"] = rows_to_columns(status["data"])
+                rendered = render(dumps(status), "application/json", cache_control)
+        if finished: responses.set(key, rendered)
+    return respond(request, rendered)
+
+@router.get("/scanner/stream/{task_id}")
+async def stream_scanner(task_id: str, request: Request):
+    """
+    Server-Sent Events del escaneo: 'result' (una fila por ticker en cuanto termina),
+    'progress', y 'done', 'failed' o 'cancelled' al final. Con Last-Event-ID se retoma sin duplicados.
+    """
+    try: last_id = int(request.headers.get("last-event-id") or 0)
+    except ValueError: last_id = 0
+    events = await _scans(scans.subscribe, task_id, last_id)
+    if events is None: raise HTTPException(status_code=404)
+    return StreamingResponse(events, media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    return {**provider.cache_stats(), "responses": responses.stats()}
+
+@router.get("/upstream/stats")
+async def get_upstream_stats():
+    return get_governor().stats()
+
+@router.get("/universe")
+async def get_universe_info():
+    """Versión, origen (descarga o copia empaquetada) y tamaño por sector del universo."""
+    return get_universe().info()
+
+def _epoch(value: Optional[str], end_of_day: bool = False) -> Optional[float]:
+    """'2024-05-01' o '2024-05-01T15:30' (UTC salvo que lleve zona) -> epoch s; una fecha sola como fin abarca el día."""
+    if value is None: return None
+    try: ts = pd.Timestamp(value)
+    except (ValueError, TypeError): raise HTTPException(status_code=422, detail=f"Fecha no válida: {value}")
+    if ts.tzinfo is None: ts = ts.tz_localize("UTC")
+    if end_of_day and len(value) <= 10: ts += pd.Timedelta(days=1) - pd.Timedelta(seconds=1)
+    return ts.timestamp()
+
+@router.get("/asset/{ticker}/gex/history")
+async def get_gex_history(ticker: str, request: Request, start: Optional[str] = None, end: Optional[str] = None,
+                          levels: bool = False, format: str = Query("rows", pattern="^(rows|columnar)$")):
+    """
+    Serie de snapshots GEX guardados (spot, gamma flip, walls, IV ATM, NetGEX total) entre
+    start y end (por defecto los últimos GEX_HISTORY_DEFAULT_DAYS días). Sólo lee del
+    store en disco, nunca del upstream. levels=true añade el NetGEX por strike de cada
+    snapshot: en columnar como strike/gex planos más level_offsets (tramo i = [off[i], off[i+1])).
+    """
+    ticker = ticker.upper()
+    store = get_gex_store()
+    hi = _epoch(end, end_of_day=True)
+    lo = _epoch(start)
+    if lo is None:
+        # Redondeado al día: la clave y el ETag no cambian con cada petición
+        lo = (hi or time.time()) - config.GEX_HISTORY_DEFAULT_DAYS * 86400
+        lo -= lo % 86400
+    if hi is not None and hi < lo: raise HTTPException(status_code=422, detail="end es anterior a start")
+    # La versión es el último snapshot: uno nuevo cambia la clave (y el ETag)
+    key = ("gex_history", ticker, lo, hi, levels, format, store.last_ts(ticker))
+    rendered = responses.get(key)
+    if rendered is None:
+        data = await asyncio.to_thread(store.read, ticker, lo, hi, levels)
+        with stage("serialize"):
+            snaps = {"ts": data["ts"].tolist(), **{c: column_values(data[c]) for c in SNAPSHOT_COLUMNS}}
+            body = {"ticker": ticker, "start": lo, "end": hi, "count": len(data["ts"])}
+            if format == "columnar":
+                body["snapshots"] = snaps
+                if levels:
+                    body["levels"] = {"strike": column_values(data["strike"]), "gex": column_values(data["gex"]),
+                                      "level_offsets": data["level_offsets"].tolist()}
+            else:
+                rows = columns_to_rows(snaps)
+                if levels:
+                    off, strikes, gex = data["level_offsets"], column_values(data["strike"]), column_values(data["gex"])
+                    for i, row in enumerate(rows):
+                        a, b = off[i], off[i + 1]
+                        row["levels"] = [{"strike": k, "gex": g} for k, g in zip(strikes[a:b], gex[a:b])]
+                body["snapshots"] = rows
+            # no-cache: el cliente revalida y recibe 304 mientras no haya snapshots nuevos
+            rendered = render(dumps(body), "application/json", "no-cache")
+        responses.set(key, rendered)
+    return respond(request, rendered)
+
+def _floats(value: str, name: str, minimum: float = None) -> list:
+    try: out = [float(v) for v in value.split(",") if v.strip()]
+    except ValueError: out = []
+    if not out or not np.isfinite(out).all():
+        raise HTTPException(status_code=422, detail=f"{name}: lista de números finitos separados por comas")
+    if minimum is not None and min(out) < minimum:
+        raise HTTPException(status_code=422, detail=f"{name}: los valores deben ser >= {minimum:g}")
+    return out
+
+@router.get("/asset/{ticker}/scenarios")
+async def get_scenarios(ticker: str, request: Request, spot_range: float = Query(0.1, gt=0, le=0.5),
+                        spot_steps: int = Query(41, ge=2, le=401), iv_shifts: str = "-0.1,-0.05,0,0.05,0.1",
+                        days: str = "0,1,5,10"):
+    """
+    Malla what-if de NetGEX y NetDEX: spot ±spot_range en spot_steps puntos × desplazamientos
+    absolutos de IV (0.05 = +5 puntos) × días transcurridos, más el gamma flip de cada
+    escenario. net_gex[d][v][s] corresponde a days[d], iv_shifts[v], spots[s]. Reutiliza los
+    arrays de la cadena ya convertidos por /asset mientras la cadena en caché no cambie.
+    """
+    shifts, elapsed = _floats(iv_shifts, "iv_shifts"), _floats(days, "days", minimum=0)
+    if len(shifts) * len(elapsed) * spot_steps > config.SCENARIO_MAX_POINTS:
+        raise HTTPException(status_code=422, detail=f"Malla de más de {config.SCENARIO_MAX_POINTS} puntos")
+
+    spot_data = await aprovider.get_spot_price(ticker)
+    price = spot_data.get('price', 0.0) if isinstance(spot_data, dict) else float(spot_data)
+    if price == 0: raise HTTPException(status_code=404, detail="Price not found")
+    chain_version = await aprovider.data_version("chain", (ticker, "aggregated", ASSET_MAX_DTE))
+    arrays = quant.contracts.get((ticker, ASSET_MAX_DTE, chain_version)) if chain_version else None
+    if arrays is None:
+        df_opts = await aprovider.get_aggregated_options(ticker, max_dte=ASSET_MAX_DTE)
+        chain_version = await aprovider.data_version("chain", (ticker, "aggregated", ASSET_MAX_DTE))
+        # Las IV se resuelven contra este spot: con un spot simulado los arrays no se guardan
+        key = (ticker, ASSET_MAX_DTE, chain_version) if chain_version and not is_mock(spot_data) else None
+        arrays = quant.contract_arrays(df_opts, key, price)
+    if arrays is None: raise HTTPException(status_code=404, detail="Option chain not found")
+
+    spot_version = await aprovider.data_version("spot", (ticker,))
+    versions = (spot_version, chain_version)
+    cache_key = None if is_mock(spot_data) or None in versions else \
+        ("scenarios", ticker, spot_range, spot_steps, tuple(shifts), tuple(elapsed), *versions)
+    rendered = responses.get(cache_key) if cache_key else None
+    if rendered is not None: return respond(request, rendered)
+
+    grid = await asyncio.to_thread(quant.scenarios, arrays, price, spot_range, spot_steps, shifts, elapsed)
+    with stage("serialize"):
+        body = {"ticker": ticker, "spot": price, "mock": is_mock(spot_data),
+                **{k: column_values(v) for k, v in grid.items()}}
+        cache_control = f"private, max-age={max(0, int(min(versions) - time.time()))}" if cache_key else "no-store"
+        rendered = render(dumps(body), "application/json", cache_control)
+    if cache_key: responses.set(cache_key, rendered)
+    return respond(request, rendered)
 
 @router.get("/asset/{ticker}")
-async def get_asset_details(ticker: str):
+async def get_asset_details(ticker: str, request: Request, all_flips: bool = False,
+                            format: str = Query("rows", pattern="^(rows|columnar)$")):
+    """
+    format=columnar: history y gex_profile como {columna: [valores]} en vez de una lista de filas.
+    La respuesta lleva ETag (304 con If-None-Match) y Cache-Control hasta que caduque el spot.
+    """
     try:
-        # 1. Precio Spot
-        spot_data = provider.get_spot_price(ticker)
+        # 1. Spot, histórico y cadena se piden a la vez sobre el pool HTTP asíncrono
+        with stage("asset.fetch"):
+            spot_data, df_hist, df_opts = await asyncio.gather(
+                aprovider.get_spot_price(ticker),
+                aprovider.get_history(ticker, period="1y"), # Pedimos 1 año para tener margen
+                aprovider.get_aggregated_options(ticker, max_dte=ASSET_MAX_DTE),
+            )
+        # Partes servidas con datos simulados porque Yahoo no respondió
+        fallbacks = [k for k, v in (("spot", spot_data), ("history", df_hist), ("chain", df_opts)) if is_mock(v)]
         price = spot_data.get('price', 0.0) if isinstance(spot_data, dict) else float(spot_data)
         if price == 0: raise HTTPException(status_code=404, detail="Price not found")
 
-        # 2. Obtener Nombre de la empresa (Nuevo)
-        company_name = ticker
-        try:
-            import yfinance as yf
-            tk = yf.Ticker(ticker)
-            # Intentamos obtener el nombre corto o largo
-            info = tk.fast_info
-            # yfinance fast_info a veces no tiene nombre, usamos un fallback
-            # Para no ralentizar, si no es crítico, devolvemos el ticker, 
-            # pero intentaremos buscarlo en info normal si es necesario (es más lento)
-            # Aquí usaremos un truco: yfinance suele cachear info básica.
-            # Si quieres velocidad extrema, déjalo como ticker. Si quieres nombres:
-            # company_name = tk.info.get('shortName') or tk.info.get('longName') or ticker
-            # Nota: tk.info hace una petición HTTP extra lenta. 
-            # Por ahora devolveremos el Ticker como nombre por defecto para velocidad,
-            # o implementamos un diccionario local de nombres S&P500 si lo tuvieras.
-        except: pass
-
-        # 3. Historial
-        df_hist = provider.get_history(ticker, period="1y") # Pedimos 1 año para tener margen
-        history_data = []
+        # Versión de los datos de origen (caducidad de cada entrada de caché): mientras no
+        # cambie, la misma petición reutiliza la respuesta ya calculada y serializada
+        versions = [await aprovider.data_version(kind, key) for kind, key in
+                    (("spot", (ticker,)), ("history", (ticker, "1y")), ("chain", (ticker, "aggregated", ASSET_MAX_DTE)))]
+        cache_key = None if fallbacks or None in versions else ("asset", ticker, all_flips, format, *versions)
+        rendered = responses.get(cache_key) if cache_key else None
+        if rendered is not None: return respond(request, rendered)
+
+        # 2. Nombre y sector desde el índice local del S&P 500 (sin petición extra)
+        meta = get_universe().lookup(ticker) or {}
+        company_name = meta.get("Name") or ticker
+
+        # 3. Historial: columnas directas de los arrays numpy (NaN -> null con una máscara)
+        history_data = {}
         if not df_hist.empty:
-            df_hist['SMA20'] = df_hist['Close'].rolling(20).mean()
-            df_hist['SMA50'] = df_hist['Close'].rolling(50).mean()
-            df_hist = df_hist.reset_index()
-            for _, row in df_hist.iterrows():
-                d_str = str(row['Date']) if not hasattr(row['Date'], 'strftime') else row['Date'].strftime('%Y-%m-%d')
-                history_data.append({
-                    "date": d_str,
-                    "open": float(row['Open']),
-                    "high": float(row['High']),
-                    "low": float(row['Low']),
-                    "close": float(row['Close']),
-                    "sma20": float(row['SMA20']) if not pd.isna(row['SMA20']) else None,
-                    "sma50": float(row['SMA50']) if not pd.isna(row['SMA50']) else None
-                })
-
-        # 4. GEX
-        call_wall = 0; put_wall = 0; gex_data = []
+            close = df_hist['Close']
+            hist = df_hist.assign(SMA20=close.rolling(20).mean(), SMA50=close.rolling(50).mean())
+            history_data = frame_columns(hist, {"Open": "open", "High": "high", "Low": "low", "Close": "close",
+                                                "SMA20": "sma20", "SMA50": "sma50"}, index="date")
+        if format != "columnar": history_data = columns_to_rows(history_data)
+
+        # 4. GEX (motor vectorizado: gamma real ponderada por OI, walls y flip en una pasada)
+        call_wall = 0; put_wall = 0; gamma_flip = price; gamma_flips = [price]; iv_atm = 0.0; gex_data = []
+        exposure_totals = {}
         try:
-            df_opts = provider.get_aggregated_options(ticker)
-            if not df_opts.empty:
-                calls = df_opts[df_opts['type'] == 'call']
-                puts = df_opts[df_opts['type'] == 'put']
-                if not calls.empty: call_wall = float(calls.loc[calls['openInterest'].idxmax(), 'strike'])
-                if not puts.empty: put_wall = float(puts.loc[puts['openInterest'].idxmax(), 'strike'])
-                
-                strikes = df_opts['strike'].unique()
-                strikes = [k for k in strikes if price * 0.7 < k < price * 1.3]
-                strikes.sort()
-                if len(strikes) > 50: strikes = strikes[::2]
-                for k in strikes:
-                    c = calls[calls['strike'] == k]['openInterest'].sum()
-                    p = puts[puts['strike'] == k]['openInterest'].sum()
-                    gex_data.append({"strike": float(k), "gex": float(c - p)})
-        except: pass
-
-        return sanitize_json({
+            # Cálculo CPU fuera del event loop para no frenar al resto de peticiones
+            # Con la versión de la cadena, sus arrays quedan en memoria para /scenarios; no si
+            # el spot es simulado, porque las IV guardadas se resuelven contra él
+            key = (ticker, ASSET_MAX_DTE, versions[2]) if versions[2] and "spot" not in fallbacks else None
+            profile = await asyncio.to_thread(quant.gex_from_contracts, df_opts, price, band=(0.7, 1.3),
+                                              all_flips=all_flips, key=key)
+            if profile:
+                call_wall, put_wall = profile["call_wall"], profile["put_wall"]
+                gamma_flip, iv_atm = profile["gamma_flip"], profile["iv_atm"]
+                gamma_flips = profile["gamma_flips"]
+                exposure_totals = profile["exposure_totals"]
+                levels = profile["gex_profile"]
+                if len(levels) > 50: levels = levels[::2]
+                gex_data = [{"gex": p["NetGEX"], **p} for p in levels]
+        except Exception:
+            # La página se sirve igual (sin perfil GEX), pero el fallo del motor queda en el log
+            log.exception("fallo calculando el perfil GEX", extra={"ticker": ticker})
+
+        body = sanitize_json({
             "ticker": ticker, 
-            "name": company_name, # Enviamos el nombre (o ticker si falla)
+            "name": company_name, # Ticker si no está en el índice
+            "sector": meta.get("Sector"), "sub_industry": meta.get("SubIndustry"),
             "price": price, 
-            "call_wall": call_wall, "put_wall": put_wall, "gamma_flip": price,
-            "history": history_data, "gex_profile": gex_data
+            "mock": bool(fallbacks), "fallbacks": fallbacks,
+            "call_wall": call_wall, "put_wall": put_wall, "gamma_flip": gamma_flip, "iv_atm": iv_atm,
+            **({"gamma_flips": gamma_flips} if all_flips else {}),
+            "gex_profile": rows_to_columns(gex_data) if format == "columnar" else gex_data,
+            "exposure_totals": exposure_totals
         })
+        # El histórico ya es JSON válido: no pasa por el recorrido recursivo de sanitize_json
+        body["history"] = history_data
+        if cache_key:
+            max_age = max(0, int(min(versions) - time.time()))
+            cache_control = f"private, max-age={max_age}, stale-while-revalidate={int(config.CACHE_STALE_SPOT)}"
+        else:
+            # Datos simulados (o no cacheados): que el navegador no los reutilice
+            cache_control = "no-store"
+        with stage("serialize"): rendered = render(dumps(body), "application/json", cache_control)
+        if cache_key: responses.set(cache_key, rendered)
+        return respond(request, rendered)
     except Exception as e:
-        print(f"ERROR: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        log.exception("fallo en /asset", extra={"ticker": ticker})
+        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
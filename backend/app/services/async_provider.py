@@ -0,0 +1,336 @@
+# Archivo: backend/app/services/async_provider.py
+import io
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import List, Dict, AsyncIterator, Optional
+
+import httpx
+import numpy as np
+import pandas as pd
+
+from app.core import config
+from app.core.market_hours import market_today
+from app.services.chain_engine import empty_contracts, normalize_contracts, select_expiries
+from app.services.data_provider import OptionChain, fallback, is_mock, to_panel
+from app.services.governor import UpstreamGovernor
+from app.services.history_store import HistoryStore
+
+# Columnas de cada contrato tal y como las expone yfinance (y las consume el análisis)
+OPTION_FIELDS = ["contractSymbol", "strike", "lastPrice", "bid", "ask", "volume", "openInterest", "impliedVolatility"]
+# Fallos de red y de payload: un JSON con otra forma (lista donde se espera dict, campos nulos
+# o ausentes) acaba en el respaldo marcado, como en el proveedor síncrono, no en un 500
+UPSTREAM_ERRORS = (httpx.HTTPError, ValueError, KeyError, TypeError, IndexError, AttributeError)
+
+
+class AsyncMarketDataProvider(ABC):
+    """Variante asyncio de MarketDataProvider: mismas firmas y mismos tipos de retorno."""
+    @abstractmethod
+    async def get_history(self, ticker: str, period: str = "1y") -> pd.DataFrame: pass
+    @abstractmethod
+    async def get_spot_price(self, ticker: str) -> float: pass
+    @abstractmethod
+    async def get_aggregated_options(self, ticker: str, max_dte: int = config.DEFAULT_MAX_DTE) -> pd.DataFrame: pass
+    @abstractmethod
+    async def get_options_chain(self, ticker: str, expiration: str = None): pass
+    @abstractmethod
+    async def get_sp500_tickers(self) -> List[Dict]: pass
+
+    async def iter_history_batches(self, tickers: List[str], period: str = "6mo",
+                                   chunk_size: int = config.HISTORY_BATCH_SIZE) -> AsyncIterator[pd.DataFrame]:
+        """Panel ancho (Ticker, campo) por lote; los tickers de cada lote se piden a la vez."""
+        for i in range(0, len(tickers), chunk_size):
+            chunk = tickers[i:i + chunk_size]
+            frames = await asyncio.gather(*(self.get_history(t, period) for t in chunk), return_exceptions=True)
+            yield to_panel({t: f for t, f in zip(chunk, frames) if isinstance(f, pd.DataFrame) and not is_mock(f)})
+
+    async def aclose(self): pass
+
+
+class AsyncYahooProvider(AsyncMarketDataProvider):
+    """
+    Cliente HTTP nativo (httpx) contra los endpoints JSON de Yahoo: un único pool
+    keep-alive compartido y un semáforo que acota las peticiones en vuelo, así que
+    cientos de descargas pueden estar pendientes sin bloquear ni un hilo.
+    base_url/cookie_url son configurables para apuntar a un servidor stub en pruebas.
+    """
+    def __init__(self, base_url: str = None, cookie_url: str = None, universe_url: str = None,
+                 max_connections: int = None, max_in_flight: int = None,
+                 history_store: HistoryStore = None, transport: httpx.AsyncBaseTransport = None,
+                 governor: UpstreamGovernor = None):
+        self.base_url = (base_url or config.YAHOO_BASE_URL).rstrip("/")
+        self.cookie_url = cookie_url if cookie_url is not None else config.YAHOO_COOKIE_URL
+        self.universe_url = universe_url or config.SP500_CSV_URL
+        self.max_connections = max_connections or config.HTTP_MAX_CONNECTIONS
+        self.max_in_flight = max_in_flight or config.HTTP_MAX_IN_FLIGHT
+        self.history_store = history_store or HistoryStore()
+        self._transport = transport
+        self.governor = governor or UpstreamGovernor()
+        self._client: Optional[httpx.AsyncClient] = None
+        self._sem: Optional[asyncio.Semaphore] = None
+        self._crumb: Optional[str] = None
+        self._crumb_lock: Optional[asyncio.Lock] = None
+
+    # --- HTTP ---
+    def _http(self) -> httpx.AsyncClient:
+        # Se crea perezosamente dentro del event loop que lo va a usar
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=config.HTTP_TIMEOUT,
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+                headers={"User-Agent": config.HTTP_USER_AGENT},
+                follow_redirects=True,
+                transport=self._transport,
+            )
+            self._sem = asyncio.Semaphore(self.max_in_flight)
+            self._crumb_lock = asyncio.Lock()
+        return self._client
+
+    async def _get(self, url: str, params: dict = None) -> httpx.Response:
+        client = self._http()
+
+        async def _once():
+            async with self._sem:
+                resp = await client.get(url, params=params)
+            resp.raise_for_status()
+            return resp
+        return await self.governor.call_async(_once)
+
+    async def _crumb_param(self) -> dict:
+        """Yahoo exige cookie + crumb para el endpoint de opciones; se piden una vez y se renuevan si caducan."""
+        self._http()
+        async with self._crumb_lock:
+            if self._crumb is None:
+                if self.cookie_url:
+                    try: await self._http().get(self.cookie_url)
+                    except httpx.HTTPError: pass
+                resp = await self._get(f"{self.base_url}/v1/test/getcrumb")
+                self._crumb = resp.text.strip()
+        return {"crumb": self._crumb} if self._crumb else {}
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    # --- HISTÓRICO ---
+    async def _chart(self, ticker: str, start=None, period: str = None) -> dict:
+        params = {"interval": "1d", "events": "div,splits", "includeAdjustedClose": "true"}
+        if start is not None:
+            params["period1"] = int(pd.Timestamp(start).tz_localize("UTC").timestamp())
+            params["period2"] = int(time.time()) + 86400
+        else:
+            params["range"] = period
+        resp = await self._get(f"{self.base_url}/v8/finance/chart/{ticker}", params)
+        result = (resp.json().get("chart") or {}).get("result") or []
+        return result[0] if result else {}
+
+    @staticmethod
+    def _chart_frame(chart: dict) -> pd.DataFrame:
+        """JSON de chart -> OHLCV ajustado (como auto_adjust=True de yfinance) + acciones corporativas."""
+        ts = chart.get("timestamp") or []
+        if not ts: return pd.DataFrame()
+        quote = (chart.get("indicators", {}).get("quote") or [{}])[0]
+        adj = (chart.get("indicators", {}).get("adjclose") or [{}])[0].get("adjclose")
+        tz = (chart.get("meta") or {}).get("exchangeTimezoneName", config.MARKET_TZ)
+        idx = pd.to_datetime(ts, unit="s", utc=True).tz_convert(tz).normalize().tz_localize(None)
+        df = pd.DataFrame({c.capitalize(): pd.to_numeric(pd.Series(quote.get(c, [np.nan] * len(ts))), errors="coerce").to_numpy()
+                           for c in ("open", "high", "low", "close", "volume")},
+                          index=pd.DatetimeIndex(idx, name="Date"))
+        if adj is not None:
+            ratio = pd.to_numeric(pd.Series(adj), errors="coerce").to_numpy() / df["Close"].to_numpy()
+            for c in ("Open", "High", "Low", "Close"): df[c] = df[c].to_numpy() * ratio
+        events = chart.get("events") or {}
+        df["Dividends"] = 0.0; df["Stock Splits"] = 0.0
+        for col, key in (("Dividends", "dividends"), ("Stock Splits", "splits")):
+            for ev in (events.get(key) or {}).values():
+                d = pd.Timestamp(ev["date"], unit="s", tz="UTC").tz_convert(tz).normalize().tz_localize(None)
+                amount = ev.get("amount") if key == "dividends" else \
+                    ev.get("numerator", 1) / (ev.get("denominator") or 1)
+                if d in df.index: df.loc[d, col] = float(amount or 0.0)
+        return df.dropna(subset=["Close"])
+
+    async def _sync_history(self, ticker: str):
+        # La E/S del store (memmap y ficheros con flock) va a un hilo, fuera del event loop
+        store = self.history_store
+        start = await asyncio.to_thread(store.sync_start, ticker)
+        if start is None:
+            full = self._chart_frame(await self._chart(ticker, period=config.HISTORY_BACKFILL))
+            await asyncio.to_thread(store.upsert, ticker, full, replace=True)
+            return
+        inc = self._chart_frame(await self._chart(ticker, start=start))
+        if not inc.empty: inc = inc[inc.index >= pd.Timestamp(start)]
+        if inc.empty:
+            await asyncio.to_thread(store.touch, ticker)
+        elif inc[["Dividends", "Stock Splits"]].to_numpy().any():
+            # Dividendo o split: los precios ajustados guardados dejan de valer
+            full = self._chart_frame(await self._chart(ticker, period=config.HISTORY_BACKFILL))
+            await asyncio.to_thread(store.upsert, ticker, full, replace=True)
+        else:
+            await asyncio.to_thread(store.upsert, ticker, inc)
+
+    @staticmethod
+    def _adjust_dividends(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Sin adjclose en la respuesta: los cierres de Yahoo ya vienen ajustados por splits,
+        falta el dividendo. Cada uno multiplica lo anterior por 1 - importe / cierre previo.
+        """
+        close, div = df["Close"].to_numpy(), df["Dividends"].to_numpy()
+        factor = np.ones(len(df))
+        factor[1:] = np.where(div[1:] > 0, 1.0 - div[1:] / close[:-1], 1.0)
+        scale = np.append(np.cumprod(factor[::-1])[::-1][1:], 1.0)
+        for c in ("Open", "High", "Low", "Close"): df[c] = df[c].to_numpy() * scale
+        return df
+
+    async def _spark(self, tickers: List[str], period: str) -> Dict[str, pd.DataFrame]:
+        """
+        Cierres diarios ajustados de varios tickers en una sola petición (endpoint spark,
+        formato de chart): con adjclose si Yahoo lo da y, si no, ajustados con los eventos.
+        """
+        resp = await self._get(f"{self.base_url}/v7/finance/spark",
+                               {"symbols": ",".join(tickers), "range": period, "interval": "1d",
+                                "includeAdjustedClose": "true", "events": "div,splits"})
+        out = {}
+        for item in (resp.json().get("spark") or {}).get("result") or []:
+            chart = (item.get("response") or [{}])[0]
+            df = self._chart_frame(chart)
+            if df.empty: continue
+            if not (chart.get("indicators") or {}).get("adjclose"): df = self._adjust_dividends(df)
+            out[item["symbol"]] = df
+        return out
+
+    def _stored(self, tickers: List[str], period: str):
+        """
+        (histórico de los tickers con cierres al día en el store, tickers a descargar, de esos
+        los que no tienen OHLCV completo y pueden guardarse con cierres); E/S síncrona.
+        """
+        store = self.history_store
+        stale = [t for t in tickers if store.needs_sync(t, closes=period)]
+        frames = {t: store.read(t, period) for t in tickers if t not in stale}
+        return frames, stale, {t for t in stale if store.close_only(t)}
+
+    def _save_closes(self, frames: Dict[str, pd.DataFrame], period: str):
+        for t, df in frames.items(): self.history_store.upsert(t, df, replace=True, close_only=period)
+
+    async def iter_history_batches(self, tickers: List[str], period: str = "6mo",
+                                   chunk_size: int = config.HISTORY_BATCH_SIZE) -> AsyncIterator[pd.DataFrame]:
+        """
+        Los tickers con el store al día salen del store, sin petición. El resto, por el endpoint
+        spark: una petición por cada HISTORY_SPARK_SYMBOLS tickers en vez de un chart por ticker.
+        Spark sólo da Close (lo que usa la etapa transversal del scanner): se guarda en el store
+        como close_only para los siguientes escaneos, salvo encima de un OHLCV completo (ese lo
+        sigue poniendo al día get_history). Los tickers de una petición fallida faltan del
+        panel y el scanner los reintenta uno a uno por get_history.
+        """
+        n = config.HISTORY_SPARK_SYMBOLS
+        for i in range(0, len(tickers), chunk_size):
+            chunk = tickers[i:i + chunk_size]
+            frames, stale, writable = await asyncio.to_thread(self._stored, chunk, period)
+            groups = [stale[j:j + n] for j in range(0, len(stale), n)]
+            fetched = {}
+            for got in await asyncio.gather(*(self._spark(g, period) for g in groups), return_exceptions=True):
+                if isinstance(got, dict): fetched.update(got)
+            save = {t: df for t, df in fetched.items() if t in writable}
+            if save: await asyncio.to_thread(self._save_closes, save, period)
+            frames.update({t: df[["Close"]] for t, df in fetched.items()})
+            yield to_panel(frames)
+
+    async def get_history(self, ticker: str, period: str = "1y") -> pd.DataFrame:
+        try:
+            if await asyncio.to_thread(self.history_store.needs_sync, ticker): await self._sync_history(ticker)
+        except UPSTREAM_ERRORS:
+            pass
+        df = await asyncio.to_thread(self.history_store.read, ticker, period)
+        return df if not df.empty else fallback("history", ticker, period)
+
+    # --- SPOT ---
+    async def get_spot_price(self, ticker: str) -> float:
+        try:
+            chart = await self._chart(ticker, period="1d")
+            price = (chart.get("meta") or {}).get("regularMarketPrice")
+            return float(price) if price else fallback("spot")
+        except UPSTREAM_ERRORS:
+            return fallback("spot")
+
+    # --- OPCIONES ---
+    async def _options(self, ticker: str, date: int = None) -> dict:
+        for retry in (False, True):
+            params = await self._crumb_param()
+            if date is not None: params["date"] = date
+            try:
+                resp = await self._get(f"{self.base_url}/v7/finance/options/{ticker}", params)
+                break
+            except httpx.HTTPStatusError as e:
+                # Yahoo rota el crumb: con 401/403 se descarta (si nadie lo ha renovado ya)
+                # y se reintenta una vez con uno nuevo
+                if retry or e.response.status_code not in (401, 403): raise
+                if self._crumb == params.get("crumb"): self._crumb = None
+        result = (resp.json().get("optionChain") or {}).get("result") or []
+        return result[0] if result else {}
+
+    @staticmethod
+    def _legs(result: dict):
+        opts = (result.get("options") or [{}])[0]
+        def frame(rows):
+            df = pd.DataFrame(rows or [], columns=OPTION_FIELDS)
+            return df.reindex(columns=OPTION_FIELDS)
+        return frame(opts.get("calls")), frame(opts.get("puts"))
+
+    @staticmethod
+    def _exp_str(epoch: int) -> str:
+        return datetime.fromtimestamp(int(epoch), tz=timezone.utc).date().isoformat()
+
+    async def get_options_chain(self, ticker: str, expiration: str = None):
+        try:
+            if expiration is None:
+                result = await self._options(ticker)
+            else:
+                date = int(pd.Timestamp(expiration).tz_localize("UTC").timestamp())
+                result = await self._options(ticker, date)
+            if not result: return fallback("chain")
+            return OptionChain(*self._legs(result))
+        except UPSTREAM_ERRORS:
+            return fallback("chain")
+
+    async def get_aggregated_options(self, ticker: str, max_dte: int = config.DEFAULT_MAX_DTE) -> pd.DataFrame:
+        """
+        La primera respuesta trae los vencimientos y la cadena del más cercano; el resto
+        de vencimientos dentro de la ventana de DTE se piden todos a la vez.
+        """
+        try:
+            first = await self._options(ticker)
+            epochs = {self._exp_str(e): e for e in first.get("expirationDates") or []}
+            first_exp = self._exp_str((first.get("options") or [{}])[0].get("expirationDate", 0))
+        except UPSTREAM_ERRORS:
+            return fallback("contracts")
+        if not epochs: return empty_contracts()
+        selected = select_expiries(list(epochs), max_dte, market_today())
+
+        async def one(exp, dte):
+            try:
+                result = first if exp == first_exp else await self._options(ticker, epochs[exp])
+                calls, puts = self._legs(result)
+            except UPSTREAM_ERRORS:
+                return None
+            return [df.assign(type=kind, expirationDate=exp, daysToEx=np.int16(dte))
+                    for df, kind in ((calls, "call"), (puts, "put")) if not df.empty]
+
+        legs = await asyncio.gather(*(one(exp, dte) for exp, dte in selected))
+        # Fallaron todos los vencimientos: respaldo marcado, no una cadena vacía que se cachee
+        if all(group is None for group in legs): return fallback("contracts")
+        frames = [f for group in legs if group for f in group]
+        return normalize_contracts(frames) if frames else empty_contracts()
+
+    # --- UNIVERSO ---
+    async def get_sp500_tickers(self) -> List[Dict]:
+        try:
+            resp = await self._get(self.universe_url)
+            df = pd.read_csv(io.StringIO(resp.text))
+            df = df.rename(columns={"Symbol": "Ticker", "GICS Sector": "Sector"})
+            df['Ticker'] = df['Ticker'].str.replace('.', '-', regex=False)
+            df = df[df['Ticker'] != 'GOOG']
+            return df[['Ticker', 'Sector']].to_dict('records')
+        except UPSTREAM_ERRORS:
+            return fallback("universe")
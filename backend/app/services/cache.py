@@ -0,0 +1,416 @@
+# Archivo: backend/app/services/cache.py
+import os
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Iterator, Optional
+
+import diskcache
+import pandas as pd
+
+from app.core import config
+from app.core.market_hours import next_session_close
+from app.core.metrics import stage
+from app.services.contract_store import ContractStore
+from app.services.data_provider import MarketDataProvider, is_mock, split_panel, to_panel
+from app.services.governor import BACKGROUND, fetch_priority
+from app.services.singleflight import SingleFlight
+
+KEY_VERSION = "md:v2"
+
+
+def _detach(value):
+    """
+    Copia superficial de DataFrames para que el llamador pueda añadir columnas
+    (SMA20, sign...) sin modificar el objeto que vive en la caché.
+    """
+    if isinstance(value, pd.DataFrame): return value.copy(deep=False)
+    if isinstance(value, tuple) and hasattr(value, "_fields"):
+        return type(value)(*(_detach(v) for v in value))
+    return value
+
+
+def cache_policy(kind: str, now: float):
+    """Retorna (expires_at, keep_until) para un valor recién descargado."""
+    if kind == "spot":
+        exp = now + config.CACHE_TTL_SPOT
+        return exp, exp + config.CACHE_STALE_SPOT
+    if kind == "chain":
+        exp = now + config.CACHE_TTL_CHAIN
+        return exp, exp + config.CACHE_STALE_CHAIN
+    if kind == "history":
+        exp = next_session_close(now)
+        return exp, exp + config.CACHE_STALE_HISTORY
+    exp = now + config.CACHE_TTL_UNIVERSE
+    return exp, exp + config.CACHE_STALE_UNIVERSE
+
+
+def stale_window(kind: str) -> float:
+    return {"spot": config.CACHE_STALE_SPOT, "chain": config.CACHE_STALE_CHAIN,
+            "history": config.CACHE_STALE_HISTORY}.get(kind, config.CACHE_STALE_UNIVERSE)
+
+
+class CacheStats:
+    """Contadores de aciertos/fallos por tipo de dato (spot, history, chain...)."""
+    FIELDS = ("hit_memory", "hit_disk", "stale", "miss", "refresh", "refresh_error", "fallback")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+
+    def incr(self, kind: str, field: str, n: int = 1):
+        with self._lock:
+            bucket = self._counts.setdefault(kind, dict.fromkeys(self.FIELDS, 0))
+            bucket[field] += n
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            out = {}
+            for kind, bucket in self._counts.items():
+                b = dict(bucket)
+                hits = b["hit_memory"] + b["hit_disk"] + b["stale"]
+                total = hits + b["miss"]
+                b["hit_ratio"] = hits / total if total else 0.0
+                out[kind] = b
+            return out
+
+
+class TieredCache:
+    """
+    LRU en memoria por delante de diskcache. Cada entrada es (valor, expires_at);
+    la caducidad lógica la decide el llamador, el disco sólo purga lo inservible.
+    Las tablas de contratos no van a diskcache sino al ContractStore (columnas compactas
+    en mmap compartidas entre procesos) y la LRU retiene la vista sobre el store.
+    """
+    def __init__(self, directory: str = None, memory_items: int = None, size_limit: int = None,
+                 contracts: ContractStore = None):
+        directory = directory or config.CACHE_DIR
+        self.memory_items = memory_items or config.CACHE_MEMORY_ITEMS
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        try:
+            self._disk = diskcache.Cache(directory, size_limit=size_limit or config.CACHE_DISK_SIZE_LIMIT)
+        except Exception:
+            # Sin disco (permisos, volumen no montado...) seguimos sólo con memoria
+            self._disk = None
+        self.contracts = contracts
+        if contracts is None and self._disk is not None and config.CONTRACT_STORE_ROWS > 0:
+            try: self.contracts = ContractStore(os.path.join(directory, "contracts"))
+            except Exception: self.contracts = None
+
+    def peek(self, key):
+        """Sólo la LRU en memoria, sin E/S: (entry, 'memory') o (None, None)."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None: return None, None
+            self._memory.move_to_end(key)
+            return entry, "memory"
+
+    def get(self, key):
+        """Retorna (entry, tier) con tier en {'memory', 'disk'} o (None, None)."""
+        entry, tier = self.peek(key)
+        if entry is not None: return entry, tier
+        if self.contracts is not None:
+            try: entry = self.contracts.get(key)
+            except Exception: entry = None
+            if entry is not None:
+                self._remember(key, entry)
+                return entry, "disk"
+        if self._disk is None: return None, None
+        try:
+            entry = self._disk.get(key)
+        except Exception:
+            entry = None
+        if entry is None: return None, None
+        self._remember(key, entry)
+        return entry, "disk"
+
+    def set(self, key, value, expires_at: float, keep_until: float, persist: bool = True):
+        if persist and self.contracts is not None and self.contracts.accepts(value):
+            try:
+                self._remember(key, (self.contracts.put(key, value, expires_at, keep_until), expires_at))
+                return
+            except Exception:
+                pass  # disco lleno, permisos...: sigue por diskcache
+        entry = (value, expires_at)
+        self._remember(key, entry)
+        if self._disk is None or not persist: return
+        try:
+            self._disk.set(key, entry, expire=max(keep_until - time.time(), 1.0))
+        except Exception:
+            # Valores no serializables se quedan sólo en memoria
+            pass
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def clear_memory(self):
+        with self._lock:
+            self._memory.clear()
+
+
+class CachedProvider(MarketDataProvider):
+    """
+    Envoltorio de caché sobre cualquier MarketDataProvider.
+    - TTL propio por tipo de dato (spot en segundos, cadenas en minutos, histórico hasta el cierre).
+    - Stale-while-revalidate: un valor caducado dentro de su ventana se sirve al momento
+      y se refresca en segundo plano, la petición nunca espera al refresco.
+    - Single-flight: fallos concurrentes de la misma clave comparten una única descarga.
+    """
+    def __init__(self, inner: MarketDataProvider, cache: TieredCache = None,
+                 stats: CacheStats = None, flight: SingleFlight = None):
+        self.inner = inner
+        self.cache = cache or TieredCache()
+        self.stats = stats or CacheStats()
+        self.flight = flight or SingleFlight()
+        self._refresh_pool = ThreadPoolExecutor(max_workers=config.CACHE_REFRESH_WORKERS,
+                                                thread_name_prefix="cache-refresh")
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
+
+    # --- NÚCLEO ---
+    def _cached(self, kind: str, key: tuple, loader):
+        key = (KEY_VERSION, kind) + key
+        now = time.time()
+        entry, tier = self.cache.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if now < expires_at:
+                self.stats.incr(kind, "hit_" + tier)
+                return _detach(value)
+            if now < expires_at + stale_window(kind):
+                self.stats.incr(kind, "stale")
+                self._schedule_refresh(kind, key, loader)
+                return _detach(value)
+        self.stats.incr(kind, "miss")
+        return _detach(self._load(kind, key, loader))
+
+    def _persist(self, kind: str) -> bool:
+        # El histórico ya tiene su propio store en disco (HistoryStore): aquí sólo la LRU
+        return kind != "history" or getattr(self.inner, "history_store", None) is None
+
+    def _load(self, kind: str, key: tuple, loader):
+        def _fetch():
+            # Sólo los fallos de caché llegan aquí: es el tiempo real de descarga
+            with stage("fetch." + kind): value = loader()
+            if is_mock(value):
+                # Respaldo por fallo del upstream: se sirve marcado pero no se guarda
+                self.stats.incr(kind, "fallback")
+                return value
+            expires_at, keep_until = cache_policy(kind, time.time())
+            self.cache.set(key, value, expires_at, keep_until, persist=self._persist(kind))
+            return value
+        return self.flight.do(key, _fetch)
+
+    def _schedule_refresh(self, kind: str, key: tuple, loader):
+        with self._refresh_lock:
+            if key in self._refreshing: return
+            self._refreshing.add(key)
+
+        def _run():
+            # Los refrescos no deben competir con las peticiones de la página abierta
+            fetch_priority.set(BACKGROUND)
+            try:
+                fresh = self._load(kind, key, loader)
+                self.stats.incr(kind, "refresh_error" if is_mock(fresh) else "refresh")
+            except Exception:
+                self.stats.incr(kind, "refresh_error")
+            finally:
+                with self._refresh_lock:
+                    self._refreshing.discard(key)
+
+        self._refresh_pool.submit(_run)
+
+    # --- INTERFAZ MarketDataProvider ---
+    def get_history(self, ticker: str, period: str = "1y"):
+        return self._cached("history", (ticker, period), lambda: self.inner.get_history(ticker, period))
+
+    def iter_history_batches(self, tickers: List[str], period: str = "6mo",
+                             chunk_size: int = config.HISTORY_BATCH_SIZE) -> Iterator[pd.DataFrame]:
+        """
+        Primero un panel con los tickers ya cacheados (frescos o dentro de su ventana stale),
+        después sólo los que faltan, descargados por lotes y guardados ticker a ticker.
+        """
+        now = time.time()
+        cached, missing = {}, []
+        for t in tickers:
+            entry, tier = self.cache.get((KEY_VERSION, "history", t, period))
+            if entry is not None and now < entry[1] + config.CACHE_STALE_HISTORY:
+                if now < entry[1]:
+                    self.stats.incr("history", "hit_" + tier)
+                else:
+                    self.stats.incr("history", "stale")
+                    self._schedule_refresh("history", (KEY_VERSION, "history", t, period),
+                                           lambda t=t: self.inner.get_history(t, period))
+                cached[t] = entry[0]
+            else:
+                missing.append(t)
+        if cached: yield to_panel(cached)
+        if not missing: return
+        self.stats.incr("history", "miss", len(missing))
+        for panel in self.inner.iter_history_batches(missing, period, chunk_size):
+            expires_at, keep_until = cache_policy("history", time.time())
+            for t, df in split_panel(panel).items():
+                self.cache.set((KEY_VERSION, "history", t, period), df, expires_at, keep_until,
+                               persist=self._persist("history"))
+            yield panel
+
+    def get_spot_price(self, ticker: str) -> float:
+        return self._cached("spot", (ticker,), lambda: self.inner.get_spot_price(ticker))
+
+    def get_options_chain(self, ticker: str, expiration: str = None):
+        return self._cached("chain", (ticker, expiration), lambda: self.inner.get_options_chain(ticker, expiration))
+
+    def get_aggregated_options(self, ticker: str, max_dte: int = config.DEFAULT_MAX_DTE):
+        return self._cached("chain", (ticker, "aggregated", max_dte),
+                            lambda: self.inner.get_aggregated_options(ticker, max_dte))
+
+    def get_sp500_tickers(self) -> List[Dict]:
+        return self._cached("universe", ("sp500",), self.inner.get_sp500_tickers)
+
+    def cache_stats(self) -> Dict[str, Dict[str, float]]:
+        out = self.stats.snapshot()
+        out["singleflight"] = self.flight.stats()
+        if self.cache.contracts is not None: out["contract_store"] = self.cache.contracts.stats()
+        return out
+
+
+class AsyncCachedProvider:
+    """
+    Misma caché que CachedProvider para un AsyncMarketDataProvider: comparten TieredCache,
+    contadores y SingleFlight, así que una descarga en vuelo desde un hilo del scanner
+    y otra desde una corrutina de /asset se coalescen en una sola. En el event loop sólo
+    se consulta la LRU en memoria; el ContractStore (flock, índice, compactación) y
+    diskcache (SQLite) se leen y escriben en un hilo.
+    """
+    def __init__(self, inner, cache: TieredCache = None, stats: CacheStats = None,
+                 flight: SingleFlight = None):
+        self.inner = inner
+        self.cache = cache or TieredCache()
+        self.stats = stats or CacheStats()
+        self.flight = flight or SingleFlight()
+        self._refreshing = set()
+        self._tasks = set()
+
+    def _persist(self, kind: str) -> bool:
+        return kind != "history" or getattr(self.inner, "history_store", None) is None
+
+    async def _get(self, key):
+        entry, tier = self.cache.peek(key)
+        if entry is None: entry, tier = await asyncio.to_thread(self.cache.get, key)
+        return entry, tier
+
+    async def _cached(self, kind: str, key: tuple, loader):
+        key = (KEY_VERSION, kind) + key
+        now = time.time()
+        entry, tier = await self._get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if now < expires_at:
+                self.stats.incr(kind, "hit_" + tier)
+                return _detach(value)
+            if now < expires_at + stale_window(kind):
+                self.stats.incr(kind, "stale")
+                self._schedule_refresh(kind, key, loader)
+                return _detach(value)
+        self.stats.incr(kind, "miss")
+        return _detach(await self._load(kind, key, loader))
+
+    async def _load(self, kind: str, key: tuple, loader):
+        async def _fetch():
+            with stage("fetch." + kind): value = await loader()
+            if is_mock(value):
+                self.stats.incr(kind, "fallback")
+                return value
+            expires_at, keep_until = cache_policy(kind, time.time())
+            await asyncio.to_thread(self.cache.set, key, value, expires_at, keep_until, persist=self._persist(kind))
+            return value
+        return await self.flight.do_async(key, _fetch)
+
+    def _schedule_refresh(self, kind: str, key: tuple, loader):
+        if key in self._refreshing: return
+        self._refreshing.add(key)
+
+        async def _run():
+            # Los refrescos no deben competir con las peticiones de la página abierta
+            fetch_priority.set(BACKGROUND)
+            try:
+                fresh = await self._load(kind, key, loader)
+                self.stats.incr(kind, "refresh_error" if is_mock(fresh) else "refresh")
+            except Exception:
+                self.stats.incr(kind, "refresh_error")
+            finally:
+                self._refreshing.discard(key)
+
+        task = asyncio.create_task(_run())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def data_version(self, kind: str, key: tuple) -> Optional[float]:
+        """
+        Caducidad de la entrada en caché (None si no hay): cambia cada vez que el dato se
+        recarga, así que sirve como versión para cachear lo que se calcula a partir de él.
+        """
+        entry, _ = await self._get((KEY_VERSION, kind) + key)
+        return entry[1] if entry is not None else None
+
+    # --- INTERFAZ AsyncMarketDataProvider ---
+    async def get_history(self, ticker: str, period: str = "1y"):
+        return await self._cached("history", (ticker, period), lambda: self.inner.get_history(ticker, period))
+
+    async def iter_history_batches(self, tickers: List[str], period: str = "6mo",
+                                   chunk_size: int = config.HISTORY_BATCH_SIZE):
+        """
+        Como CachedProvider: primero un panel con lo ya cacheado y después el resto por lotes
+        del proveedor (con Yahoo, una petición spark por grupo de tickers). Lo que llega por
+        lotes no se cachea: puede traer sólo Close y la entrada de histórico es el OHLCV completo.
+        """
+        keys = [(KEY_VERSION, "history", t, period) for t in tickers]
+        lookups = [self.cache.peek(k) for k in keys]
+        if any(entry is None for entry, _ in lookups):
+            lookups = await asyncio.to_thread(lambda: [self.cache.get(k) for k in keys])
+        now = time.time()
+        cached, missing = {}, []
+        for t, key, (entry, tier) in zip(tickers, keys, lookups):
+            if entry is not None and now < entry[1] + config.CACHE_STALE_HISTORY:
+                if now < entry[1]:
+                    self.stats.incr("history", "hit_" + tier)
+                else:
+                    self.stats.incr("history", "stale")
+                    self._schedule_refresh("history", key, lambda t=t: self.inner.get_history(t, period))
+                cached[t] = entry[0]
+            else:
+                missing.append(t)
+        if cached: yield to_panel(cached)
+        if not missing: return
+        self.stats.incr("history", "miss", len(missing))
+        async for panel in self.inner.iter_history_batches(missing, period, chunk_size):
+            yield panel
+
+    async def get_spot_price(self, ticker: str) -> float:
+        return await self._cached("spot", (ticker,), lambda: self.inner.get_spot_price(ticker))
+
+    async def get_options_chain(self, ticker: str, expiration: str = None):
+        return await self._cached("chain", (ticker, expiration), lambda: self.inner.get_options_chain(ticker, expiration))
+
+    async def get_aggregated_options(self, ticker: str, max_dte: int = config.DEFAULT_MAX_DTE):
+        return await self._cached("chain", (ticker, "aggregated", max_dte),
+                                  lambda: self.inner.get_aggregated_options(ticker, max_dte))
+
+    async def get_sp500_tickers(self) -> List[Dict]:
+        return await self._cached("universe", ("sp500",), self.inner.get_sp500_tickers)
+
+    def cache_stats(self) -> Dict[str, Dict[str, float]]:
+        out = self.stats.snapshot()
+        out["singleflight"] = self.flight.stats()
+        if self.cache.contracts is not None: out["contract_store"] = self.cache.contracts.stats()
+        return out
+
+    async def aclose(self):
+        await self.inner.aclose()
@@ -0,0 +1,132 @@
+# Archivo: backend/app/services/chain_engine.py
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import Callable, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.core import config
+from app.core.engine import BlackScholes
+from app.core.market_hours import market_today
+
+# Esquema de la tabla de contratos que consume todo el análisis (GEX, walls, IV...).
+# Compacto a propósito: el motor convierte a float64 sólo los arrays que usa, y así la
+# tabla ocupa ~30 bytes por contrato en la caché (tipo y vencimiento van como categorías)
+CONTRACT_DTYPES = {
+    "strike": "float32",
+    "lastPrice": "float32",
+    "bid": "float32",
+    "ask": "float32",
+    "volume": "int32",
+    "openInterest": "int32",
+    "impliedVolatility": "float32",
+    "daysToEx": "int16",
+}
+CONTRACT_TYPES = pd.CategoricalDtype(["call", "put"])
+
+
+def select_expiries(expirations, max_dte: int, today: date = None) -> List[Tuple[str, int]]:
+    """
+    Filtra los vencimientos por ventana de DTE [0, max_dte].
+    Si la ventana queda vacía se usa el vencimiento más cercano para no quedarnos sin walls.
+    """
+    today = today or market_today()
+    out = []
+    for exp in expirations or []:
+        try: dte = (date.fromisoformat(str(exp)[:10]) - today).days
+        except ValueError: continue
+        if dte < 0: continue
+        out.append((exp, dte))
+    out.sort(key=lambda x: x[1])
+    in_window = [e for e in out if e[1] <= max_dte]
+    return in_window if in_window else out[:1]
+
+
+def empty_contracts() -> pd.DataFrame:
+    df = pd.DataFrame({c: pd.Series(dtype=t) for c, t in CONTRACT_DTYPES.items()})
+    df["type"] = pd.Series(dtype=CONTRACT_TYPES)
+    df["expirationDate"] = pd.Series(dtype="category")
+    return df
+
+
+def normalize_contracts(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """Concatena y tipa las patas de cada vencimiento, descartando columnas que no usamos."""
+    frames = [f for f in frames if f is not None and not f.empty]
+    if not frames: return empty_contracts()
+    df = pd.concat(frames, ignore_index=True)
+    out = pd.DataFrame(index=df.index)
+    for c, t in CONTRACT_DTYPES.items():
+        col = pd.to_numeric(df[c], errors="coerce") if c in df.columns else pd.Series(0, index=df.index)
+        out[c] = col.fillna(0).astype(t)
+    out["type"] = df["type"].astype(CONTRACT_TYPES)
+    out["expirationDate"] = pd.Categorical(df["expirationDate"].astype(str).to_numpy())
+    return out
+
+
+def option_prices(df: pd.DataFrame) -> np.ndarray:
+    """Precio de cada contrato: mid si hay cotización bid/ask coherente, si no el último cruzado."""
+    bid, ask = df["bid"].to_numpy(np.float64), df["ask"].to_numpy(np.float64)
+    return np.where((bid > 0) & (ask >= bid), 0.5 * (bid + ask), df["lastPrice"].to_numpy(np.float64))
+
+
+def expiry_days(symbols, today: date = None) -> np.ndarray:
+    """DTE a partir del símbolo OCC (RAIZ + AAMMDD + C/P + strike·1000 en 8 dígitos); NaN si no se reconoce."""
+    today = pd.Timestamp(today or market_today())
+    s = pd.Series(symbols, dtype="object").astype(str)
+    exp = pd.to_datetime(s.str.slice(-15, -9), format="%y%m%d", errors="coerce")
+    return ((exp - today).dt.days).to_numpy(np.float64, na_value=np.nan)
+
+
+def implied_vols(df: pd.DataFrame, spot: float, r: float = 0.045, is_call=None, days=None) -> np.ndarray:
+    """
+    IV por contrato invertida desde option_prices con BlackScholes.implied_vol; donde no
+    converge (o sin DTE) se queda la columna impliedVolatility de Yahoo. Con
+    IV_SOURCE="yahoo" se usa siempre la de Yahoo.
+    """
+    yahoo = df["impliedVolatility"].to_numpy(np.float64)
+    if config.IV_SOURCE != "solve" or not spot or df.empty: return yahoo
+    if is_call is None: is_call = df["type"].to_numpy() == "call"
+    days = df["daysToEx"].to_numpy(np.float64) if days is None else np.asarray(days, dtype=np.float64)
+    iv, ok = BlackScholes.implied_vol(option_prices(df), spot, df["strike"].to_numpy(np.float64),
+                                      days / 365.0, r, is_call)
+    return np.where(ok, iv, yahoo)
+
+
+class ChainFetchEngine:
+    """
+    Descarga de cadenas en paralelo: una petición por vencimiento (calls y puts juntas)
+    y un pool acotado compartido por todos los tickers, de modo que varias peticiones
+    simultáneas nunca superan el presupuesto de conexiones contra el upstream.
+    """
+    def __init__(self, max_workers: int = None):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers or config.CHAIN_FETCH_WORKERS,
+                                        thread_name_prefix="chain-fetch")
+
+    def fetch(self, expirations, fetch_expiry: Callable, max_dte: int, today: date = None) -> pd.DataFrame:
+        """
+        fetch_expiry(exp) -> (calls_df, puts_df). Los vencimientos que fallan se omiten; si
+        fallan todos se relanza el último error (es un fallo del upstream, no una cadena vacía).
+        Retorna la tabla de contratos tipada con 'type', 'expirationDate' y 'daysToEx'.
+        """
+        selected = select_expiries(expirations, max_dte, today)
+        if not selected: return empty_contracts()
+
+        def _one(exp, dte):
+            calls, puts = fetch_expiry(exp)
+            legs = []
+            for df, kind in ((calls, "call"), (puts, "put")):
+                if df is None or df.empty: continue
+                legs.append(df.assign(type=kind, expirationDate=exp, daysToEx=np.int16(dte)))
+            return legs
+
+        # Cada descarga corre con una copia del contexto del llamador: así hereda su
+        # fetch_priority (un refresco en segundo plano no gasta las fichas interactivas)
+        futures = [self._pool.submit(contextvars.copy_context().run, _one, exp, dte) for exp, dte in selected]
+        frames, errors = [], []
+        for f in futures:
+            try: frames.extend(f.result())
+            except Exception as e: errors.append(e)
+        if len(errors) == len(futures): raise errors[-1]
+        return normalize_contracts(frames)
@@ -0,0 +1,181 @@
+# Archivo: backend/app/services/contract_store.py
+"""
+Store de tablas de contratos (cadenas agregadas) compartido entre procesos: columnas
+compactas de CONTRACT_DTYPES más los códigos de tipo y de vencimiento, en ficheros que
+todos los workers (uvicorn y escaneo) mapean en memoria. Cada lectura es una vista sin
+copia sobre las filas de la entrada y las páginas viven una sola vez en la caché del SO.
+
+Disposición: {root}/arena-{gen}/{columna}.bin, append-only, e index.json con
+{gen, rows, entries: {clave: [offset, filas, expires_at, keep_until, vencimientos]}}:
+clave -> offset hace el slice O(1). Una entrada nueva se escribe al final de la arena y se
+publica reemplazando el índice (la versión anterior queda huérfana). Cuando la arena supera
+max_rows se compacta: las entradas vivas se copian a una arena nueva y la vieja se borra
+(los mapas ya abiertos siguen siendo válidos en POSIX).
+"""
+import os
+import json
+import time
+import shutil
+import threading
+from contextlib import contextmanager
+from typing import Hashable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.core import config
+from app.services.chain_engine import CONTRACT_DTYPES, CONTRACT_TYPES, empty_contracts
+
+try:
+    import fcntl
+except ImportError:  # Windows: sólo bloqueo entre hilos
+    fcntl = None
+
+# Columnas en disco: el esquema numérico de la tabla y los códigos de las dos categorías
+COLUMNS = {**{c: np.dtype(t).newbyteorder("<") for c, t in CONTRACT_DTYPES.items()},
+           "type": np.dtype("i1"), "expiry": np.dtype("<i2")}
+SCHEMA = set(CONTRACT_DTYPES) | {"type", "expirationDate"}
+
+
+def _key(key: Hashable) -> str:
+    return "|".join(map(str, key)) if isinstance(key, tuple) else str(key)
+
+
+class ContractStore:
+    def __init__(self, root: str = None, max_rows: int = None):
+        self.root = root or os.path.join(config.CACHE_DIR, "contracts")
+        self.max_rows = max_rows or config.CONTRACT_STORE_ROWS
+        os.makedirs(self.root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._index = {"gen": 0, "rows": 0, "entries": {}}
+        self._stamp = None
+        self._maps, self._maps_gen = {}, None
+
+    @staticmethod
+    def accepts(value) -> bool:
+        """Sólo tablas con el esquema de normalize_contracts (el resto sigue en diskcache)."""
+        return isinstance(value, pd.DataFrame) and SCHEMA.issubset(value.columns)
+
+    # --- ÍNDICE / MAPAS ---
+    def _path(self, *parts) -> str:
+        return os.path.join(self.root, *parts)
+
+    def _load_index(self) -> dict:
+        """index.json sólo se relee si otro proceso lo ha reemplazado (un stat por lectura)."""
+        try: st = os.stat(self._path("index.json"))
+        except OSError: return self._index
+        stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if stamp != self._stamp:
+            try:
+                with open(self._path("index.json")) as f: self._index = json.load(f)
+            except (OSError, ValueError):
+                return self._index
+            self._stamp = stamp
+        return self._index
+
+    def _write_index(self, index: dict):
+        path = self._path("index.json")
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f: json.dump(index, f)
+        os.replace(tmp, path)
+
+    @contextmanager
+    def _file_lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(self._path(".lock"), "w") as lf:
+            fcntl.flock(lf, fcntl.LOCK_EX)
+            try: yield
+            finally: fcntl.flock(lf, fcntl.LOCK_UN)
+
+    def _column(self, gen: int, name: str, rows: int) -> np.ndarray:
+        """memmap de la columna en la arena gen; se rehace si la arena creció por detrás del mapa."""
+        if self._maps_gen != gen: self._maps, self._maps_gen = {}, gen
+        m = self._maps.get(name)
+        if m is None or len(m) < rows:
+            m = self._maps[name] = np.memmap(self._path(f"arena-{gen}", f"{name}.bin"), dtype=COLUMNS[name], mode="r")
+        return m
+
+    # --- LECTURA ---
+    def get(self, key: Hashable) -> Optional[Tuple[pd.DataFrame, float]]:
+        """(tabla, expires_at) con las columnas como vistas sobre el mmap, o None."""
+        k = _key(key)
+        for _ in range(2):
+            with self._lock:
+                index = self._load_index()
+                entry = index["entries"].get(k)
+                if entry is None: return None
+                offset, rows, expires_at, keep_until, expirations = entry
+                if time.time() >= keep_until: return None
+                if rows == 0: return empty_contracts(), expires_at
+                try:
+                    # asarray: vistas ndarray normales (no memmap) que mantienen vivo el mapa
+                    cols = {c: np.asarray(self._column(index["gen"], c, offset + rows)[offset:offset + rows])
+                            for c in COLUMNS}
+                except (OSError, ValueError):
+                    # Compactación concurrente: la arena de este índice ya no existe, se relee
+                    self._stamp = None
+                    continue
+            frame = {c: cols[c] for c in CONTRACT_DTYPES}
+            frame["type"] = pd.Categorical.from_codes(cols["type"], dtype=CONTRACT_TYPES)
+            frame["expirationDate"] = pd.Categorical.from_codes(cols["expiry"], categories=expirations)
+            return pd.DataFrame(frame, copy=False), expires_at
+        return None
+
+    def stats(self) -> dict:
+        with self._lock: index = self._load_index()
+        entries = index["entries"].values()
+        live = sum(e[1] for e in entries)
+        return {"generation": index["gen"], "entries": len(index["entries"]), "rows": index["rows"],
+                "live_rows": live, "bytes": index["rows"] * sum(d.itemsize for d in COLUMNS.values())}
+
+    # --- ESCRITURA ---
+    def put(self, key: Hashable, df: pd.DataFrame, expires_at: float, keep_until: float) -> pd.DataFrame:
+        """Guarda la tabla y retorna su vista sobre el store (la que conviene retener en memoria)."""
+        expirations, codes = np.unique(df["expirationDate"].to_numpy().astype(str), return_inverse=True)
+        arrays = {c: df[c].to_numpy(COLUMNS[c]) for c in CONTRACT_DTYPES}
+        arrays["type"] = df["type"].astype(CONTRACT_TYPES).cat.codes.to_numpy(COLUMNS["type"])
+        arrays["expiry"] = codes.astype(COLUMNS["expiry"])
+        n = len(df)
+        with self._lock, self._file_lock():
+            index, now = self._load_index(), time.time()
+            if index["rows"] + n > self.max_rows: index = self._compact(index, now)
+            gen, offset = index["gen"], index["rows"]
+            d = self._path(f"arena-{gen}")
+            os.makedirs(d, exist_ok=True)
+            # Primero las filas y después el índice que las publica
+            for c, values in arrays.items():
+                self._write_at(os.path.join(d, f"{c}.bin"), offset * COLUMNS[c].itemsize, values.tobytes())
+            entries = {k: e for k, e in index["entries"].items() if e[3] > now}
+            entries[_key(key)] = [offset, n, expires_at, keep_until, expirations.tolist()]
+            self._write_index({"gen": gen, "rows": offset + n, "entries": entries})
+        stored = self.get(key)
+        return stored[0] if stored is not None else df
+
+    def _compact(self, index: dict, now: float) -> dict:
+        """Copia las entradas vivas a la arena gen + 1 y borra la anterior tras publicar el índice."""
+        old, gen = index["gen"], index["gen"] + 1
+        live = {k: e for k, e in index["entries"].items() if e[3] > now}
+        d = self._path(f"arena-{gen}")
+        os.makedirs(d, exist_ok=True)
+        entries, rows = {}, 0
+        for k, e in live.items():
+            entries[k] = [rows] + e[1:]
+            rows += e[1]
+        for c, dtype in COLUMNS.items():
+            with open(os.path.join(d, f"{c}.bin"), "wb") as out:
+                if not rows: continue
+                src = np.memmap(self._path(f"arena-{old}", f"{c}.bin"), dtype=dtype, mode="r")
+                for e in live.values(): out.write(src[e[0]:e[0] + e[1]].tobytes())
+        index = {"gen": gen, "rows": rows, "entries": entries}
+        self._write_index(index)
+        shutil.rmtree(self._path(f"arena-{old}"), ignore_errors=True)
+        return index
+
+    @staticmethod
+    def _write_at(path: str, offset: int, payload: bytes):
+        # Sin truncar: otros procesos pueden tener mapeado el fichero entero
+        with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+            f.seek(offset)
+            f.write(payload)
@@ -2,8 +2,88 @@ import yfinance as yf
 import pandas as pd
 import numpy as np
 from abc import ABC, abstractmethod
-from typing import List, Dict
+from typing import List, Dict, Iterator
 from collections import namedtuple
+from app.core import config
+from app.services.chain_engine import ChainFetchEngine, empty_contracts
+from app.services.history_store import HistoryStore
+from app.services.governor import UpstreamGovernor
+
+# Tipo de nivel de módulo para que las cadenas (reales o de respaldo) sean serializables en la caché
+OptionChain = namedtuple('OptionChain', ['calls', 'puts'])
+
+# --- DATOS DE RESPALDO (MOCK) ---
+# Sólo se sirven si el upstream falla tras los reintentos y ALLOW_MOCK_DATA está activo,
+# y siempre marcados: is_mock() los reconoce, la caché no los guarda y las respuestas
+# los señalan. Con ALLOW_MOCK_DATA=0 se retornan centinelas vacíos igual de marcados
+# (spot 0, DataFrames vacíos), para que un fallo tampoco quede cacheado como dato real.
+class MockPrice(float):
+    """Spot de respaldo: se comporta como un float normal."""
+    mock = True
+
+class MockUniverse(list):
+    mock = True
+
+def flag_mock(df: pd.DataFrame) -> pd.DataFrame:
+    df.attrs["mock"] = True
+    return df
+
+def is_mock(value) -> bool:
+    if isinstance(value, OptionChain): value = value.calls
+    if isinstance(value, pd.DataFrame): return bool(value.attrs.get("mock", False))
+    return bool(getattr(value, "mock", False))
+
+def mock_history(ticker: str = None, period: str = None) -> pd.DataFrame:
+    periods = 100
+    dates = pd.date_range(end=pd.Timestamp.now(), periods=periods)
+    data = np.random.randn(periods).cumsum() + 150
+    df = pd.DataFrame(data, index=dates, columns=['Close'])
+    df['Open'] = df['Close'] * 0.99
+    df['High'] = df['Close'] * 1.02
+    df['Low'] = df['Close'] * 0.98
+    df['Volume'] = 1000000
+    return flag_mock(df)
+
+def mock_chain() -> OptionChain:
+    return OptionChain(
+        flag_mock(pd.DataFrame({'strike': [100, 110], 'lastPrice': [10, 5], 'openInterest': [500, 100], 'impliedVolatility': [0.2, 0.2]})),
+        flag_mock(pd.DataFrame({'strike': [90, 80], 'lastPrice': [5, 10], 'openInterest': [100, 500], 'impliedVolatility': [0.2, 0.2]}))
+    )
+
+def fallback(kind: str, ticker: str = None, period: str = None):
+    """
+    Valor a servir cuando el upstream no responde para `kind` (spot, history, chain,
+    contracts, universe). Siempre con is_mock() verdadero, sea cual sea ALLOW_MOCK_DATA.
+    """
+    if kind == "spot": return MockPrice(150.0 if config.ALLOW_MOCK_DATA else 0.0)
+    if kind == "history": return mock_history(ticker, period) if config.ALLOW_MOCK_DATA else flag_mock(pd.DataFrame())
+    if kind == "chain":
+        if config.ALLOW_MOCK_DATA: return mock_chain()
+        return OptionChain(flag_mock(pd.DataFrame()), flag_mock(pd.DataFrame()))
+    # Cadena agregada: no hay versión simulada, la tabla vacía con su esquema
+    if kind == "contracts": return flag_mock(empty_contracts())
+    return MockUniverse([{"Ticker": "SPY", "Sector": "ETF"}, {"Ticker": "AAPL", "Sector": "Tech"}])
+
+def split_panel(panel: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    """Divide un panel ancho (columnas (Ticker, campo)) en un DataFrame OHLCV por ticker."""
+    if panel is None or panel.empty: return {}
+    out = {}
+    for t in panel.columns.get_level_values(0).unique():
+        df = panel[t].dropna(how='all')
+        if not df.empty: out[t] = df
+    return out
+
+def to_panel(frames: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """Une DataFrames OHLCV por ticker en un panel ancho alineado por fecha (sin zona horaria)."""
+    aligned = {}
+    for t, df in frames.items():
+        if df is None or df.empty: continue
+        if getattr(df.index, 'tz', None) is not None:
+            df = df.copy(deep=False)
+            df.index = df.index.tz_localize(None).normalize()
+        aligned[t] = df
+    if not aligned: return pd.DataFrame()
+    return pd.concat(aligned, axis=1)
 
 class MarketDataProvider(ABC):
     @abstractmethod
@@ -11,84 +91,145 @@ class MarketDataProvider(ABC):
     @abstractmethod
     def get_spot_price(self, ticker: str) -> float: pass
     @abstractmethod
-    def get_aggregated_options(self, ticker: str) -> pd.DataFrame: pass
+    def get_aggregated_options(self, ticker: str, max_dte: int = config.DEFAULT_MAX_DTE) -> pd.DataFrame: pass
     @abstractmethod
     def get_options_chain(self, ticker: str, expiration: str = None): pass
     @abstractmethod
-    def get_sp500_tickers() -> List[Dict]: pass
+    def get_sp500_tickers(self) -> List[Dict]: pass
+
+    def iter_history_batches(self, tickers: List[str], period: str = "6mo",
+                             chunk_size: int = config.HISTORY_BATCH_SIZE) -> Iterator[pd.DataFrame]:
+        """
+        Histórico masivo por lotes: produce un panel ancho (Ticker, campo) por lote
+        en cuanto llega, para que el llamador empiece a trabajar sin esperar al resto.
+        Implementación por defecto: ticker a ticker (los proveedores la sobreescriben).
+        """
+        for i in range(0, len(tickers), chunk_size):
+            chunk = tickers[i:i + chunk_size]
+            yield to_panel({t: self.get_history(t, period) for t in chunk})
+
+    def get_history_batch(self, tickers: List[str], period: str = "6mo") -> pd.DataFrame:
+        return to_panel({t: df for panel in self.iter_history_batches(tickers, period)
+                         for t, df in split_panel(panel).items()})
 
 class YFinanceProvider(MarketDataProvider):
-    
-    def _generate_mock_history(self, ticker: str, period: str) -> pd.DataFrame:
-        periods = 100
-        dates = pd.date_range(end=pd.Timestamp.now(), periods=periods)
-        data = np.random.randn(periods).cumsum() + 150
-        df = pd.DataFrame(data, index=dates, columns=['Close'])
-        df['Open'] = df['Close'] * 0.99
-        df['High'] = df['Close'] * 1.02
-        df['Low'] = df['Close'] * 0.98
-        df['Volume'] = 1000000
-        return df
+    def __init__(self, history_store: HistoryStore = None, governor: UpstreamGovernor = None):
+        self.chain_engine = ChainFetchEngine()
+        self.history_store = history_store or HistoryStore()
+        # Toda petición a Yahoo pasa por el governor (tasa, concurrencia adaptativa y reintentos)
+        self.governor = governor or UpstreamGovernor()
+
+    def _sync_history(self, ticker: str):
+        tk = yf.Ticker(ticker)
+        call = self.governor.call
+        self.history_store.sync(
+            ticker,
+            fetch_since=lambda start: call(tk.history, start=start.isoformat(), auto_adjust=True),
+            fetch_full=lambda: call(tk.history, period=config.HISTORY_BACKFILL, auto_adjust=True),
+        )
 
     def get_history(self, ticker: str, period: str = "1y") -> pd.DataFrame:
+        """
+        Lee del store OHLCV local; antes sólo se descargan las velas posteriores a la
+        última guardada (una vez por sesión). Si Yahoo falla se sirve lo que haya en disco.
+        """
         try:
-            tk = yf.Ticker(ticker)
-            df = tk.history(period=period, auto_adjust=True)
-            if df.empty: return self._generate_mock_history(ticker, period)
-            return df
-        except:
-            return self._generate_mock_history(ticker, period)
+            if self.history_store.needs_sync(ticker): self._sync_history(ticker)
+        except Exception: pass
+        df = self.history_store.read(ticker, period)
+        if df.empty: return fallback("history", ticker, period)
+        return df
+
+    def _download(self, tickers: List[str], **kwargs) -> Dict[str, pd.DataFrame]:
+        try:
+            # yf.download hace una petición por ticker: el lote consume tantas fichas como tickers
+            panel = self.governor.call(yf.download, tickers, group_by='ticker', auto_adjust=True, actions=True,
+                                       threads=True, progress=False, cost=len(tickers), **kwargs)
+        except Exception:
+            return {}
+        if panel is None or panel.empty: return {}
+        if not isinstance(panel.columns, pd.MultiIndex):
+            panel = pd.concat({tickers[0]: panel}, axis=1)
+        return split_panel(panel)
+
+    def _sync_history_batch(self, tickers: List[str]):
+        """Pone al día el store para un lote: una petición para los nuevos y otra para el resto."""
+        store = self.history_store
+        starts = {t: store.sync_start(t) for t in tickers}
+        new = [t for t, s in starts.items() if s is None]
+        if new:
+            for t, df in self._download(new, period=config.HISTORY_BACKFILL).items():
+                store.upsert(t, df, replace=True)
+        known = [t for t, s in starts.items() if s is not None]
+        if known:
+            frames = self._download(known, start=min(starts[t] for t in known).isoformat())
+            for t in known:
+                inc = frames.get(t)
+                if inc is not None:
+                    idx = inc.index.tz_localize(None) if inc.index.tz is not None else inc.index
+                    inc = inc[idx.normalize() >= pd.Timestamp(starts[t])]
+                    if 'Close' in inc.columns: inc = inc.dropna(subset=['Close'])
+                store.apply_increment(t, inc, lambda t=t: self.governor.call(
+                    yf.Ticker(t).history, period=config.HISTORY_BACKFILL, auto_adjust=True))
+
+    def iter_history_batches(self, tickers: List[str], period: str = "6mo",
+                             chunk_size: int = config.HISTORY_BATCH_SIZE) -> Iterator[pd.DataFrame]:
+        """
+        Una petición yf.download por lote (en vez de una por ticker) y sólo para los
+        tickers cuyo store está desactualizado; el panel se lee del store local.
+        """
+        for i in range(0, len(tickers), chunk_size):
+            chunk = tickers[i:i + chunk_size]
+            stale = [t for t in chunk if self.history_store.needs_sync(t)]
+            try:
+                if stale: self._sync_history_batch(stale)
+            except Exception: pass
+            yield to_panel({t: self.history_store.read(t, period) for t in chunk})
 
     def get_spot_price(self, ticker: str) -> float:
         try:
             tk = yf.Ticker(ticker)
-            try: return float(tk.fast_info['last_price'])
-            except: pass
-            hist = tk.history(period="1d")
-            return float(hist['Close'].iloc[-1]) if not hist.empty else 150.0
-        except:
-            return 150.0
+            try: return float(self.governor.call(lambda: tk.fast_info['last_price']))
+            except Exception: pass
+            hist = self.governor.call(tk.history, period="1d")
+            return float(hist['Close'].iloc[-1]) if not hist.empty else fallback("spot")
+        except Exception:
+            return fallback("spot")
 
     def get_options_chain(self, ticker: str, expiration: str = None):
         try:
             tk = yf.Ticker(ticker)
             if not expiration:
-                exps = tk.options
+                exps = self.governor.call(lambda: tk.options)
                 if not exps: raise ValueError("No options found")
                 expiration = exps[0]
-            return tk.option_chain(expiration)
-        except:
-            MockChain = namedtuple('MockChain', ['calls', 'puts'])
-            return MockChain(
-                pd.DataFrame({'strike': [100, 110], 'lastPrice': [10, 5], 'openInterest': [500, 100], 'impliedVolatility': [0.2, 0.2]}),
-                pd.DataFrame({'strike': [90, 80], 'lastPrice': [5, 10], 'openInterest': [100, 500], 'impliedVolatility': [0.2, 0.2]})
-            )
-
-    def get_aggregated_options(self, ticker: str) -> pd.DataFrame:
+            chain = self.governor.call(tk.option_chain, expiration)
+            return OptionChain(chain.calls, chain.puts)
+        except Exception:
+            return fallback("chain")
+
+    def get_aggregated_options(self, ticker: str, max_dte: int = config.DEFAULT_MAX_DTE) -> pd.DataFrame:
+        """
+        Tabla única de contratos (calls + puts) de los vencimientos dentro de max_dte,
+        con 'type', 'expirationDate' y 'daysToEx' ya calculados.
+        """
         try:
             tk = yf.Ticker(ticker)
-            exps = tk.options
-            if not exps: return pd.DataFrame()
-            all_opts = []
-            for d in exps[:2]:
-                try:
-                    c = tk.option_chain(d).calls.assign(type='call', expirationDate=d)
-                    p = tk.option_chain(d).puts.assign(type='put', expirationDate=d)
-                    all_opts.extend([c, p])
-                except: continue
-            if not all_opts: return pd.DataFrame()
-            df = pd.concat(all_opts, ignore_index=True)
-            for c in ['strike', 'lastPrice', 'openInterest', 'impliedVolatility']:
-                if c in df.columns: df[c] = pd.to_numeric(df[c], errors='coerce').fillna(0)
-            return df
-        except:
-            return pd.DataFrame()
-
-    @staticmethod
-    def get_sp500_tickers() -> List[Dict]:
+            exps = self.governor.call(lambda: tk.options)
+            if not exps: return empty_contracts()
+
+            def fetch_expiry(d):
+                chain = self.governor.call(tk.option_chain, d)
+                return chain.calls, chain.puts
+
+            return self.chain_engine.fetch(exps, fetch_expiry, max_dte)
+        except Exception:
+            return fallback("contracts")
+
+    def get_sp500_tickers(self) -> List[Dict]:
         try:
-            url = "https://raw.githubusercontent.com/datasets/s-and-p-500-companies/master/data/constituents.csv"
-            df = pd.read_csv(url)
+            url = config.SP500_CSV_URL
+            df = self.governor.call(pd.read_csv, url)
             df = df.rename(columns={"Symbol": "Ticker", "GICS Sector": "Sector"})
             
             # Limpieza: Reemplazar puntos por guiones (BRK.B -> BRK-B)
@@ -98,5 +239,5 @@ class YFinanceProvider(MarketDataProvider):
             df = df[df['Ticker'] != 'GOOG']
             
             return df[['Ticker', 'Sector']].to_dict('records')
-        except:
-            return [{"Ticker": "SPY", "Sector": "ETF"}, {"Ticker": "AAPL", "Sector": "Tech"}]
\ No newline at end of file
+        except Exception:
+            return fallback("universe")
\ No newline at end of file
@@ -0,0 +1,81 @@
+# Archivo: backend/app/services/factory.py
+import os
+from functools import lru_cache
+from app.core import config
+from app.services.data_provider import MarketDataProvider, YFinanceProvider
+from app.services.async_provider import AsyncYahooProvider
+from app.services.cache import CachedProvider, AsyncCachedProvider, TieredCache
+from app.services.history_store import HistoryStore
+from app.services.gex_store import GexSnapshotStore
+from app.services.governor import UpstreamGovernor
+from app.services.scan_registry import ScanRegistry
+from app.services.job_queue import ScanJobQueue
+from app.services.universe import UniverseIndex
+from app.services.replay import AsyncReplayProvider, FaultInjector, ReplayProvider, ReplaySnapshot
+
+
+@lru_cache(maxsize=1)
+def _history_store() -> HistoryStore:
+    return HistoryStore()
+
+
+@lru_cache(maxsize=1)
+def get_governor() -> UpstreamGovernor:
+    """Un único governor por proceso: el presupuesto contra Yahoo es compartido."""
+    return UpstreamGovernor()
+
+
+@lru_cache(maxsize=1)
+def _replay() -> tuple:
+    """Snapshot y sorteo de fallos compartidos por las dos variantes del proveedor de replay."""
+    return ReplaySnapshot(), FaultInjector()
+
+
+@lru_cache(maxsize=1)
+def get_provider() -> MarketDataProvider:
+    """Proveedor compartido por rutas y screener (una sola caché por proceso)."""
+    if config.MARKET_DATA == "replay":
+        # Caché en disco aparte: lo reproducido nunca se mezcla con datos reales de Yahoo
+        return CachedProvider(ReplayProvider(*_replay(), governor=get_governor()),
+                              cache=TieredCache(os.path.join(config.CACHE_DIR, "replay-cache")))
+    return CachedProvider(YFinanceProvider(history_store=_history_store(), governor=get_governor()))
+
+
+@lru_cache(maxsize=1)
+def get_async_provider() -> AsyncCachedProvider:
+    """
+    Proveedor asyncio para los endpoints: comparte caché, contadores y single-flight
+    con get_provider(), así que ambos caminos ven y coalescen las mismas descargas.
+    """
+    sync = get_provider()
+    if config.MARKET_DATA == "replay":
+        inner = AsyncReplayProvider(*_replay(), governor=get_governor())
+    else:
+        inner = AsyncYahooProvider(history_store=_history_store(), governor=get_governor())
+    return AsyncCachedProvider(inner, cache=sync.cache, stats=sync.stats, flight=sync.flight)
+
+
+@lru_cache(maxsize=1)
+def get_universe() -> UniverseIndex:
+    """Índice del S&P 500 en memoria; se refresca solo, en segundo plano."""
+    if config.MARKET_DATA == "replay":
+        # El universo grabado en el snapshot, fijo: nunca se intenta descargar
+        snapshot = _replay()[0]
+        return UniverseIndex(path=os.path.join(snapshot.path, "universe.json"), bundled=snapshot.universe_path,
+                             ttl=float("inf"), governor=get_governor())
+    return UniverseIndex(governor=get_governor())
+
+
+@lru_cache(maxsize=1)
+def get_gex_store() -> GexSnapshotStore:
+    """Histórico de snapshots GEX (escrito por app.services.gex_snapshots, leído por la API)."""
+    if config.MARKET_DATA == "replay":
+        return GexSnapshotStore(os.path.join(config.CACHE_DIR, "replay-gex_history"))
+    return GexSnapshotStore()
+
+
+@lru_cache(maxsize=1)
+def get_scan_backend():
+    """Registro en memoria (inline) o cola SQLite compartida entre procesos (queue)."""
+    if config.SCAN_BACKEND == "inline": return ScanRegistry()
+    return ScanJobQueue()
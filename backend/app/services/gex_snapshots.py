@@ -0,0 +1,104 @@
+# Archivo: backend/app/services/gex_snapshots.py
+"""
+Job periódico que fotografía el perfil GEX de una watchlist (NetGEX por strike, walls,
+flip, IV ATM) en el GexSnapshotStore, para que /asset/{ticker}/gex/history responda sin
+tocar el upstream. Se lanza aparte (python -m app.services.gex_snapshots) y sólo toma
+snapshots con la sesión abierta; --once hace una pasada y sale.
+
+Los instantes se redondean al intervalo: dos procesos programados a la vez escriben el
+mismo ts y el store descarta el repetido.
+"""
+import sys
+import time
+import signal
+import logging
+import argparse
+import threading
+import concurrent.futures
+from typing import Iterable
+
+from app.core import config
+from app.core.logs import setup_logging
+from app.core.market_hours import session_open
+from app.core.metrics import stage
+from app.services.governor import BACKGROUND, fetch_priority
+from app.services.gex_store import GexSnapshotStore
+
+log = logging.getLogger(__name__)
+
+
+def take_snapshot(quant, store: GexSnapshotStore, ticker: str, ts: int, max_dte: int = None) -> bool:
+    # Hilo del pool: el contexto no se hereda, la prioridad se fija aquí
+    fetch_priority.set(BACKGROUND)
+    with stage("gex.snapshot"):
+        profile = quant.compute_gex_profile(ticker, max_dte or config.DEFAULT_MAX_DTE, band=(0.7, 1.3))
+    if not profile or not profile["gex_profile"]:
+        log.warning("snapshot GEX sin datos", extra={"ticker": ticker})
+        return False
+    snapshot = {"spot": profile["spot"], "gamma_flip": profile["gamma_flip"], "call_wall": profile["call_wall"],
+                "put_wall": profile["put_wall"], "iv_atm": profile["iv_atm"],
+                "net_gex": profile["exposure_totals"]["gex"]}
+    levels = profile["gex_profile"]
+    return store.append(ticker, ts, snapshot, [p["strike"] for p in levels], [p["NetGEX"] for p in levels])
+
+
+def _defaults():
+    # Importación tardía: proveedor (caché y governor compartidos con la API) y store se crean al usarse
+    from app.services.factory import get_gex_store, get_provider
+    from app.services.quant_engine import QuantService
+    return QuantService(get_provider()), get_gex_store()
+
+
+def run_once(tickers: Iterable[str], ts: int, quant=None, store: GexSnapshotStore = None) -> int:
+    """Una pasada por la watchlist; retorna los snapshots guardados."""
+    if quant is None or store is None: quant, store = _defaults()
+    saved = 0
+    with concurrent.futures.ThreadPoolExecutor(max_workers=config.SCAN_WORKERS) as pool:
+        futures = {pool.submit(take_snapshot, quant, store, t, ts): t for t in tickers}
+        for fut in concurrent.futures.as_completed(futures):
+            try: saved += bool(fut.result())
+            except Exception:
+                log.exception("fallo en snapshot GEX", extra={"ticker": futures[fut]})
+    return saved
+
+
+def run(tickers, interval: float, stop: threading.Event, force: bool = False):
+    quant = store = None
+    log.info("snapshots GEX programados", extra={"tickers": ",".join(tickers), "interval": interval})
+    while not stop.is_set():
+        now = time.time()
+        if force or session_open(now):
+            ts = int(now // interval * interval)
+            started = time.perf_counter()
+            if quant is None: quant, store = _defaults()
+            saved = run_once(tickers, ts, quant, store)
+            log.info("snapshots GEX guardados", extra={"saved": saved, "tickers": len(tickers), "ts": ts,
+                                                       "ms": round((time.perf_counter() - started) * 1000, 1)})
+        # Hasta el siguiente múltiplo del intervalo
+        stop.wait(interval - time.time() % interval)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Snapshots periódicos del perfil GEX")
+    parser.add_argument("--tickers", help="lista separada por comas (por defecto QUANTDESK_GEX_WATCHLIST)")
+    parser.add_argument("--interval", type=float, default=config.GEX_SNAPSHOT_INTERVAL, help="segundos entre snapshots")
+    parser.add_argument("--once", action="store_true", help="una sola pasada (aunque el mercado esté cerrado)")
+    parser.add_argument("--force", action="store_true", help="tomar snapshots también fuera de sesión")
+    args = parser.parse_args(argv)
+    setup_logging()
+
+    tickers = [t.strip().upper() for t in args.tickers.split(",") if t.strip()] if args.tickers else config.GEX_WATCHLIST
+    if args.once:
+        saved = run_once(tickers, int(time.time() // args.interval * args.interval))
+        log.info("snapshots GEX guardados", extra={"saved": saved, "tickers": len(tickers)})
+        return 0 if saved else 1
+
+    stop = threading.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *_: stop.set())
+    run(tickers, args.interval, stop, args.force)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
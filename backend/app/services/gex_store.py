@@ -0,0 +1,183 @@
+# Archivo: backend/app/services/gex_store.py
+"""
+Histórico de snapshots GEX en disco, columnar, append-only y particionado por mes:
+{root}/{TICKER}/{YYYY-MM}/{columna}.bin. Cada snapshot es una fila de SNAPSHOT_COLUMNS
+(float32) con su instante (int64, epoch s) y el final de su tramo en la tabla de
+niveles por strike (strike, gex), que se guarda aparte en la misma partición.
+
+Las lecturas de un rango abren sólo las particiones que lo tocan, como memmaps de sólo
+lectura, y copian únicamente las filas pedidas. meta.json guarda las filas confirmadas
+de cada partición: una escritura a medias nunca se lee y la siguiente la sobrescribe.
+"""
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.core import config
+
+try:
+    import fcntl
+except ImportError:  # Windows: sólo bloqueo entre hilos
+    fcntl = None
+
+TS_DTYPE = np.dtype("<i8")
+VALUE_DTYPE = np.dtype("<f4")
+OFFSET_DTYPE = np.dtype("<i8")
+# Una fila por snapshot (además de ts y level_end)
+SNAPSHOT_COLUMNS = ("spot", "gamma_flip", "call_wall", "put_wall", "iv_atm", "net_gex")
+# Perfil por strike de cada snapshot (tramo [level_end anterior, level_end) de la partición)
+LEVEL_COLUMNS = ("strike", "gex")
+
+
+def partition_of(ts: float) -> str:
+    return time.strftime("%Y-%m", time.gmtime(ts))
+
+
+class GexSnapshotStore:
+    def __init__(self, root: str = None):
+        self.root = root or config.GEX_HISTORY_DIR
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    # --- RUTAS / META ---
+    def _dir(self, ticker: str, part: str = None) -> str:
+        d = os.path.join(self.root, ticker.upper())
+        return os.path.join(d, part) if part else d
+
+    def partitions(self, ticker: str) -> List[str]:
+        try: names = os.listdir(self._dir(ticker))
+        except OSError: return []
+        return sorted(n for n in names if len(n) == 7 and n[4] == "-")
+
+    def _meta(self, ticker: str, part: str) -> dict:
+        try:
+            with open(os.path.join(self._dir(ticker, part), "meta.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"rows": 0, "levels": 0, "last_ts": None}
+
+    def _write_meta(self, ticker: str, part: str, meta: dict):
+        path = os.path.join(self._dir(ticker, part), "meta.json")
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f: json.dump(meta, f)
+        os.replace(tmp, path)
+
+    @contextmanager
+    def _lock(self, ticker: str):
+        ticker = ticker.upper()
+        with self._locks_guard:
+            lock = self._locks.setdefault(ticker, threading.Lock())
+        with lock:
+            os.makedirs(self._dir(ticker), exist_ok=True)
+            if fcntl is None:
+                yield
+                return
+            with open(os.path.join(self._dir(ticker), ".lock"), "w") as lf:
+                fcntl.flock(lf, fcntl.LOCK_EX)
+                try: yield
+                finally: fcntl.flock(lf, fcntl.LOCK_UN)
+
+    def _column(self, ticker: str, part: str, name: str, rows: int, dtype) -> np.ndarray:
+        if rows == 0: return np.empty(0, dtype=dtype)
+        return np.memmap(os.path.join(self._dir(ticker, part), f"{name}.bin"), dtype=dtype, mode="r", shape=(rows,))
+
+    # --- CONSULTAS ---
+    def last_ts(self, ticker: str) -> Optional[int]:
+        """Instante del último snapshot guardado (sirve de versión para la caché de respuestas)."""
+        parts = self.partitions(ticker)
+        return self._meta(ticker, parts[-1]).get("last_ts") if parts else None
+
+    def read(self, ticker: str, start: float = None, end: float = None, levels: bool = False) -> Dict[str, np.ndarray]:
+        """
+        Snapshots con start <= ts <= end (epoch s; None = sin límite) como {columna: array}.
+        Con levels=True añade strike y gex concatenados y level_offsets (len = filas + 1):
+        el perfil del snapshot i es strike[level_offsets[i]:level_offsets[i + 1]].
+        """
+        lo, hi = partition_of(start) if start is not None else "", partition_of(end) if end is not None else "9999-99"
+        chunks = []
+        for part in self.partitions(ticker):
+            if not lo <= part <= hi: continue
+            chunk = self._read_partition(ticker, part, start, end, levels)
+            if chunk is not None: chunks.append(chunk)
+
+        names = ("ts",) + SNAPSHOT_COLUMNS
+        if not chunks:
+            out = {c: np.empty(0, dtype=TS_DTYPE if c == "ts" else VALUE_DTYPE) for c in names}
+            if levels:
+                out.update({c: np.empty(0, dtype=VALUE_DTYPE) for c in LEVEL_COLUMNS})
+                out["level_offsets"] = np.zeros(1, dtype=OFFSET_DTYPE)
+            return out
+        out = {c: np.concatenate([ch[c] for ch in chunks]) for c in names}
+        if levels:
+            out.update({c: np.concatenate([ch[c] for ch in chunks]) for c in LEVEL_COLUMNS})
+            # Los extremos de cada partición son relativos a su tramo: se desplazan y encadenan
+            sizes = np.cumsum([0] + [len(ch["strike"]) for ch in chunks])
+            out["level_offsets"] = np.concatenate(
+                [np.zeros(1, dtype=OFFSET_DTYPE)] + [ch["level_end"] + base for ch, base in zip(chunks, sizes)])
+        return out
+
+    def _read_partition(self, ticker: str, part: str, start, end, levels: bool) -> Optional[dict]:
+        for _ in range(2):
+            meta = self._meta(ticker, part)
+            rows = int(meta.get("rows", 0))
+            if rows == 0: return None
+            try:
+                ts = self._column(ticker, part, "ts", rows, TS_DTYPE)
+                i = int(np.searchsorted(ts, start, side="left")) if start is not None else 0
+                j = int(np.searchsorted(ts, end, side="right")) if end is not None else rows
+                if i >= j: return None
+                # np.array: copia sólo el tramo pedido y suelta el memmap
+                chunk = {"ts": np.array(ts[i:j])}
+                chunk.update({c: np.array(self._column(ticker, part, c, rows, VALUE_DTYPE)[i:j])
+                              for c in SNAPSHOT_COLUMNS})
+                if levels:
+                    ends = self._column(ticker, part, "level_end", rows, OFFSET_DTYPE)
+                    a, b = (int(ends[i - 1]) if i else 0), int(ends[j - 1])
+                    n = int(meta.get("levels", 0))
+                    chunk.update({c: np.array(self._column(ticker, part, c, n, VALUE_DTYPE)[a:b])
+                                  for c in LEVEL_COLUMNS})
+                    chunk["level_end"] = np.array(ends[i:j]) - a
+                return chunk
+            except (OSError, ValueError):
+                # Append concurrente: meta y ficheros desalineados un instante
+                continue
+        return None
+
+    # --- ESCRITURA ---
+    def append(self, ticker: str, ts: int, snapshot: Dict[str, float], strikes, gex) -> bool:
+        """
+        Añade un snapshot al final de su partición. Los instantes son estrictamente
+        crecientes: un ts ya guardado (otro proceso tomó el mismo snapshot) se descarta.
+        """
+        ts, part = int(ts), partition_of(ts)
+        strikes = np.ascontiguousarray(strikes, dtype=VALUE_DTYPE)
+        gex = np.ascontiguousarray(gex, dtype=VALUE_DTYPE)
+        with self._lock(ticker):
+            last = self.last_ts(ticker)
+            if last is not None and ts <= last: return False
+            d = self._dir(ticker, part)
+            os.makedirs(d, exist_ok=True)
+            meta = self._meta(ticker, part)
+            rows, n = int(meta.get("rows", 0)), int(meta.get("levels", 0))
+            # Primero los niveles y después la fila que los referencia; meta confirma ambos
+            for name, values in zip(LEVEL_COLUMNS, (strikes, gex)):
+                self._write_at(os.path.join(d, f"{name}.bin"), n * VALUE_DTYPE.itemsize, values.tobytes())
+            row = [("ts", np.array([ts], dtype=TS_DTYPE)), ("level_end", np.array([n + len(strikes)], OFFSET_DTYPE))]
+            row += [(c, np.array([snapshot.get(c, np.nan)], dtype=VALUE_DTYPE)) for c in SNAPSHOT_COLUMNS]
+            for name, value in row:
+                self._write_at(os.path.join(d, f"{name}.bin"), rows * value.dtype.itemsize, value.tobytes())
+            self._write_meta(ticker, part, {"rows": rows + 1, "levels": n + len(strikes), "last_ts": ts})
+        return True
+
+    @staticmethod
+    def _write_at(path: str, offset: int, payload: bytes):
+        """Escribe en offset y trunca detrás: borra los restos de un append que no llegó a confirmarse."""
+        with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+            f.seek(offset)
+            f.write(payload)
+            f.truncate()
@@ -0,0 +1,300 @@
+# Archivo: backend/app/services/governor.py
+import os
+import time
+import asyncio
+import threading
+from collections import deque
+from contextvars import ContextVar
+from typing import Dict
+
+import httpx
+from tenacity import (AsyncRetrying, Retrying, retry_if_exception, stop_after_attempt,
+                      wait_random_exponential)
+
+from app.core import config
+from app.core.metrics import UPSTREAM_SECONDS
+
+try:
+    from yfinance.exceptions import YFRateLimitError
+except ImportError:  # yfinance antiguo: se detecta por el mensaje
+    YFRateLimitError = None
+
+# Códigos HTTP que indican saturación del upstream (se reintentan y reducen concurrencia)
+THROTTLE_STATUS = {429, 500, 502, 503, 504}
+_THROTTLE_HINTS = ("too many requests", "rate limit", "429")
+
+# Clases de prioridad de las peticiones: las de páginas de activo (interactivas) van por
+# delante de las de escaneos y refrescos en segundo plano. Se propaga por contextvars:
+# scan_market marca su tarea (y todas las que crea) como BACKGROUND.
+INTERACTIVE, BACKGROUND = 0, 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+fetch_priority: ContextVar[int] = ContextVar("fetch_priority", default=INTERACTIVE)
+
+
+def is_throttle(exc: BaseException) -> bool:
+    """¿El error indica que Yahoo nos está frenando (o caído un instante)? Sólo éstos se reintentan."""
+    if YFRateLimitError is not None and isinstance(exc, YFRateLimitError): return True
+    if isinstance(exc, httpx.HTTPStatusError): return exc.response.status_code in THROTTLE_STATUS
+    if isinstance(exc, (httpx.TransportError, TimeoutError, ConnectionError)): return True
+    msg = str(exc).lower()
+    return any(h in msg for h in _THROTTLE_HINTS)
+
+
+class TokenBucket:
+    """
+    Limitador de tasa: `rate` peticiones/s sostenidas con ráfagas de hasta `burst`.
+    Las peticiones en segundo plano no pueden bajar el depósito de `reserve` fichas:
+    ese colchón queda siempre libre para las interactivas.
+    """
+    def __init__(self, rate: float, burst: float, reserve: float = 0.0):
+        self.rate = float(rate)
+        self.capacity = float(burst)
+        self.reserve = min(float(reserve), self.capacity - 1)
+        self._tokens = float(burst)
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _take(self, cost: float, priority: int) -> float:
+        """Toma `cost` fichas si hay; si no, retorna cuántos segundos esperar antes de reintentar."""
+        floor = self.reserve if priority != INTERACTIVE else 0.0
+        cost = min(float(cost), self.capacity - floor)
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._stamp) * self.rate)
+            self._stamp = now
+            if self._tokens - cost >= floor:
+                self._tokens -= cost
+                return 0.0
+            return (cost + floor - self._tokens) / self.rate
+
+    def acquire(self, cost: float = 1.0, priority: int = INTERACTIVE):
+        while (wait := self._take(cost, priority)) > 0: time.sleep(wait)
+
+    async def acquire_async(self, cost: float = 1.0, priority: int = INTERACTIVE):
+        while (wait := self._take(cost, priority)) > 0: await asyncio.sleep(wait)
+
+
+class InteractiveBeacon:
+    """
+    Señal entre procesos de que hay tráfico interactivo: el mtime de un fichero en
+    CACHE_DIR. La API lo toca al pedir datos para una página de activo y los workers de
+    escaneo (otros procesos, mismo upstream) lo consultan para ceder concurrencia.
+    """
+    def __init__(self, path: str = None, window: float = None):
+        self.path = path or config.UPSTREAM_BEACON_PATH
+        self.window = window or config.UPSTREAM_INTERACTIVE_WINDOW
+        self._touched = 0.0
+        self._checked = 0.0
+        self._remote = 0.0
+
+    def touch(self):
+        now = time.time()
+        if now - self._touched < 0.5: return
+        self._touched = now
+        try:
+            with open(self.path, "a"): pass
+            os.utime(self.path)
+        except OSError:
+            pass
+
+    def active(self) -> bool:
+        now = time.time()
+        if now - self._checked >= 0.25:
+            self._checked = now
+            try: self._remote = os.stat(self.path).st_mtime
+            except OSError: self._remote = 0.0
+        return now - max(self._touched, self._remote) < self.window
+
+
+class AIMDLimiter:
+    """
+    Límite de concurrencia adaptativo (AIMD, como el control de congestión de TCP):
+    cada respuesta correcta suma 1/limit (≈ +1 por ventana completa) y cada señal de
+    saturación (throttle o latencia por encima del objetivo) lo multiplica por `decrease`,
+    como mucho una vez por `cooldown` para que una ráfaga de errores no lo hunda a cero.
+    Vale tanto para hilos (acquire) como para corrutinas (acquire_async).
+
+    Prioridades: si hay peticiones interactivas esperando (o activas en otro proceso,
+    según `interactive_hint`), las de segundo plano sólo pueden ocupar
+    `background_share` del límite y las interactivas entran en cuanto hay hueco.
+    """
+    def __init__(self, initial: int, minimum: int, maximum: int, decrease: float = 0.5,
+                 latency_target: float = None, cooldown: float = None,
+                 background_share: float = 1.0, interactive_hint=None):
+        self.minimum, self.maximum = minimum, maximum
+        self.limit = float(min(max(initial, minimum), maximum))
+        self.decrease = decrease
+        self.latency_target = latency_target
+        self.cooldown = cooldown if cooldown is not None else (latency_target or 1.0)
+        self.background_share = background_share
+        self.interactive_hint = interactive_hint
+        self.in_flight = 0
+        self.waiting_interactive = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+        self._waiters = deque()
+        self._counts = {"ok": 0, "throttled": 0, "error": 0, "slow": 0, "decreases": 0}
+
+    def _cap(self, priority: int) -> int:
+        cap = int(self.limit)
+        if priority != INTERACTIVE and (self.waiting_interactive or
+                                        (self.interactive_hint is not None and self.interactive_hint())):
+            cap = max(1, int(self.limit * self.background_share))
+        return cap
+
+    def _try_enter(self, priority: int) -> bool:
+        if self.in_flight < self._cap(priority):
+            self.in_flight += 1
+            return True
+        return False
+
+    def acquire(self, priority: int = INTERACTIVE):
+        # Las de segundo plano se re-evalúan periódicamente: la señal entre procesos no avisa
+        timeout = None if priority == INTERACTIVE else 0.25
+        with self._cond:
+            if priority == INTERACTIVE: self.waiting_interactive += 1
+            try:
+                while not self._try_enter(priority): self._cond.wait(timeout)
+            finally:
+                if priority == INTERACTIVE: self.waiting_interactive -= 1
+
+    async def acquire_async(self, priority: int = INTERACTIVE):
+        loop = asyncio.get_running_loop()
+        timeout = None if priority == INTERACTIVE else 0.25
+        with self._cond:
+            if priority == INTERACTIVE: self.waiting_interactive += 1
+        try:
+            while True:
+                with self._cond:
+                    if self._try_enter(priority): return
+                    fut = loop.create_future()
+                    self._waiters.append((loop, fut))
+                await asyncio.wait([fut], timeout=timeout)
+        finally:
+            if priority == INTERACTIVE:
+                with self._cond: self.waiting_interactive -= 1
+
+    def release(self, outcome: str, latency: float = 0.0):
+        """outcome: 'ok', 'throttled' o 'error' (fallo que no es culpa de la carga, p.ej. 404)."""
+        with self._cond:
+            self.in_flight -= 1
+            self._counts[outcome] += 1
+            slow = outcome == "ok" and self.latency_target and latency > self.latency_target
+            if slow: self._counts["slow"] += 1
+            if outcome == "throttled" or slow:
+                now = time.monotonic()
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(self.minimum, self.limit * self.decrease)
+                    self._last_decrease = now
+                    self._counts["decreases"] += 1
+            elif outcome == "ok":
+                self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+            waiters, self._waiters = self._waiters, deque()
+        for loop, fut in waiters:
+            loop.call_soon_threadsafe(_wake, fut)
+
+    def stats(self) -> Dict[str, float]:
+        with self._cond:
+            return {"limit": round(self.limit, 2), "in_flight": self.in_flight,
+                    "waiting_interactive": self.waiting_interactive, **self._counts}
+
+
+def _wake(fut: asyncio.Future):
+    if not fut.done(): fut.set_result(None)
+
+
+class UpstreamGovernor:
+    """
+    Punto único por el que pasan todas las peticiones a Yahoo (hilos y corrutinas):
+    token bucket para la tasa, AIMD para la concurrencia y reintentos con backoff
+    exponencial con jitter (tenacity) sólo para errores de saturación. Los demás
+    errores se propagan al primer intento. La prioridad de cada llamada sale de
+    fetch_priority: las interactivas se sirven antes y tienen fichas y huecos reservados.
+    """
+    def __init__(self, rate: float = None, burst: float = None, retries: int = None,
+                 backoff_base: float = None, backoff_max: float = None, limiter: AIMDLimiter = None,
+                 beacon: InteractiveBeacon = None):
+        share = config.UPSTREAM_BACKGROUND_SHARE
+        burst = burst or config.UPSTREAM_BURST
+        self.beacon = beacon or InteractiveBeacon()
+        self.bucket = TokenBucket(rate or config.UPSTREAM_RATE, burst, reserve=burst * (1 - share))
+        self.limiter = limiter or AIMDLimiter(config.UPSTREAM_CONCURRENCY_INITIAL,
+                                              config.UPSTREAM_CONCURRENCY_MIN,
+                                              config.UPSTREAM_CONCURRENCY_MAX,
+                                              latency_target=config.UPSTREAM_LATENCY_TARGET,
+                                              background_share=share,
+                                              interactive_hint=self.beacon.active)
+        self.retries = retries or config.UPSTREAM_RETRIES
+        self.backoff_base = backoff_base or config.UPSTREAM_BACKOFF_BASE
+        self.backoff_max = backoff_max or config.UPSTREAM_BACKOFF_MAX
+        self._lock = threading.Lock()
+        self._counts = {"calls": 0, "retries": 0, "gave_up": 0, "interactive": 0, "background": 0}
+
+    def _retry_kwargs(self) -> dict:
+        return dict(stop=stop_after_attempt(self.retries + 1),
+                    wait=wait_random_exponential(multiplier=self.backoff_base, max=self.backoff_max),
+                    retry=retry_if_exception(is_throttle),
+                    before_sleep=lambda _: self._count("retries"),
+                    reraise=True)
+
+    def _count(self, key: str):
+        with self._lock: self._counts[key] += 1
+
+    def _enter(self) -> int:
+        priority = fetch_priority.get()
+        self._count("calls")
+        self._count(PRIORITY_NAMES[priority])
+        if priority == INTERACTIVE: self.beacon.touch()
+        return priority
+
+    def _settle(self, error: BaseException, started: float, priority: int):
+        outcome = "ok" if error is None else ("throttled" if is_throttle(error) else "error")
+        latency = time.monotonic() - started
+        self.limiter.release(outcome, latency)
+        UPSTREAM_SECONDS.observe(latency, outcome, PRIORITY_NAMES[priority])
+
+    def call(self, fn, *args, cost: float = 1.0, **kwargs):
+        """Ejecuta fn(*args, **kwargs) bajo el governor. cost: peticiones reales que supone (lotes)."""
+        priority = self._enter()
+        try:
+            for attempt in Retrying(**self._retry_kwargs()):
+                with attempt:
+                    self.bucket.acquire(cost, priority)
+                    self.limiter.acquire(priority)
+                    started = time.monotonic()
+                    try:
+                        result = fn(*args, **kwargs)
+                    except BaseException as e:
+                        self._settle(e, started, priority)
+                        raise
+                    self._settle(None, started, priority)
+            return result
+        except BaseException as e:
+            if is_throttle(e): self._count("gave_up")
+            raise
+
+    async def call_async(self, fn, *args, cost: float = 1.0, **kwargs):
+        """Igual que call para funciones de corrutina."""
+        priority = self._enter()
+        try:
+            async for attempt in AsyncRetrying(**self._retry_kwargs()):
+                with attempt:
+                    await self.bucket.acquire_async(cost, priority)
+                    await self.limiter.acquire_async(priority)
+                    started = time.monotonic()
+                    try:
+                        result = await fn(*args, **kwargs)
+                    except BaseException as e:
+                        self._settle(e, started, priority)
+                        raise
+                    self._settle(None, started, priority)
+            return result
+        except BaseException as e:
+            if is_throttle(e): self._count("gave_up")
+            raise
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock: calls = dict(self._counts)
+        return {"calls": calls, "concurrency": self.limiter.stats(),
+                "rate": {"per_second": self.bucket.rate, "burst": self.bucket.capacity}}
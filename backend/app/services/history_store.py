@@ -0,0 +1,226 @@
+# Archivo: backend/app/services/history_store.py
+import os
+import json
+import time
+import threading
+from datetime import timedelta
+from contextlib import contextmanager
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from app.core import config
+from app.core.market_hours import next_session_close, session_closed
+
+try:
+    import fcntl
+except ImportError:  # Windows: sólo bloqueo entre hilos
+    fcntl = None
+
+# Columnas almacenadas: un fichero binario plano por columna (float64), más las fechas (datetime64[D])
+COLUMNS = ("Open", "High", "Low", "Close", "Volume")
+DATE_DTYPE = np.dtype("datetime64[D]")
+VALUE_DTYPE = np.dtype("<f8")
+
+
+def period_start(period: str, end: np.datetime64) -> Optional[np.datetime64]:
+    """Traduce un period de yfinance ('6mo', '1y', '80d', 'ytd', 'max') a fecha de inicio."""
+    if not period or period == "max": return None
+    end_ts = pd.Timestamp(end)
+    if period == "ytd": return np.datetime64(f"{end_ts.year}-01-01", "D")
+    unit = period.lstrip("0123456789")
+    n = int(period[:len(period) - len(unit)] or 1)
+    offsets = {"d": pd.DateOffset(days=n), "wk": pd.DateOffset(weeks=n),
+               "mo": pd.DateOffset(months=n), "y": pd.DateOffset(years=n)}
+    if unit not in offsets: return None
+    return np.datetime64((end_ts - offsets[unit]).date(), "D")
+
+
+class HistoryStore:
+    """
+    Histórico OHLCV diario en disco, columnar y append-only: {root}/{TICKER}/{columna}.bin.
+    Las lecturas son memmaps de sólo lectura (no se carga el fichero entero en RAM) y
+    las actualizaciones sólo escriben las velas posteriores a la última guardada.
+    meta.json guarda el nº de filas confirmadas: una escritura a medias nunca se lee.
+    Un histórico guardado sólo con cierres (lotes spark del scanner) lleva en meta
+    close_only el period que cubre: sirve a quien sólo pide cierres de ese period y,
+    para el OHLCV completo, cuenta como no guardado (se descarga entero y lo reemplaza).
+    """
+    def __init__(self, root: str = None):
+        self.root = root or config.HISTORY_DIR
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    # --- RUTAS / META ---
+    def _dir(self, ticker: str) -> str:
+        return os.path.join(self.root, ticker.upper())
+
+    def _meta(self, ticker: str) -> dict:
+        try:
+            with open(os.path.join(self._dir(ticker), "meta.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"rows": 0, "valid_until": 0.0}
+
+    def _write_meta(self, ticker: str, meta: dict):
+        path = os.path.join(self._dir(ticker), "meta.json")
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f: json.dump(meta, f)
+        os.replace(tmp, path)
+
+    @contextmanager
+    def _lock(self, ticker: str):
+        with self._locks_guard:
+            lock = self._locks.setdefault(ticker, threading.Lock())
+        with lock:
+            os.makedirs(self._dir(ticker), exist_ok=True)
+            if fcntl is None:
+                yield
+                return
+            with open(os.path.join(self._dir(ticker), ".lock"), "w") as lf:
+                fcntl.flock(lf, fcntl.LOCK_EX)
+                try: yield
+                finally: fcntl.flock(lf, fcntl.LOCK_UN)
+
+    def _column(self, ticker: str, name: str, rows: int, dtype) -> np.ndarray:
+        if rows == 0: return np.empty(0, dtype=dtype)
+        return np.memmap(os.path.join(self._dir(ticker), f"{name}.bin"), dtype=dtype, mode="r", shape=(rows,))
+
+    # --- CONSULTAS ---
+    def rows(self, ticker: str) -> int:
+        return int(self._meta(ticker).get("rows", 0))
+
+    def last_date(self, ticker: str) -> Optional[np.datetime64]:
+        rows = self.rows(ticker)
+        if rows == 0: return None
+        return self._column(ticker, "Date", rows, DATE_DTYPE)[-1]
+
+    def needs_sync(self, ticker: str, now: float = None, closes: str = None) -> bool:
+        """
+        Caduca en el cierre de sesión siguiente a la última sincronización. closes=period:
+        basta con los cierres de ese period (vale también un histórico close_only).
+        """
+        meta = self._meta(ticker)
+        if meta.get("rows", 0) == 0: return True
+        if meta.get("close_only") and meta["close_only"] != closes: return True
+        return (now or time.time()) >= meta.get("valid_until", 0.0)
+
+    def close_only(self, ticker: str) -> bool:
+        """¿Sin histórico OHLCV completo (vacío o sólo cierres)? Sólo esos se pueden pisar con cierres."""
+        meta = self._meta(ticker)
+        return meta.get("rows", 0) == 0 or bool(meta.get("close_only"))
+
+    def read(self, ticker: str, period: str = None) -> pd.DataFrame:
+        """
+        Slice [period, hoy] sin copiar las columnas: los valores son vistas del memmap.
+        Retorna un DataFrame vacío si el ticker no está en el store.
+        """
+        for _ in range(2):
+            rows = self.rows(ticker)
+            if rows == 0: return pd.DataFrame()
+            try:
+                dates = self._column(ticker, "Date", rows, DATE_DTYPE)
+                start = period_start(period, dates[-1])
+                i = int(np.searchsorted(dates, start, side="left")) if start is not None else 0
+                data = {c: self._column(ticker, c, rows, VALUE_DTYPE)[i:] for c in COLUMNS}
+                break
+            except (OSError, ValueError):
+                # Reescritura concurrente: meta y ficheros desalineados un instante
+                continue
+        else:
+            return pd.DataFrame()
+        index = pd.DatetimeIndex(dates[i:], name="Date")
+        return pd.DataFrame(data, index=index, copy=False)
+
+    # --- ESCRITURA ---
+    @staticmethod
+    def _normalize(df: pd.DataFrame):
+        idx = df.index
+        if getattr(idx, "tz", None) is not None: idx = idx.tz_localize(None)
+        dates = pd.DatetimeIndex(idx).normalize().values.astype(DATE_DTYPE)
+        cols = {c: pd.to_numeric(df[c], errors="coerce").to_numpy(VALUE_DTYPE) if c in df.columns
+                else np.full(len(df), np.nan) for c in COLUMNS}
+        keep = ~np.isnan(cols["Close"])
+        order = np.argsort(dates[keep], kind="stable")
+        return dates[keep][order], {c: v[keep][order] for c, v in cols.items()}
+
+    def upsert(self, ticker: str, df: pd.DataFrame, replace: bool = False, close_only: str = None):
+        """
+        Añade las velas de df. Caso normal: append puro al final de cada columna.
+        Si df solapa con lo guardado (vela de hoy incompleta, ajuste por dividendos) o
+        replace=True, la columna se reescribe en un fichero nuevo y se sustituye con
+        os.replace: los memmaps abiertos siguen apuntando al fichero anterior.
+        close_only=period marca df como sólo cierres de ese period (siempre con replace).
+        """
+        if df is None or df.empty: return
+        new_dates, new_cols = self._normalize(df)
+        if len(new_dates) == 0: return
+        with self._lock(ticker):
+            rows = 0 if replace else self.rows(ticker)
+            cut = rows
+            if rows:
+                dates = self._column(ticker, "Date", rows, DATE_DTYPE)
+                cut = int(np.searchsorted(dates, new_dates[0], side="left"))
+            d = self._dir(ticker)
+            for name, values, dtype in [("Date", new_dates, DATE_DTYPE)] + \
+                    [(c, new_cols[c], VALUE_DTYPE) for c in COLUMNS]:
+                path = os.path.join(d, f"{name}.bin")
+                payload = np.ascontiguousarray(values, dtype=dtype).tobytes()
+                if cut == rows and (rows > 0 or os.path.exists(path)) and not replace:
+                    with open(path, "r+b") as f:
+                        f.seek(rows * dtype.itemsize)
+                        f.write(payload)
+                        f.truncate()
+                    continue
+                tmp = path + ".tmp"
+                with open(tmp, "wb") as f:
+                    if cut: f.write(self._column(ticker, name, rows, dtype)[:cut].tobytes())
+                    f.write(payload)
+                os.replace(tmp, path)
+            last = pd.Timestamp(new_dates[-1]).date()
+            meta = {"rows": cut + len(new_dates), "valid_until": next_session_close(),
+                    "last_final": session_closed(last)}
+            if close_only: meta["close_only"] = close_only
+            self._write_meta(ticker, meta)
+
+    def sync_start(self, ticker: str):
+        """
+        Primera fecha a pedir para ponerse al día, o None si no hay nada guardado.
+        Si la última vela se guardó con la sesión abierta, se vuelve a pedir.
+        """
+        last = self.last_date(ticker)
+        meta = self._meta(ticker)
+        if last is None or meta.get("close_only"): return None
+        start = pd.Timestamp(last).date()
+        if meta.get("last_final", True): start += timedelta(days=1)
+        return start
+
+    def apply_increment(self, ticker: str, inc: pd.DataFrame, fetch_full):
+        """
+        Guarda el incremento. Si trae dividendos o splits, los precios ajustados anteriores
+        dejan de valer y se reescribe la serie completa con fetch_full().
+        """
+        if inc is None or inc.empty:
+            self.touch(ticker)
+            return
+        actions = [c for c in ("Dividends", "Stock Splits") if c in inc.columns]
+        if actions and (inc[actions].fillna(0) != 0).to_numpy().any():
+            self.upsert(ticker, fetch_full(), replace=True)
+        else:
+            self.upsert(ticker, inc)
+
+    def sync(self, ticker: str, fetch_since, fetch_full):
+        """Trae sólo lo nuevo desde la última vela guardada (o el backfill completo la primera vez)."""
+        start = self.sync_start(ticker)
+        if start is None:
+            self.upsert(ticker, fetch_full(), replace=True)
+            return
+        self.apply_increment(ticker, fetch_since(start), fetch_full)
+
+    def touch(self, ticker: str):
+        """Marca el ticker como sincronizado hasta el próximo cierre sin escribir velas."""
+        with self._lock(ticker):
+            meta = self._meta(ticker)
+            meta["valid_until"] = next_session_close()
+            self._write_meta(ticker, meta)
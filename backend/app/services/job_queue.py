@@ -0,0 +1,258 @@
+# Archivo: backend/app/services/job_queue.py
+import os
+import json
+import time
+import uuid
+import sqlite3
+import asyncio
+import threading
+from contextlib import contextmanager
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from app.core import config
+from app.services.scan_registry import FINISHED, ScanReporter, config_key
+from app.services.scan_stream import TERMINAL_EVENTS
+
+class BatchedReporter(ScanReporter):
+    """
+    Reporter de los workers: filas y progreso se acumulan en memoria y flush() los escribe
+    en una sola transacción desde un hilo, sin bloquear el event loop del worker en el
+    lock de escritura de SQLite. El worker llama a flush() en cada sondeo y al terminar.
+    """
+    def __init__(self, queue: "ScanJobQueue", job_id: str):
+        super().__init__(self, job_id)
+        self.queue = queue
+        self._pending: List[Tuple[str, dict]] = []
+        self._lock = asyncio.Lock()
+
+    def publish(self, job_id: str, event: str, data: dict):
+        self._pending.append((event, data))
+
+    async def flush(self):
+        # Con el lock, los lotes se escriben en orden aunque se solapen dos flush
+        async with self._lock:
+            batch, self._pending = self._pending, []
+            if batch: await asyncio.to_thread(self.queue.publish_many, self.task_id, batch)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    key TEXT NOT NULL,
+    config TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progress INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created REAL NOT NULL,
+    finished REAL,
+    heartbeat REAL,
+    worker TEXT,
+    seq INTEGER NOT NULL DEFAULT 0,
+    results INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS jobs_key ON jobs (key, created);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created);
+CREATE TABLE IF NOT EXISTS events (
+    job_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    event TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    rank INTEGER,
+    PRIMARY KEY (job_id, seq)
+);
+CREATE INDEX IF NOT EXISTS events_rank ON events (job_id, rank);
+"""
+
+
+class ScanJobQueue:
+    """
+    Cola persistente de escaneos en SQLite (WAL), compartida por todos los procesos que
+    montan el mismo CACHE_DIR: la API encola y lee estado/resultados; los workers
+    (app.services.scan_worker) reclaman trabajos, publican progreso y filas y marcan el
+    final. Cada evento se guarda numerado, así que cualquier worker de la API puede
+    servir /scanner/status y el stream SSE de cualquier escaneo.
+    Misma interfaz que ScanRegistry (start, status, subscribe, publish, reporter, cancel).
+    """
+    # Los escaneos los ejecutan procesos worker, no la API
+    inline = False
+
+    def __init__(self, path: str = None, max_jobs: int = None, ttl: float = None,
+                 dedup_window: float = None, lease: float = None):
+        self.path = path or config.SCAN_QUEUE_PATH
+        self.max_jobs = max_jobs or config.SCAN_REGISTRY_MAX
+        self.ttl = ttl or config.SCAN_RESULT_TTL
+        self.dedup_window = dedup_window or config.SCAN_DEDUP_WINDOW
+        self.lease = lease or config.SCAN_JOB_LEASE
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._db().executescript(_SCHEMA)
+
+    # --- CONEXIÓN ---
+    def _db(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    @contextmanager
+    def _tx(self):
+        """Transacción de escritura (BEGIN IMMEDIATE: un solo escritor a la vez entre procesos)."""
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    # --- API ---
+    def start(self, scan_config) -> Tuple[str, bool]:
+        """Encola el escaneo o retorna el idéntico en curso/reciente: (job_id, nuevo)."""
+        now = time.time()
+        key = json.dumps(config_key(scan_config))
+        with self._tx() as db:
+            self._evict(db, now)
+            row = db.execute("SELECT id, status, created FROM jobs WHERE key = ? ORDER BY created DESC LIMIT 1",
+                             (key,)).fetchone()
+            if row is not None:
+                running = row["status"] not in FINISHED
+                recent = row["status"] == "completed" and \
+                    int(row["created"] // self.dedup_window) == int(now // self.dedup_window)
+                if running or recent: return row["id"], False
+            job_id = str(uuid.uuid4())
+            cfg = {f: getattr(scan_config, f) for f in ("sector", "num_tickers", "max_dte", "lookback")}
+            db.execute("INSERT INTO jobs (id, key, config, status, created) VALUES (?, ?, ?, 'pending', ?)",
+                       (job_id, key, json.dumps(cfg), now))
+        return job_id, True
+
+    def status(self, job_id: str, offset: int = 0, limit: int = None) -> Optional[Dict]:
+        db = self._db()
+        job = db.execute("SELECT status, progress, error, results FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if job is None: return None
+        end = job["results"] if limit is None else offset + limit
+        rows = db.execute("SELECT payload FROM events WHERE job_id = ? AND rank >= ? AND rank < ? ORDER BY rank",
+                          (job_id, offset, end)).fetchall()
+        out = {"status": job["status"], "progress": job["progress"]}
+        if job["error"] is not None: out["error"] = job["error"]
+        out.update(data=[json.loads(r["payload"]) for r in rows], total=job["results"], offset=offset, limit=limit)
+        return out
+
+    def events(self, job_id: str, after: int = 0):
+        return self._db().execute("SELECT seq, event, payload FROM events WHERE job_id = ? AND seq > ? ORDER BY seq",
+                                  (job_id, after)).fetchall()
+
+    def subscribe(self, job_id: str, last_id: int = 0, poll: float = None,
+                  heartbeat: float = 15.0) -> Optional[AsyncIterator[str]]:
+        """Stream SSE leyendo los eventos nuevos de la tabla (None si el trabajo no existe)."""
+        if self._db().execute("SELECT 1 FROM jobs WHERE id = ?", (job_id,)).fetchone() is None: return None
+        poll = poll or config.SCAN_WORKER_POLL
+
+        async def _gen():
+            nonlocal last_id
+            idle = 0.0
+            while True:
+                rows = await asyncio.to_thread(self.events, job_id, last_id)
+                for r in rows:
+                    last_id = r["seq"]
+                    yield f"id: {r['seq']}\nevent: {r['event']}\ndata: {r['payload']}\n\n"
+                    if r["event"] in TERMINAL_EVENTS: return
+                if rows:
+                    idle = 0.0
+                elif idle >= heartbeat:
+                    idle = 0.0
+                    yield ": ping\n\n"
+                await asyncio.sleep(poll)
+                idle += poll
+        return _gen()
+
+    def cancel(self, job_id: str) -> Optional[bool]:
+        """Marca el trabajo como cancelado; el worker que lo ejecuta lo ve y detiene el escaneo."""
+        with self._tx() as db:
+            job = db.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if job is None: return None
+            if job["status"] in FINISHED: return False
+            self._publish(db, job_id, "cancelled", {"status": "cancelled"}, time.time())
+        return True
+
+    def counts(self) -> Dict[str, int]:
+        """Trabajos por estado (pending = profundidad de la cola)."""
+        rows = self._db().execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {r["status"]: r["n"] for r in rows}
+
+    # --- WORKERS ---
+    def reporter(self, job_id: str) -> BatchedReporter:
+        return BatchedReporter(self, job_id)
+
+    def claim(self, worker_id: str) -> Optional[Tuple[str, dict]]:
+        """Reclama el trabajo pendiente más antiguo. Los de workers caídos (sin latido) se dan por fallidos."""
+        now = time.time()
+        with self._tx() as db:
+            for row in db.execute("SELECT id FROM jobs WHERE status = 'running' AND heartbeat < ?",
+                                  (now - self.lease,)).fetchall():
+                self._publish(db, row["id"], "failed", {"status": "failed", "error": "scan worker perdido"}, now)
+            row = db.execute("SELECT id, config FROM jobs WHERE status = 'pending' ORDER BY created LIMIT 1").fetchone()
+            if row is None: return None
+            db.execute("UPDATE jobs SET status = 'running', worker = ?, heartbeat = ? WHERE id = ?",
+                       (worker_id, now, row["id"]))
+        return row["id"], json.loads(row["config"])
+
+    def cancelled(self, job_id: str) -> bool:
+        row = self._db().execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row is None or row["status"] == "cancelled"
+
+    def heartbeat(self, job_id: str):
+        with self._tx() as db:
+            db.execute("UPDATE jobs SET heartbeat = ? WHERE id = ?", (time.time(), job_id))
+
+    def publish(self, job_id: str, event: str, data: dict):
+        with self._tx() as db:
+            self._publish(db, job_id, event, data, time.time())
+
+    def publish_many(self, job_id: str, events: List[Tuple[str, dict]]):
+        """Varios eventos del trabajo, en orden y en una sola transacción."""
+        with self._tx() as db:
+            now = time.time()
+            for event, data in events: self._publish(db, job_id, event, data, now)
+
+    def _publish(self, db, job_id: str, event: str, data: dict, now: float):
+        job = db.execute("SELECT status, progress, error, seq, results FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if job is None or job["status"] in FINISHED: return
+        status, progress, error, results = job["status"], job["progress"], job["error"], job["results"]
+        finished, rank = None, None
+        if event == "result":
+            rank, results = results, results + 1
+        elif event == "progress":
+            status, progress = "running", data["progress"]
+        elif event == "done":
+            status, progress, finished = "completed", 100, now
+            data = dict(data, count=results)
+        elif event == "failed":
+            status, error, finished = "failed", data.get("error"), now
+        elif event == "cancelled":
+            status, finished = "cancelled", now
+            data = dict(data, count=results)
+        seq = job["seq"] + 1
+        db.execute("INSERT INTO events (job_id, seq, event, payload, rank) VALUES (?, ?, ?, ?, ?)",
+                   (job_id, seq, event, json.dumps(data, allow_nan=False), rank))
+        db.execute("UPDATE jobs SET status = ?, progress = ?, error = ?, seq = ?, results = ?, "
+                   "finished = COALESCE(?, finished), heartbeat = ? WHERE id = ?",
+                   (status, progress, error, seq, results, finished, now, job_id))
+
+    # --- EXPULSIÓN ---
+    def _evict(self, db, now: float):
+        """Borra los terminados caducados y, por encima de max_jobs, los más antiguos."""
+        old = [r["id"] for r in db.execute(
+            "SELECT id FROM jobs WHERE status IN ('completed', 'failed', 'cancelled') AND finished < ?", (now - self.ttl,))]
+        excess = db.execute("SELECT COUNT(*) FROM jobs").fetchone()[0] - len(old) - self.max_jobs
+        if excess > 0:
+            old += [r["id"] for r in db.execute(
+                "SELECT id FROM jobs WHERE status IN ('completed', 'failed', 'cancelled') AND finished >= ? "
+                "ORDER BY finished LIMIT ?", (now - self.ttl, excess))]
+        for job_id in old:
+            db.execute("DELETE FROM events WHERE job_id = ?", (job_id,))
+            db.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
@@ -1,116 +1,172 @@
 # Archivo: backend/app/services/quant_engine.py
 import numpy as np
 import pandas as pd
+import threading
 import concurrent.futures
+from collections import OrderedDict
+from typing import Hashable, NamedTuple, Optional
 # Importación ajustada a la nueva estructura:
-from app.core.engine import BlackScholes 
+from app.core import config
+from app.core.cross_section import metrics_table
+from app.core.engine import BlackScholes, GexEngine, GreeksBuffer
+from app.services.chain_engine import implied_vols
+
+class ContractArrays(NamedTuple):
+    """Columnas de la cadena que usa el motor, ya como arrays float64 alineados por contrato."""
+    K: np.ndarray
+    T: np.ndarray
+    iv: np.ndarray
+    oi: np.ndarray
+    sign: np.ndarray
+
+    @classmethod
+    def from_frame(cls, df_opts, spot=None, r_rate=0.045) -> "ContractArrays":
+        """Con spot, la IV se invierte desde los precios de la cadena (chain_engine.implied_vols)."""
+        return cls(df_opts['strike'].to_numpy(np.float64), df_opts['daysToEx'].to_numpy(np.float64) / 365.0,
+                   implied_vols(df_opts, spot, r_rate), df_opts['openInterest'].to_numpy(np.float64),
+                   np.where(df_opts['type'].to_numpy() == 'call', 1.0, -1.0))
+
+
+class ContractCache:
+    """
+    LRU de ContractArrays por (ticker, max_dte, versión de la cadena en caché): mientras la
+    cadena no cambie, los escenarios no vuelven a tocar el DataFrame.
+    """
+    def __init__(self, max_items: int = None):
+        self.max_items = max_items or config.CONTRACT_ARRAYS_ITEMS
+        self._items: "OrderedDict[Hashable, ContractArrays]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[ContractArrays]:
+        with self._lock:
+            arrays = self._items.get(key)
+            if arrays is not None: self._items.move_to_end(key)
+            return arrays
+
+    def set(self, key: Hashable, arrays: ContractArrays):
+        with self._lock:
+            self._items[key] = arrays
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items: self._items.popitem(last=False)
+
 
 class QuantService:
     def __init__(self, provider):
         self.provider = provider
+        self._local = threading.local()
+        self.contracts = ContractCache()
+
+    def _greeks_buffer(self):
+        """Buffers del kernel de griegas reutilizados entre peticiones (uno por hilo)."""
+        buf = getattr(self._local, "greeks", None)
+        if buf is None:
+            buf = self._local.greeks = GreeksBuffer(dtype=config.GREEKS_DTYPE)
+        return buf
 
-    def compute_gex_profile(self, ticker, max_dte, r_rate=0.045):
+    def compute_gex_profile(self, ticker, max_dte, r_rate=0.045, spot=None, band=(0.4, 1.6), all_flips=False):
         """
-        Calcula el perfil GEX, OI Total y Gamma Flip.
+        Calcula el perfil GEX, OI Total y Gamma Flip (all_flips=True añade todos los cruces).
         Retorna un Diccionario puro (listo para convertir a JSON), no DataFrames complejos.
         """
-        calls, puts, spot = self.provider.get_aggregated_options(ticker, max_dte)
-        
-        if calls is None or spot == 0: return None
-
-        calls['sign'] = 1.0
-        puts['sign'] = -1.0
-        df_opts = pd.concat([calls, puts], ignore_index=True)
-
-        df_opts = df_opts[
-            (df_opts['openInterest'] > 0) & 
-            (df_opts['impliedVolatility'] > 0) & 
-            (df_opts['strike'] > 0)
-        ].copy()
-
-        if df_opts.empty: return None
-
-        df_opts['T'] = df_opts['daysToEx'] / 365.0
-        
-        oi_calls = df_opts[df_opts['sign'] == 1].groupby('strike')['openInterest'].sum()
-        oi_puts = df_opts[df_opts['sign'] == -1].groupby('strike')['openInterest'].sum()
-        
-        cw = float(oi_calls.idxmax()) if not oi_calls.empty else 0.0
-        pw = float(oi_puts.idxmax()) if not oi_puts.empty else 0.0
-
-        gammas = BlackScholes.get_gamma(
-            spot, 
-            df_opts['strike'].values, 
-            df_opts['T'].values, 
-            r_rate, 
-            df_opts['impliedVolatility'].values
-        )
-        
-        df_opts['GEX'] = gammas * df_opts['openInterest'].values * spot * 100 * df_opts['sign'].values
-        
-        grouped = df_opts.groupby('strike').agg(
-            NetGEX=('GEX', 'sum'),
-            TotalOI=('openInterest', 'sum')
+        df_opts = self.provider.get_aggregated_options(ticker, max_dte)
+        if df_opts is None or df_opts.empty: return None
+
+        if spot is None: spot = float(self.provider.get_spot_price(ticker))
+        return self.gex_from_contracts(df_opts, spot, r_rate, band, all_flips)
+
+    def contract_arrays(self, df_opts, key: Hashable = None, spot=None, r_rate=0.045) -> Optional[ContractArrays]:
+        """
+        Arrays de la cadena; con key (ticker, max_dte, versión) quedan en memoria para los
+        escenarios, con la IV resuelta contra el spot de la primera petición que la convierte.
+        """
+        arrays = self.contracts.get(key) if key is not None else None
+        if arrays is not None: return arrays
+        if df_opts is None or df_opts.empty: return None
+        arrays = ContractArrays.from_frame(df_opts, spot, r_rate)
+        if key is not None: self.contracts.set(key, arrays)
+        return arrays
+
+    def gex_from_contracts(self, df_opts, spot, r_rate=0.045, band=(0.4, 1.6), all_flips=False, key=None):
+        """
+        Parte puramente de cálculo de compute_gex_profile: recibe la tabla de contratos ya
+        descargada (p.ej. por el proveedor asíncrono) y no hace ninguna petición.
+        """
+        if not spot: return None
+        arrays = self.contract_arrays(df_opts, key, spot, r_rate)
+        if arrays is None: return None
+
+        res = GexEngine.compute(
+            spot,
+            *arrays,
+            r_rate,
+            band=band,
+            flip_points=config.GEX_FLIP_GRID_POINTS,
+            flip_tol=config.GEX_FLIP_TOL,
+            all_flips=all_flips,
+            dtype=config.GREEKS_DTYPE,
+            out=self._greeks_buffer(),
         )
-        
-        strikes_view = grouped.index
-        mask = (strikes_view >= spot * 0.4) & (strikes_view <= spot * 1.6)
-        
+        if res is None: return None
+
         # Convertimos a JSON-friendly (lista de diccionarios)
-        df_gex = grouped[mask].reset_index()
-        gex_data = df_gex.to_dict(orient='records') 
-
-        # Cálculo de Gamma Flip
-        search_spots = np.linspace(spot * 0.7, spot * 1.3, 40)
-        S_matrix = search_spots[:, np.newaxis]
-        K_vec = df_opts['strike'].values
-        T_vec = df_opts['T'].values
-        IV_vec = df_opts['impliedVolatility'].values
-        OI_vec = df_opts['openInterest'].values
-        Sign_vec = df_opts['sign'].values
-
-        gamma_matrix = BlackScholes.get_gamma(S_matrix, K_vec, T_vec, r_rate, IV_vec)
-        net_gammas = np.sum(gamma_matrix * OI_vec * Sign_vec, axis=1) * S_matrix.flatten() * 100
-
-        crosses = np.where(np.diff(np.sign(net_gammas)))[0]
-        gamma_flip = None
-        if len(crosses) > 0:
-            idx = crosses[np.abs(search_spots[crosses] - spot).argmin()]
-            y1, y2 = net_gammas[idx], net_gammas[idx+1]
-            x1, x2 = search_spots[idx], search_spots[idx+1]
-            if y2 != y1:
-                gamma_flip = x1 - (y1 * (x2 - x1) / (y2 - y1))
-            else:
-                gamma_flip = x1
-        else:
-            gamma_flip = search_spots[np.abs(net_gammas).argmin()]
+        gex_data = [
+            {"strike": float(k), "NetGEX": float(g), "NetDEX": float(d), "NetVEX": float(v),
+             "NetVanna": float(va), "NetCharm": float(ch), "TotalOI": float(o)}
+            for k, g, d, v, va, ch, o in zip(res["strikes"], res["net_gex"], res["net_dex"], res["net_vex"],
+                                            res["net_vanna"], res["net_charm"], res["total_oi"])
+        ]
 
         return {
-            "gex_profile": gex_data, # Datos para el gráfico
+            "gex_profile": gex_data, # Datos para el gráfico (GEX, DEX, VEX, Vanna y Charm por strike)
+            "exposure_totals": res["totals"],
             "spot": spot,
-            "gamma_flip": float(gamma_flip),
-            "call_wall": cw,
-            "put_wall": pw,
-            "iv_atm": float(df_opts['impliedVolatility'].mean())
+            "gamma_flip": res["gamma_flip"],
+            "gamma_flips": res["gamma_flips"],
+            "call_wall": res["call_wall"],
+            "put_wall": res["put_wall"],
+            "iv_atm": res["iv_atm"]
         }
 
+    def scenarios(self, arrays: ContractArrays, spot, spot_range=0.1, spot_steps=41, iv_shifts=(0.0,),
+                  days=(0.0,), r_rate=0.045):
+        """
+        Malla what-if de NetGEX/NetDEX: spots en ±spot_range alrededor del spot, desplazamientos
+        absolutos de IV (0.05 = +5 puntos) y días transcurridos. gamma_flip es, por escenario,
+        el cruce por cero del NetGEX más cercano al spot (interpolado en la malla; None si no hay).
+        """
+        spots = np.linspace(spot * (1 - spot_range), spot * (1 + spot_range), spot_steps)
+        grid = GexEngine.scenarios(*arrays, spots, iv_shifts, days, r_rate, dtype=config.SCENARIO_DTYPE)
+        gex = grid["net_gex"]
+        flips = np.full(gex.shape[:2], np.nan)
+        for idx in np.ndindex(*gex.shape[:2]):
+            g = gex[idx]
+            cross = np.where(np.sign(g[:-1]) * np.sign(g[1:]) < 0)[0]
+            if len(cross) == 0: continue
+            roots = spots[cross] - g[cross] * (spots[cross + 1] - spots[cross]) / (g[cross + 1] - g[cross])
+            flips[idx] = roots[np.abs(roots - spot).argmin()]
+        return {"spots": spots, "iv_shifts": np.asarray(iv_shifts, dtype=np.float64),
+                "days": np.asarray(days, dtype=np.float64), **grid, "gamma_flip": flips}
+
     # Mantengo el analyze_ticker intacto por ahora
     def analyze_ticker(self, ticker, sector, rf_rate, lookback, max_dte):
         try:
-            calls, puts, spot = self.provider.get_aggregated_options(ticker, max_dte)
-            if calls is None: return None
+            df_opts = self.provider.get_aggregated_options(ticker, max_dte)
+            if df_opts is None or df_opts.empty: return None
+            calls = df_opts[df_opts['type'] == 'call']
+            puts = df_opts[df_opts['type'] == 'put']
+            spot = float(self.provider.get_spot_price(ticker))
             
             # Ajuste: usamos self.provider.get_history
             hist = self.provider.get_history(ticker, period=f"{max(lookback, 60) + 20}d")
-            if len(hist) < 50: return None
+            table = metrics_table([ticker], hist["Close"].to_numpy(dtype=np.float64)[np.newaxis, :], lookback)
+            if table.empty: return None
+            m = table.iloc[0]
             
-            sma20 = float(hist["Close"].tail(20).mean())
-            sma50 = float(hist["Close"].tail(50).mean())
-            dist_sma20 = ((spot - sma20) / sma20) * 100
-            dist_sma50 = ((spot - sma50) / sma50) * 100
-
-            log_ret = np.log(hist["Close"] / hist["Close"].shift(1)).dropna()
-            rv = float(log_ret.tail(lookback).std() * np.sqrt(252))
+            sma20 = float(m["SMA20_val"])
+            sma50 = float(m["SMA50_val"])
+            dist_sma20 = float(m["Dist SMA20 %"])
+            dist_sma50 = float(m["Dist SMA50 %"])
+            rv = float(m["RV"]) / 100
 
             cw = float(calls.groupby('strike')['openInterest'].sum().idxmax())
             pw = float(puts.groupby('strike')['openInterest'].sum().idxmax())
@@ -161,4 +217,4 @@ class QuantService:
                 if res:
                     results.append(res)
                     
-        return pd.DataFrame(results)
\ No newline at end of file
+        return pd.DataFrame(results)
\ No newline at end of file
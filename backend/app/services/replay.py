@@ -0,0 +1,310 @@
+# Archivo: backend/app/services/replay.py
+"""
+Proveedor de grabación/reproducción para pruebas de carga deterministas y offline.
+
+Un snapshot es un directorio con las respuestas ya grabadas de un proveedor real:
+    manifest.json          formato, origen, fecha, periodo, max_dte, spots y tickers
+    universe.csv           constituyentes (mismo formato que el CSV del S&P 500)
+    history/{TICKER}.npz   fechas (datetime64[D]) + OHLCV en float64
+    chains/{TICKER}.npz    tabla de contratos agregada (hasta max_dte) con los tipos de CONTRACT_DTYPES
+
+En modo replay (QUANTDESK_MARKET_DATA=replay) las rutas y el scanner leen del snapshot
+en QUANTDESK_REPLAY_DIR pasando por el governor y por la caché como con Yahoo, con una
+latencia por llamada (log-normal: mediana REPLAY_LATENCY, dispersión REPLAY_JITTER) y
+errores 429 inyectados con probabilidad REPLAY_ERROR_RATE, que el governor reintenta y
+el proveedor acaba sirviendo con el mismo respaldo que ante un fallo real de Yahoo.
+Con REPLAY_SEED fijo la secuencia de latencias y errores es reproducible.
+
+Grabar desde Yahoo (los N primeros del universo, o un sector):
+    python -m app.services.replay record --out snapshots/sp500 --tickers 500
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+import httpx
+import numpy as np
+import pandas as pd
+
+from app.core import config
+from app.services.async_provider import AsyncMarketDataProvider
+from app.services.chain_engine import CONTRACT_DTYPES, CONTRACT_TYPES, empty_contracts
+from app.services.data_provider import MarketDataProvider, OptionChain, fallback, is_mock
+from app.services.governor import UpstreamGovernor
+from app.services.history_store import COLUMNS, period_start
+
+log = logging.getLogger(__name__)
+
+FORMAT = 1
+CHAIN_COLUMNS = [c for c in CONTRACT_DTYPES if c != "daysToEx"]
+LEG_COLUMNS = ["strike", "lastPrice", "bid", "ask", "volume", "openInterest", "impliedVolatility"]
+UNIVERSE_COLUMNS = {"Ticker": "Symbol", "Name": "Security", "Sector": "GICS Sector", "SubIndustry": "GICS Sub-Industry"}
+
+
+class InjectedError(httpx.HTTPStatusError):
+    """Error de upstream simulado: un 429, así que el governor lo trata como saturación."""
+    def __init__(self, kind: str, ticker: str):
+        request = httpx.Request("GET", f"replay://{kind}/{ticker}")
+        super().__init__(f"error inyectado ({kind} {ticker})", request=request,
+                         response=httpx.Response(429, request=request))
+
+
+# --- ESCRITURA ---
+class SnapshotWriter:
+    """Escribe un snapshot; cada fichero se publica de forma atómica y el manifest al final."""
+    def __init__(self, path: str, source: str, period: str, max_dte: int):
+        self.path = path
+        self.manifest = {"format": FORMAT, "source": source, "created": time.time(), "period": period,
+                         "max_dte": max_dte, "spots": {}, "tickers": []}
+        self._lock = threading.Lock()
+        for sub in ("history", "chains"): os.makedirs(os.path.join(path, sub), exist_ok=True)
+
+    def _save(self, rel: str, **arrays):
+        dest = os.path.join(self.path, rel)
+        tmp = f"{dest}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f: np.savez_compressed(f, **arrays)
+        os.replace(tmp, dest)
+
+    def universe(self, records: List[Dict]):
+        df = pd.DataFrame(records).reindex(columns=list(UNIVERSE_COLUMNS)).fillna("")
+        df.rename(columns=UNIVERSE_COLUMNS).to_csv(os.path.join(self.path, "universe.csv"), index=False)
+
+    def spot(self, ticker: str, price: float):
+        with self._lock: self.manifest["spots"][ticker] = float(price)
+
+    def history(self, ticker: str, df: pd.DataFrame):
+        idx = df.index.tz_localize(None) if getattr(df.index, "tz", None) is not None else df.index
+        self._save(f"history/{ticker}.npz", Date=idx.to_numpy().astype("datetime64[D]"),
+                   **{c: df[c].to_numpy(dtype=np.float64) for c in COLUMNS if c in df.columns})
+
+    def chain(self, ticker: str, df: pd.DataFrame):
+        expirations, codes = np.unique(df["expirationDate"].to_numpy().astype(str), return_inverse=True)
+        self._save(f"chains/{ticker}.npz", expirations=expirations, expiry=codes.astype(np.int16),
+                   daysToEx=df["daysToEx"].to_numpy(np.int16), is_call=(df["type"] == "call").to_numpy(np.int8),
+                   **{c: df[c].to_numpy(CONTRACT_DTYPES[c]) for c in CHAIN_COLUMNS})
+
+    def close(self):
+        with self._lock:
+            self.manifest["tickers"] = sorted(self.manifest["spots"])
+            tmp = os.path.join(self.path, "manifest.json.tmp")
+            with open(tmp, "w", encoding="utf-8") as f: json.dump(self.manifest, f)
+            os.replace(tmp, os.path.join(self.path, "manifest.json"))
+
+
+def record_snapshot(provider: MarketDataProvider, path: str, universe: List[Dict], tickers: List[str] = None,
+                    period: str = "1y", max_dte: int = config.DEFAULT_MAX_DTE, source: str = "yahoo",
+                    workers: int = 8) -> Dict:
+    """
+    Graba spot, histórico y cadena agregada de cada ticker con cualquier MarketDataProvider.
+    Las respuestas de respaldo (mock) o vacías no se graban: en replay ese dato falta y se
+    comporta como un fallo del upstream. Retorna el manifest escrito.
+    """
+    writer = SnapshotWriter(path, source, period, max_dte)
+    writer.universe(universe)
+    tickers = tickers or [r["Ticker"] for r in universe]
+
+    def one(ticker: str):
+        spot = provider.get_spot_price(ticker)
+        if not spot or is_mock(spot): return False
+        hist = provider.get_history(ticker, period)
+        if hist is not None and not hist.empty and not is_mock(hist): writer.history(ticker, hist)
+        chain = provider.get_aggregated_options(ticker, max_dte)
+        if chain is not None and not chain.empty: writer.chain(ticker, chain)
+        writer.spot(ticker, spot)
+        return True
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for i, ok in enumerate(pool.map(one, tickers), 1):
+            if i % 25 == 0: log.info("grabando snapshot", extra={"done": i, "total": len(tickers)})
+    writer.close()
+    return writer.manifest
+
+
+# --- LECTURA ---
+class ReplaySnapshot:
+    """Snapshot en memoria: manifest al abrir, y cada npz al pedirse por primera vez."""
+    def __init__(self, path: str = None):
+        self.path = path or config.REPLAY_DIR
+        with open(os.path.join(self.path, "manifest.json"), encoding="utf-8") as f: self.manifest = json.load(f)
+        if self.manifest.get("format") != FORMAT:
+            raise ValueError(f"formato de snapshot no soportado: {self.manifest.get('format')}")
+        self.spots: Dict[str, float] = self.manifest["spots"]
+        self.universe_path = os.path.join(self.path, "universe.csv")
+        self.history = lru_cache(maxsize=None)(self._history)
+        self.chain = lru_cache(maxsize=None)(self._chain)
+
+    def _load(self, rel: str):
+        try:
+            with np.load(os.path.join(self.path, rel), allow_pickle=False) as data: return dict(data)
+        except OSError:
+            return None
+
+    def _history(self, ticker: str) -> Optional[pd.DataFrame]:
+        data = self._load(f"history/{ticker}.npz")
+        if data is None: return None
+        return pd.DataFrame({c: data[c] for c in COLUMNS if c in data},
+                            index=pd.DatetimeIndex(data["Date"].astype("datetime64[ns]"), name="Date"))
+
+    def _chain(self, ticker: str) -> Optional[pd.DataFrame]:
+        data = self._load(f"chains/{ticker}.npz")
+        if data is None: return None
+        # Los snapshots anteriores guardan volumen y OI en float32: el astype los lleva al esquema
+        df = pd.DataFrame({c: data[c] for c in CHAIN_COLUMNS}).astype({c: CONTRACT_DTYPES[c] for c in CHAIN_COLUMNS})
+        df["daysToEx"] = data["daysToEx"]
+        df["type"] = pd.Categorical.from_codes(1 - data["is_call"], dtype=CONTRACT_TYPES)
+        df["expirationDate"] = pd.Categorical.from_codes(data["expiry"], categories=data["expirations"].astype(object))
+        return df
+
+    def universe(self) -> List[Dict]:
+        df = pd.read_csv(self.universe_path, dtype=str).fillna("")
+        return df.rename(columns={"Symbol": "Ticker", "GICS Sector": "Sector"})[["Ticker", "Sector"]].to_dict("records")
+
+
+class FaultInjector:
+    """Sorteo de latencia y errores por llamada, con un RNG propio (semilla fija = misma secuencia)."""
+    def __init__(self, latency: float = None, jitter: float = None, error_rate: float = None, seed: int = None):
+        self.latency = config.REPLAY_LATENCY if latency is None else latency
+        self.jitter = config.REPLAY_JITTER if jitter is None else jitter
+        self.error_rate = config.REPLAY_ERROR_RATE if error_rate is None else error_rate
+        self._rng = random.Random(config.REPLAY_SEED if seed is None else seed)
+        self._lock = threading.Lock()
+
+    def draw(self):
+        """(segundos de espera, ¿falla esta llamada?)"""
+        with self._lock:
+            delay = self.latency * (self._rng.lognormvariate(0.0, self.jitter) if self.jitter > 0 else 1.0)
+            return delay, self._rng.random() < self.error_rate
+
+
+class _ReplayBase:
+    """Lectura común a las dos variantes; sólo cambia cómo se espera la latencia."""
+    def __init__(self, snapshot: ReplaySnapshot = None, faults: FaultInjector = None,
+                 governor: UpstreamGovernor = None):
+        self.snapshot = snapshot or ReplaySnapshot()
+        self.faults = faults or FaultInjector()
+        self.governor = governor or UpstreamGovernor()
+
+    def _history(self, ticker: str, period: str) -> pd.DataFrame:
+        df = self.snapshot.history(ticker)
+        if df is None or df.empty: return fallback("history", ticker, period)
+        start = period_start(period, df.index[-1].to_datetime64())
+        return df.copy(deep=False) if start is None else df.loc[df.index >= start]
+
+    def _spot(self, ticker: str) -> float:
+        price = self.snapshot.spots.get(ticker)
+        return float(price) if price else fallback("spot")
+
+    def _aggregated(self, ticker: str, max_dte: int) -> pd.DataFrame:
+        df = self.snapshot.chain(ticker)
+        # Cadena no grabada: igual que un fallo del upstream
+        if df is None: return fallback("contracts")
+        if df.empty: return empty_contracts()
+        within = df["daysToEx"] <= max_dte
+        # Igual que select_expiries: sin vencimientos en la ventana, el más cercano
+        if not within.any(): within = df["daysToEx"] == df["daysToEx"].min()
+        return df.copy(deep=False) if within.all() else df.loc[within].reset_index(drop=True)
+
+    def _chain(self, ticker: str, expiration: str = None):
+        df = self.snapshot.chain(ticker)
+        if df is None or df.empty: return fallback("chain")
+        if expiration is None: mask = df["daysToEx"] == df["daysToEx"].min()
+        else: mask = df["expirationDate"] == str(expiration)[:10]
+        if not mask.any(): return fallback("chain")
+        legs = df.loc[mask]
+        return OptionChain(legs.loc[legs["type"] == "call", LEG_COLUMNS].reset_index(drop=True),
+                           legs.loc[legs["type"] == "put", LEG_COLUMNS].reset_index(drop=True))
+
+
+class ReplayProvider(_ReplayBase, MarketDataProvider):
+    """MarketDataProvider que reproduce un snapshot (hilos: la latencia bloquea con time.sleep)."""
+    def _call(self, kind: str, ticker: str, read):
+        def _once():
+            delay, fail = self.faults.draw()
+            if delay: time.sleep(delay)
+            if fail: raise InjectedError(kind, ticker)
+            return read()
+        return self.governor.call(_once)
+
+    def get_history(self, ticker: str, period: str = "1y") -> pd.DataFrame:
+        try: return self._call("history", ticker, lambda: self._history(ticker, period))
+        except httpx.HTTPError: return fallback("history", ticker, period)
+
+    def get_spot_price(self, ticker: str) -> float:
+        try: return self._call("spot", ticker, lambda: self._spot(ticker))
+        except httpx.HTTPError: return fallback("spot")
+
+    def get_aggregated_options(self, ticker: str, max_dte: int = config.DEFAULT_MAX_DTE) -> pd.DataFrame:
+        try: return self._call("chain", ticker, lambda: self._aggregated(ticker, max_dte))
+        except httpx.HTTPError: return fallback("contracts")
+
+    def get_options_chain(self, ticker: str, expiration: str = None):
+        try: return self._call("chain", ticker, lambda: self._chain(ticker, expiration))
+        except httpx.HTTPError: return fallback("chain")
+
+    def get_sp500_tickers(self) -> List[Dict]:
+        return self.snapshot.universe()
+
+
+class AsyncReplayProvider(_ReplayBase, AsyncMarketDataProvider):
+    """Variante asyncio: la latencia es un asyncio.sleep, así que cientos de llamadas pueden estar en vuelo."""
+    async def _call(self, kind: str, ticker: str, read):
+        async def _once():
+            delay, fail = self.faults.draw()
+            if delay: await asyncio.sleep(delay)
+            if fail: raise InjectedError(kind, ticker)
+            return read()
+        return await self.governor.call_async(_once)
+
+    async def get_history(self, ticker: str, period: str = "1y") -> pd.DataFrame:
+        try: return await self._call("history", ticker, lambda: self._history(ticker, period))
+        except httpx.HTTPError: return fallback("history", ticker, period)
+
+    async def get_spot_price(self, ticker: str) -> float:
+        try: return await self._call("spot", ticker, lambda: self._spot(ticker))
+        except httpx.HTTPError: return fallback("spot")
+
+    async def get_aggregated_options(self, ticker: str, max_dte: int = config.DEFAULT_MAX_DTE) -> pd.DataFrame:
+        try: return await self._call("chain", ticker, lambda: self._aggregated(ticker, max_dte))
+        except httpx.HTTPError: return fallback("contracts")
+
+    async def get_options_chain(self, ticker: str, expiration: str = None):
+        try: return await self._call("chain", ticker, lambda: self._chain(ticker, expiration))
+        except httpx.HTTPError: return fallback("chain")
+
+    async def get_sp500_tickers(self) -> List[Dict]:
+        return self.snapshot.universe()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Graba un snapshot de datos de mercado para replay")
+    parser.add_argument("command", choices=["record"])
+    parser.add_argument("--out", required=True, help="directorio del snapshot")
+    parser.add_argument("--tickers", type=int, default=500, help="primeros N tickers del universo")
+    parser.add_argument("--sector", default=None)
+    parser.add_argument("--period", default="1y")
+    parser.add_argument("--max-dte", type=int, default=config.DEFAULT_MAX_DTE)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    from app.core.logs import setup_logging
+    from app.services.factory import get_governor, get_universe
+    from app.services.data_provider import YFinanceProvider
+    from app.services.history_store import HistoryStore
+
+    setup_logging()
+    members = get_universe().members(args.sector)[:args.tickers]
+    # Proveedor sin caché delante: lo grabado es exactamente lo que respondió Yahoo
+    live = YFinanceProvider(history_store=HistoryStore(), governor=get_governor())
+    manifest = record_snapshot(live, args.out, members, [m["Ticker"] for m in members], args.period,
+                               args.max_dte, workers=args.workers)
+    print(f"{len(manifest['tickers'])}/{len(members)} tickers grabados en {args.out}")
+    sys.exit(0 if manifest["tickers"] else 1)
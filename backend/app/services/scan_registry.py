@@ -0,0 +1,161 @@
+# Archivo: backend/app/services/scan_registry.py
+import time
+import asyncio
+import uuid
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+from app.core import config
+from app.core.serialization import sanitize_json
+from app.services.scan_stream import ScanStream
+from app.services.universe import normalize_sector
+
+# Estados en los que un escaneo ya no cambia (y puede expulsarse del registro)
+FINISHED = ("completed", "failed", "cancelled")
+
+
+def config_key(scan_config) -> Tuple:
+    """ScannerConfig normalizado: 'All', ' todos ' y 'Todos' son el mismo escaneo."""
+    return (normalize_sector(scan_config.sector), int(scan_config.num_tickers), int(scan_config.max_dte), int(scan_config.lookback))
+
+
+class ScanReporter:
+    """
+    Lo que scan_market publica (filas, progreso y estado final) sobre cualquier backend
+    de escaneos: ScanRegistry en el propio proceso o ScanJobQueue para workers aparte.
+    """
+    def __init__(self, backend, task_id: str):
+        self.backend = backend
+        self.task_id = task_id
+        self._last_progress = None
+
+    def progress(self, progress: int):
+        # Sólo cuando cambia el porcentaje: no hace falta un evento por ticker
+        if progress == self._last_progress: return
+        self._last_progress = progress
+        self.backend.publish(self.task_id, "progress", {"status": "running", "progress": progress})
+
+    def result(self, row: dict):
+        self.backend.publish(self.task_id, "result", sanitize_json(row))
+
+    def done(self):
+        self.backend.publish(self.task_id, "done", {"status": "completed"})
+
+    def failed(self, error: str):
+        self.backend.publish(self.task_id, "failed", {"status": "failed", "error": error})
+
+
+class ScanRegistry:
+    """
+    Registro acotado de escaneos en memoria (un solo proceso API). Un escaneo idéntico
+    (misma config normalizada) se engancha al existente si éste sigue en marcha o terminó
+    dentro de la misma franja de `dedup_window` segundos. Los terminados se expulsan por
+    antigüedad (`ttl`) y, si se supera `max_tasks`, del más antiguo al más reciente.
+    """
+    # Los escaneos corren en el event loop del propio proceso API
+    inline = True
+
+    def __init__(self, max_tasks: int = None, ttl: float = None, dedup_window: float = None):
+        self.max_tasks = max_tasks or config.SCAN_REGISTRY_MAX
+        self.ttl = ttl or config.SCAN_RESULT_TTL
+        self.dedup_window = dedup_window or config.SCAN_DEDUP_WINDOW
+        self.tasks: "OrderedDict[str, Dict]" = OrderedDict()
+        self.streams: Dict[str, ScanStream] = {}
+        self._by_key: Dict[Tuple, str] = {}
+        self._runners: Dict[str, asyncio.Task] = {}
+
+    def _bucket(self, t: float) -> int:
+        return int(t // self.dedup_window)
+
+    def start(self, scan_config) -> Tuple[str, bool]:
+        """Retorna (task_id, nuevo). nuevo=False si se reutiliza un escaneo en curso o reciente."""
+        now = time.time()
+        self.evict(now)
+        key = config_key(scan_config)
+        task_id = self._by_key.get(key)
+        task = self.tasks.get(task_id)
+        if task is not None:
+            running = task["status"] not in FINISHED
+            recent = task["status"] == "completed" and self._bucket(task["created"]) == self._bucket(now)
+            if running or recent: return task_id, False
+
+        task_id = str(uuid.uuid4())
+        self.tasks[task_id] = {"status": "pending", "progress": 0, "data": [], "created": now, "key": key}
+        self.streams[task_id] = ScanStream()
+        self._by_key[key] = task_id
+        self.evict(now)
+        return task_id, True
+
+    def reporter(self, task_id: str) -> ScanReporter:
+        return ScanReporter(self, task_id)
+
+    def attach(self, task_id: str, runner: asyncio.Task):
+        """Asocia la corrutina que ejecuta el escaneo, para poder cancelarla."""
+        self._runners[task_id] = runner
+        runner.add_done_callback(lambda _: self._runners.pop(task_id, None))
+
+    def cancel(self, task_id: str) -> Optional[bool]:
+        """Detiene un escaneo en curso. None si no existe; False si ya había terminado."""
+        task = self.tasks.get(task_id)
+        if task is None: return None
+        if task["status"] in FINISHED: return False
+        self.publish(task_id, "cancelled", {"status": "cancelled"})
+        runner = self._runners.pop(task_id, None)
+        if runner is not None: runner.cancel()
+        return True
+
+    def publish(self, task_id: str, event: str, data: dict):
+        """Aplica el evento al estado de la tarea y lo emite por su stream SSE."""
+        task = self.tasks.get(task_id)
+        if task is None or task["status"] in FINISHED: return
+        if event == "result":
+            task["data"].append(data)
+        elif event == "progress":
+            task["status"], task["progress"] = "running", data["progress"]
+        elif event == "done":
+            task["status"], task["progress"] = "completed", 100
+            data = dict(data, count=len(task["data"]))
+        elif event == "failed":
+            task["status"], task["error"] = "failed", data.get("error")
+        elif event == "cancelled":
+            task["status"] = "cancelled"
+            data = dict(data, count=len(task["data"]))
+        self.streams[task_id].publish(event, data)
+        if task["status"] in FINISHED:
+            task["finished"] = time.time()
+            self.evict()
+
+    def status(self, task_id: str, offset: int = 0, limit: int = None) -> Optional[Dict]:
+        """Estado público de la tarea con la página [offset, offset+limit) de resultados."""
+        task = self.tasks.get(task_id)
+        if task is None: return None
+        data = task["data"]
+        end = len(data) if limit is None else offset + limit
+        out = {k: v for k, v in task.items() if k not in ("data", "key", "created", "finished")}
+        out.update(data=data[offset:end], total=len(data), offset=offset, limit=limit)
+        return out
+
+    def subscribe(self, task_id: str, last_id: int = 0) -> Optional[AsyncIterator[str]]:
+        """Generador SSE de la tarea (None si no existe)."""
+        stream = self.streams.get(task_id)
+        return stream.subscribe(last_id) if stream is not None else None
+
+    def counts(self) -> Dict[str, int]:
+        """Tareas por estado."""
+        out: Dict[str, int] = {}
+        for t in self.tasks.values(): out[t["status"]] = out.get(t["status"], 0) + 1
+        return out
+
+    def _drop(self, task_id: str):
+        task = self.tasks.pop(task_id)
+        self.streams.pop(task_id, None)
+        if self._by_key.get(task["key"]) == task_id: del self._by_key[task["key"]]
+
+    def evict(self, now: float = None):
+        now = now or time.time()
+        finished = [tid for tid, t in self.tasks.items() if t["status"] in FINISHED]
+        for tid in finished:
+            if now - self.tasks[tid].get("finished", self.tasks[tid]["created"]) > self.ttl: self._drop(tid)
+        for tid in finished:
+            if len(self.tasks) <= self.max_tasks: break
+            if tid in self.tasks: self._drop(tid)
@@ -0,0 +1,50 @@
+# Archivo: backend/app/services/scan_stream.py
+import json
+import asyncio
+from typing import AsyncIterator, List, Optional, Set, Tuple
+
+# Eventos que cierran el stream de un escaneo
+TERMINAL_EVENTS = ("done", "failed", "cancelled")
+
+
+class ScanStream:
+    """
+    Canal de eventos de un escaneo (progress, result, done, failed, cancelled) para Server-Sent Events.
+    Guarda el historial numerado: quien se suscribe tarde (o reconecta con Last-Event-ID)
+    recibe primero lo que se perdió y después los eventos en vivo. Se publica desde el
+    event loop (scan_market es una corrutina), así que no hace falta bloqueo.
+    """
+    def __init__(self):
+        self.events: List[Tuple[int, str, str]] = []
+        self._subscribers: Set[asyncio.Queue] = set()
+
+    @property
+    def closed(self) -> bool:
+        return bool(self.events) and self.events[-1][1] in TERMINAL_EVENTS
+
+    def publish(self, event: str, data) -> int:
+        """data ya debe ser JSON-serializable (sin NaN): se serializa una sola vez aquí."""
+        if self.closed: return self.events[-1][0]
+        item = (len(self.events) + 1, event, json.dumps(data, allow_nan=False))
+        self.events.append(item)
+        for q in self._subscribers: q.put_nowait(item)
+        return item[0]
+
+    async def subscribe(self, last_id: int = 0, heartbeat: Optional[float] = 15.0) -> AsyncIterator[str]:
+        """Genera los eventos ya formateados en SSE; un comentario cada `heartbeat` s mantiene viva la conexión."""
+        q = asyncio.Queue()
+        self._subscribers.add(q)
+        try:
+            for item in self.events[last_id:]: q.put_nowait(item)
+            while True:
+                try:
+                    ev_id, event, payload = await asyncio.wait_for(q.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                if ev_id <= last_id: continue
+                last_id = ev_id
+                yield f"id: {ev_id}\nevent: {event}\ndata: {payload}\n\n"
+                if event in TERMINAL_EVENTS: return
+        finally:
+            self._subscribers.discard(q)
@@ -0,0 +1,89 @@
+# Archivo: backend/app/services/scan_worker.py
+"""
+Proceso worker de escaneos: reclama trabajos de la cola SQLite y los ejecuta con
+scan_market. Se lanza aparte (python -m app.services.scan_worker, tantos como núcleos
+o nodos se quieran) o lo arranca la propia API si QUANTDESK_SCAN_LOCAL_WORKERS > 0.
+"""
+import os
+import signal
+import socket
+import asyncio
+import logging
+
+from app.core import config
+from app.core.logs import setup_logging
+from app.schemas import ScannerConfig
+from app.services.job_queue import ScanJobQueue
+
+log = logging.getLogger(__name__)
+
+
+async def _watch(queue: ScanJobQueue, job_id: str, scan: asyncio.Task, reporter):
+    """
+    En cada sondeo: vuelca por lotes lo publicado por el escaneo, vigila cancelaciones
+    pedidas desde la API y renueva el latido. SQLite siempre desde un hilo (to_thread):
+    una base de datos ocupada no debe frenar las descargas en vuelo del worker.
+    """
+    beat = 0.0
+    while not scan.done():
+        await asyncio.sleep(config.SCAN_WORKER_POLL)
+        await reporter.flush()
+        if await asyncio.to_thread(queue.cancelled, job_id):
+            scan.cancel()
+            return
+        beat += config.SCAN_WORKER_POLL
+        if beat >= config.SCAN_JOB_LEASE / 4:
+            beat = 0.0
+            await asyncio.to_thread(queue.heartbeat, job_id)
+
+
+async def run_worker(queue: ScanJobQueue = None, stop: asyncio.Event = None):
+    # Importación tardía: el proveedor (y su pool HTTP) se crea en el proceso worker
+    from app.services.screener import scan_market, aprovider
+
+    queue = queue or ScanJobQueue()
+    stop = stop or asyncio.Event()
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    log.info("scan worker esperando trabajos", extra={"worker": worker_id, "queue": queue.path})
+    try:
+        while not stop.is_set():
+            job = await asyncio.to_thread(queue.claim, worker_id)
+            if job is None:
+                try: await asyncio.wait_for(stop.wait(), config.SCAN_WORKER_POLL)
+                except asyncio.TimeoutError: pass
+                continue
+            job_id, cfg = job
+            reporter = queue.reporter(job_id)
+            scan = asyncio.create_task(scan_market(ScannerConfig(**cfg), job_id, reporter))
+            watch = asyncio.create_task(_watch(queue, job_id, scan, reporter))
+            try:
+                # wait (no await scan): un escaneo cancelado no debe tumbar el worker
+                await asyncio.wait([scan])
+            finally:
+                scan.cancel()
+                # El vigilante sale solo al acabar el escaneo: esperarlo (y no cancelarlo) evita
+                # que un lote suyo a medio escribir se cuele detrás del final
+                await asyncio.gather(watch, return_exceptions=True)
+                # Lo que quede (últimas filas y done/failed); si falla, el lease lo dará por perdido
+                try: await reporter.flush()
+                except Exception: log.exception("no se pudo volcar el final del escaneo", extra={"job": job_id})
+    finally:
+        await aprovider.aclose()
+
+
+def main():
+    # Proceso nuevo (spawn): el logging de la API no se hereda
+    setup_logging()
+
+    async def _main():
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try: loop.add_signal_handler(sig, stop.set)
+            except (NotImplementedError, RuntimeError): pass
+        await run_worker(stop=stop)
+    asyncio.run(_main())
+
+
+if __name__ == "__main__":
+    main()
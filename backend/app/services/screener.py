@@ -1,148 +1,210 @@
 import pandas as pd
 import numpy as np
+import time
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
-from app.services.data_provider import YFinanceProvider
+import logging
+from app.core.cross_section import close_matrix, metrics_table
+from app.core.metrics import SCAN_TICKERS, STAGE_SECONDS, stage
+from app.services.chain_engine import expiry_days, implied_vols
+from app.services.data_provider import is_mock
+from app.services.factory import get_provider, get_async_provider, get_universe
+from app.services.governor import BACKGROUND, fetch_priority
 
-provider = YFinanceProvider()
+log = logging.getLogger(__name__)
+provider = get_provider()
+aprovider = get_async_provider()
 
-def analyze_single_ticker(item, lookback):
+def history_metrics(df, lookback):
+    """Métricas de tendencia/volatilidad de un ticker suelto (mismas definiciones que el lote)."""
+    table = metrics_table(["_"], df['Close'].to_numpy(dtype=np.float64)[np.newaxis, :], lookback)
+    return None if table.empty else table.iloc[0].to_dict()
+
+def analyze_single_ticker(item, lookback, df=None, metrics=None):
+    """
+    metrics: fila ya calculada por la etapa transversal (scan_market); en ese caso
+    aquí sólo queda la lógica de opciones. Si no, se calcula desde el histórico.
+    """
     ticker = item.get('Ticker')
-    print(f"DEBUG [{ticker}]: Iniciando análisis...") # CHIVATO 1
-    
     try:
-        # 1. Histórico
-        df = provider.get_history(ticker, period="6mo")
-        if df.empty:
-            print(f"DEBUG [{ticker}]: ❌ DataFrame vacío o fallo en descarga.")
-            return None
-        
-        if len(df) < 50:
-            print(f"DEBUG [{ticker}]: ❌ Pocos datos ({len(df)} filas).")
-            return None
-
-        # 2. Precios y Medias
-        price = float(df['Close'].iloc[-1])
-        sma20 = float(df['Close'].rolling(20).mean().iloc[-1])
-        sma50 = float(df['Close'].rolling(50).mean().iloc[-1])
-        
-        # 3. Volatilidad
-        try:
-            log_ret = np.log(df['Close'] / df['Close'].shift(1))
-            rv = float(log_ret.tail(lookback).std() * np.sqrt(252) * 100)
-        except Exception as e:
-            print(f"DEBUG [{ticker}]: Error cálculo RV: {e}")
-            rv = 0.0
-        
+        # 1-3. Histórico, precios, medias y volatilidad
+        if metrics is None:
+            if df is None: df = provider.get_history(ticker, period="6mo")
+            if df.empty or is_mock(df):
+                # Sin histórico real no hay fila: nunca se puntúa sobre un paseo aleatorio
+                SCAN_TICKERS.inc("no_history")
+                log.debug("sin histórico real", extra={"ticker": ticker})
+                return None
+            metrics = history_metrics(df, lookback)
+            if metrics is None:
+                SCAN_TICKERS.inc("short_history")
+                log.debug("histórico demasiado corto", extra={"ticker": ticker, "rows": len(df)})
+                return None
+
         # 4. Opciones
-        iv = 0.0; vrp = 0.0; call_wall = 0.0; put_wall = 0.0
-        dist_call = 0.0; dist_put = 0.0
-        
         chain = provider.get_options_chain(ticker)
-        if chain:
-            try:
-                calls = chain.calls
-                puts = chain.puts
-                
-                # IV ATM
-                mask = (calls['strike'] > price*0.95) & (calls['strike'] < price*1.05)
-                atm = calls[mask]
-                if not atm.empty:
-                    iv = float(atm['impliedVolatility'].mean() * 100)
-                else:
-                    # Si no hay ATM, media de todo (fallback)
-                    iv = float(calls['impliedVolatility'].mean() * 100)
-                
-                vrp = iv - rv
-                
-                # Walls
-                if not calls.empty:
-                    idx = calls['openInterest'].idxmax()
-                    call_wall = float(calls.loc[idx, 'strike'])
-                    dist_call = ((call_wall - price)/price)*100
-                
-                if not puts.empty:
-                    idx = puts['openInterest'].idxmax()
-                    put_wall = float(puts.loc[idx, 'strike'])
-                    dist_put = ((put_wall - price)/price)*100
-            except Exception as e:
-                print(f"DEBUG [{ticker}]: Error procesando opciones: {e}")
-        else:
-            print(f"DEBUG [{ticker}]: ⚠️ No hay cadena de opciones.")
-
-        # RESULTADO FINAL
-        # Imprimimos valores clave para ver si llegan al Playbook
-        print(f"DEBUG [{ticker}]: ✅ ÉXITO -> Precio:{price:.1f} SMA20:{sma20:.1f} VRP:{vrp:.1f}")
-        
-        return {
-            "Ticker": ticker,
-            "Sector": item.get('Sector'),
-            "Price": price,
-            "SMA20_val": sma20 if not pd.isna(sma20) else price,
-            "SMA50_val": sma50 if not pd.isna(sma50) else price,
-            "Dist SMA20 %": ((price - sma20)/sma20)*100 if sma20 else 0,
-            "Dist SMA50 %": ((price - sma50)/sma50)*100 if sma50 else 0,
-            "VRP": vrp,
-            "IV": iv,
-            "RV": rv,
-            "Call Wall": call_wall,
-            "Put Wall": put_wall,
-            "Dist Call Wall %": dist_call,
-            "Dist Put Wall %": dist_put
-        }
-        
+        return build_result(item, metrics, chain)
+
+    except Exception as e:
+        SCAN_TICKERS.inc("error")
+        log.warning("fallo en el análisis", extra={"ticker": ticker, "error": str(e)})
+        return None
+
+async def analyze_single_ticker_async(item, lookback, metrics=None):
+    """Igual que analyze_single_ticker pero sin bloquear: las descargas se esperan en el event loop."""
+    ticker = item.get('Ticker')
+    try:
+        if metrics is None:
+            df = await aprovider.get_history(ticker, period="6mo")
+            if df.empty or is_mock(df):
+                # Sin histórico real no hay fila: nunca se puntúa sobre un paseo aleatorio
+                SCAN_TICKERS.inc("no_history")
+                log.debug("sin histórico real", extra={"ticker": ticker})
+                return None
+            metrics = history_metrics(df, lookback)
+            if metrics is None:
+                SCAN_TICKERS.inc("short_history")
+                log.debug("histórico demasiado corto", extra={"ticker": ticker, "rows": len(df)})
+                return None
+
+        chain = await aprovider.get_options_chain(ticker)
+        return build_result(item, metrics, chain)
+
     except Exception as e:
-        print(f"DEBUG [{ticker}]: 💥 CRASH total en análisis: {e}")
+        SCAN_TICKERS.inc("error")
+        log.warning("fallo en el análisis", extra={"ticker": ticker, "error": str(e)})
         return None
 
-async def scan_market(config, task_id: str):
-    from app.routes import update_task_status
-    print(f"\n--- 🏁 START SCAN (Task: {task_id}) ---")
+def build_result(item, metrics, chain):
+    """Fila final del scanner a partir de las métricas de histórico y la cadena ya descargada."""
+    ticker = item.get('Ticker')
+    price = float(metrics["Price"])
+    sma20 = float(metrics["SMA20_val"])
+    rv = float(metrics["RV"])
+
+    # 4. Opciones
+    iv = 0.0; vrp = 0.0; call_wall = 0.0; put_wall = 0.0
+    dist_call = 0.0; dist_put = 0.0
+
+    mock_chain = is_mock(chain)
+    if chain and not mock_chain:
+        try:
+            calls = chain.calls
+            puts = chain.puts
+
+            # IV ATM (si no hay strikes ATM, media de todo). Invertida desde los precios cuando
+            # el símbolo OCC da el vencimiento; las IV nulas (cotización vacía) no entran en la media
+            mask = (calls['strike'] > price*0.95) & (calls['strike'] < price*1.05)
+            atm = calls[mask] if mask.any() else calls
+            days = expiry_days(atm['contractSymbol']) if 'contractSymbol' in atm else np.full(len(atm), np.nan)
+            ivs = implied_vols(atm, price, is_call=True, days=days)
+            ivs = ivs[ivs > 0]
+            if ivs.size: iv = float(ivs.mean() * 100)
+
+            vrp = iv - rv
+
+            # Walls
+            if not calls.empty:
+                idx = calls['openInterest'].idxmax()
+                call_wall = float(calls.loc[idx, 'strike'])
+                dist_call = ((call_wall - price)/price)*100
+
+            if not puts.empty:
+                idx = puts['openInterest'].idxmax()
+                put_wall = float(puts.loc[idx, 'strike'])
+                dist_put = ((put_wall - price)/price)*100
+        except Exception as e:
+            log.warning("error procesando opciones", extra={"ticker": ticker, "error": str(e)})
+    else:
+        log.debug("sin cadena de opciones", extra={"ticker": ticker, "mock": mock_chain})
+
+    SCAN_TICKERS.inc("ok" if chain and not mock_chain else "no_options")
+    log.debug("ticker analizado", extra={"ticker": ticker, "price": round(price, 2), "vrp": round(vrp, 2)})
+
+    return {
+        "Ticker": ticker,
+        "Name": item.get('Name') or ticker,
+        "Sector": item.get('Sector'),
+        "Price": price,
+        "SMA20_val": sma20,
+        "SMA50_val": float(metrics["SMA50_val"]),
+        "Dist SMA20 %": float(metrics["Dist SMA20 %"]),
+        "Dist SMA50 %": float(metrics["Dist SMA50 %"]),
+        "VRP": vrp,
+        "IV": iv,
+        "RV": rv,
+        "Call Wall": call_wall,
+        "Put Wall": put_wall,
+        "Dist Call Wall %": dist_call,
+        "Dist Put Wall %": dist_put,
+        "Mock Options": mock_chain
+    }
+
+async def scan_market(config, task_id: str, reporter):
+    """
+    reporter (ScanReporter) recibe filas, progreso y estado final; detrás puede estar
+    el registro en memoria del propio proceso API o la cola de trabajos en SQLite.
+    Cancelar la corrutina (POST /scanner/cancel) cancela también los análisis lanzados.
+    """
+    started = time.perf_counter()
+    # Todas las descargas del escaneo (y las de las tareas que cree) ceden ante las interactivas
+    fetch_priority.set(BACKGROUND)
+    pending = []
     
     try:
-        sp500 = provider.get_sp500_tickers()
-        print(f"DEBUG: Lista SP500 descargada. Total: {len(sp500)}")
-        
-        candidates = []
-        tgt = config.sector.lower() if config.sector else "todos"
-        
-        for i in sp500:
-            s = i.get('Sector', 'Unknown')
-            if tgt not in ['todos', 'all'] and str(s).lower() != tgt: continue
-            candidates.append(i)
-            
-        candidates = candidates[:config.num_tickers]
+        # Lista del sector ya precalculada en el índice local: sin descarga al arrancar
+        universe = get_universe()
+        candidates = universe.members(config.sector)[:config.num_tickers]
         total = len(candidates)
-        print(f"DEBUG: Candidatos finales a analizar: {total}")
+        log.info("escaneo iniciado", extra={"task_id": task_id, "sector": config.sector, "tickers": total,
+                                            "universe": universe.snapshot.version})
         
         results = []
-        loop = asyncio.get_running_loop()
-        
-        with ThreadPoolExecutor(max_workers=5) as executor: # Bajamos a 5 workers para ver mejor los logs
-            tasks = [loop.run_in_executor(executor, analyze_single_ticker, c, config.lookback) for c in candidates]
-            
-            completed = 0
-            for f in asyncio.as_completed(tasks):
-                res = await f
-                completed += 1
-                if completed % 5 == 0:
-                    prog = int(completed/total*90)
-                    await update_task_status(task_id, "running", progress=prog)
-                    print(f"--> Progreso Global: {completed}/{total}")
-                if res: results.append(res)
-
-        print(f"--- 🏁 FIN SCAN. Resultados válidos: {len(results)} ---")
-        
-        # Verificación final antes de enviar
-        if len(results) > 0:
-            print("DEBUG: Ejemplo de resultado 0:", results[0])
-        else:
-            print("DEBUG: ❌ ALERTA: La lista de resultados está vacía.")
+        by_ticker = {c['Ticker']: c for c in candidates}
+        completed = 0
+        tables = []
+
+        async def analyze(item, row=None):
+            nonlocal completed
+            with stage("scan.ticker"): res = await analyze_single_ticker_async(item, config.lookback, row)
+            completed += 1
+            # Cada fila sale por el stream en cuanto está lista (no al final del escaneo)
+            if res:
+                results.append(res)
+                reporter.result(res)
+            reporter.progress(int(completed/total*100))
+
+        # El histórico llega por lotes sobre el pool HTTP asíncrono. Cada lote pasa por la
+        # etapa transversal (todas las métricas de tendencia y volatilidad del lote en unas
+        # pocas operaciones numpy) y en cuanto está la fila de un ticker se lanza su análisis
+        # de opciones como corrutina: el límite de concurrencia lo pone el proveedor.
+        async for panel in aprovider.iter_history_batches(list(by_ticker), period="6mo"):
+            tickers, close = close_matrix(panel)
+            if not tickers: continue
+            with stage("scan.metrics"): table = metrics_table(tickers, close, config.lookback)
+            tables.append(table)
+            for t, row in zip(table.index, table.to_dict('records')):
+                if t not in by_ticker: continue
+                pending.append(asyncio.create_task(analyze(by_ticker.pop(t), row)))
+
+        # Tickers sin fila válida en el lote (sin datos o histórico corto): intento individual
+        for item in by_ticker.values():
+            pending.append(asyncio.create_task(analyze(item)))
+        await asyncio.gather(*pending)
+
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, "scan.total")
+        fields = {"task_id": task_id, "results": len(results), "tickers": total,
+                  "with_metrics": sum(len(t) for t in tables), "seconds": round(elapsed, 2)}
+        if results: log.info("escaneo terminado", extra=fields)
+        else: log.warning("escaneo terminado sin resultados", extra=fields)
 
-        await update_task_status(task_id, "completed", data=results)
+        # Las filas ya se publicaron (saneadas) una a una
+        reporter.done()
 
+    except asyncio.CancelledError:
+        log.info("escaneo cancelado", extra={"task_id": task_id})
+        for t in pending: t.cancel()
+        raise
     except Exception as e:
-        print(f"DEBUG: 💥 CRASH EN BUCLE PRINCIPAL: {e}")
-        import traceback
-        traceback.print_exc()
-        await update_task_status(task_id, "failed", error=str(e))
\ No newline at end of file
+        log.exception("fallo en el escaneo", extra={"task_id": task_id})
+        reporter.failed(str(e))
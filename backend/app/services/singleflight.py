@@ -0,0 +1,93 @@
+# Archivo: backend/app/services/singleflight.py
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import Future
+from typing import Dict, Hashable
+
+
+class LeaderCancelled(RuntimeError):
+    """El líder de una descarga compartida se canceló; la descarga no falló y se puede reintentar."""
+
+
+class SingleFlight:
+    """
+    Coalescencia de peticiones: mientras hay una descarga en vuelo para una clave
+    (método, ticker, params), el resto de llamadores espera y comparte su resultado.
+    Sirve tanto para hilos (do) como para corrutinas (do_async), y ambos pueden
+    esperar a la misma descarga porque el resultado vive en un concurrent Future.
+    Cancelar a un seguidor no toca el Future compartido; si se cancela el líder, sus
+    seguidores reciben LeaderCancelled (y reintentan solos: uno pasa a ser el líder).
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+        self._counts = {"calls": 0, "executed": 0, "shared": 0}
+
+    def _join(self, key):
+        """Retorna (future, leader). Sólo el líder ejecuta la descarga."""
+        with self._lock:
+            self._counts["calls"] += 1
+            fut = self._calls.get(key)
+            if fut is not None:
+                self._counts["shared"] += 1
+                return fut, False
+            fut = Future()
+            self._calls[key] = fut
+            self._counts["executed"] += 1
+            return fut, True
+
+    def _finish(self, key, fut: Future, result=None, error: BaseException = None):
+        with self._lock:
+            if self._calls.get(key) is fut: del self._calls[key]
+        if fut.done(): return
+        if error is not None: fut.set_exception(error)
+        else: fut.set_result(result)
+
+    def do(self, key, fn):
+        while True:
+            fut, leader = self._join(key)
+            if leader: break
+            try: return fut.result()
+            except LeaderCancelled: continue
+        try:
+            result = fn()
+        except BaseException as e:
+            self._finish(key, fut, error=e)
+            raise
+        self._finish(key, fut, result=result)
+        return result
+
+    async def do_async(self, key, fn):
+        """
+        fn puede ser una función de corrutina o una función bloqueante;
+        en el segundo caso se ejecuta en el executor por defecto del loop.
+        """
+        while True:
+            fut, leader = self._join(key)
+            if leader: break
+            try:
+                # shield: cancelar a este seguidor no cancela el Future del resto
+                return await asyncio.shield(asyncio.wrap_future(fut))
+            except LeaderCancelled:
+                continue
+        try:
+            if asyncio.iscoroutinefunction(fn):
+                result = await fn()
+            else:
+                # run_in_executor no propaga contextvars (fetch_priority): se ejecuta en una copia
+                result = await asyncio.get_running_loop().run_in_executor(None, contextvars.copy_context().run, fn)
+        except asyncio.CancelledError:
+            self._finish(key, fut, error=LeaderCancelled(f"descarga de {key!r} cancelada"))
+            raise
+        except BaseException as e:
+            self._finish(key, fut, error=e)
+            raise
+        self._finish(key, fut, result=result)
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            out = dict(self._counts)
+            out["in_flight"] = len(self._calls)
+            return out
@@ -0,0 +1,199 @@
+# Archivo: backend/app/services/universe.py
+"""
+Índice del universo S&P 500: snapshot local versionado (JSON en CACHE_DIR) con
+listas de tickers por sector y mapa ticker -> metadatos precalculados. Nunca se
+descarga en el camino de una petición: si el snapshot está caducado se sirve igual
+y se refresca en un hilo aparte. Sin snapshot (primer arranque, sin red) se usa la
+copia que viaja con el código en app/data/sp500.csv.
+
+Regenerar la copia empaquetada:  python -m app.services.universe --export app/data/sp500.csv
+"""
+import io
+import os
+import sys
+import json
+import time
+import hashlib
+import threading
+from typing import Callable, Dict, List, Optional
+
+import httpx
+import pandas as pd
+
+from app.core import config
+from app.services.governor import BACKGROUND, UpstreamGovernor, fetch_priority
+
+BUNDLED_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "sp500.csv")
+
+
+def normalize_sector(sector: Optional[str]) -> str:
+    """'All', ' todos ' y None son el universo completo; el resto, en minúsculas."""
+    s = (sector or "todos").strip().lower()
+    return "todos" if s in ("", "all") else s
+
+
+def parse_constituents(text: str) -> List[Dict]:
+    """CSV de constituyentes (formato datasets/s-and-p-500-companies) -> registros del índice."""
+    df = pd.read_csv(io.StringIO(text), dtype=str).fillna("")
+    df = df.rename(columns={"Symbol": "Ticker", "Security": "Name", "GICS Sector": "Sector",
+                            "GICS Sub-Industry": "SubIndustry"})
+    for col in ("Name", "SubIndustry"):
+        if col not in df: df[col] = ""
+    # Yahoo usa guiones (BRK.B -> BRK-B); GOOG (sin voto) se descarta y queda GOOGL
+    df["Ticker"] = df["Ticker"].str.strip().str.replace(".", "-", regex=False)
+    df = df[(df["Ticker"] != "") & (df["Ticker"] != "GOOG")].drop_duplicates("Ticker")
+    return df[["Ticker", "Name", "Sector", "SubIndustry"]].to_dict("records")
+
+
+class UniverseSnapshot:
+    """Versión inmutable del universo: se sustituye entera, nunca se modifica."""
+    __slots__ = ("records", "version", "fetched", "source", "by_ticker", "by_sector")
+
+    def __init__(self, records: List[Dict], version: str, fetched: float, source: str):
+        self.records = records
+        self.version = version
+        self.fetched = fetched
+        self.source = source
+        self.by_ticker = {r["Ticker"]: r for r in records}
+        by_sector: Dict[str, List[Dict]] = {"todos": records}
+        for r in records: by_sector.setdefault(normalize_sector(r["Sector"]), []).append(r)
+        self.by_sector = by_sector
+
+    def to_json(self) -> dict:
+        return {"version": self.version, "fetched": self.fetched, "source": self.source, "records": self.records}
+
+
+class UniverseIndex:
+    """
+    Consultas O(1) sobre el universo (members por sector, lookup por ticker) servidas
+    desde memoria. El refresco descarga el CSV, y sólo si cambia (hash del contenido)
+    escribe una versión nueva del snapshot de forma atómica; los demás procesos que
+    comparten CACHE_DIR la recogen al ver cambiar el fichero.
+    """
+    def __init__(self, path: str = None, bundled: str = None, url: str = None, ttl: float = None,
+                 fetch: Callable[[], str] = None, governor: UpstreamGovernor = None):
+        self.path = path or config.UNIVERSE_PATH
+        self.bundled = bundled or BUNDLED_PATH
+        self.url = url or config.SP500_CSV_URL
+        self.ttl = ttl or config.CACHE_TTL_UNIVERSE
+        self.governor = governor or UpstreamGovernor()
+        self._fetch = fetch or self._download
+        self._snapshot: Optional[UniverseSnapshot] = None
+        self._mtime = 0.0
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._retry_at = 0.0
+        self.last_error: Optional[str] = None
+
+    # --- CARGA ---
+    def _load_local(self) -> Optional[UniverseSnapshot]:
+        try:
+            mtime = os.stat(self.path).st_mtime
+            with open(self.path, encoding="utf-8") as f: data = json.load(f)
+            self._mtime = mtime
+            return UniverseSnapshot(data["records"], data["version"], data["fetched"], data.get("source", "download"))
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _load_bundled(self) -> UniverseSnapshot:
+        with open(self.bundled, encoding="utf-8") as f: text = f.read()
+        # fetched=0: la copia empaquetada siempre cuenta como caducada
+        return UniverseSnapshot(parse_constituents(text), self._version(text), 0.0, "bundled")
+
+    @staticmethod
+    def _version(text: str) -> str:
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()[:12]
+
+    @property
+    def snapshot(self) -> UniverseSnapshot:
+        now = time.time()
+        snap = self._snapshot
+        if snap is None or now - self._checked > 30:
+            with self._lock:
+                self._checked = now
+                if self._snapshot is None:
+                    self._snapshot = self._load_local() or self._load_bundled()
+                else:
+                    # Otro proceso pudo escribir una versión más reciente
+                    try: changed = os.stat(self.path).st_mtime != self._mtime
+                    except OSError: changed = False
+                    if changed: self._snapshot = self._load_local() or self._snapshot
+                snap = self._snapshot
+        if now - snap.fetched > self.ttl and now >= self._retry_at: self.refresh_async()
+        return snap
+
+    # --- REFRESCO ---
+    def _download(self) -> str:
+        headers = {"User-Agent": config.HTTP_USER_AGENT}
+        resp = self.governor.call(httpx.get, self.url, headers=headers, timeout=config.HTTP_TIMEOUT,
+                                  follow_redirects=True)
+        resp.raise_for_status()
+        return resp.text
+
+    def refresh(self) -> bool:
+        """Descarga y, si el contenido cambió, publica una versión nueva. True si hubo cambio."""
+        text = self._fetch()
+        records = parse_constituents(text)
+        if len(records) < config.UNIVERSE_MIN_SIZE:
+            raise ValueError(f"universo incompleto: {len(records)} tickers")
+        version, now = self._version(text), time.time()
+        current = self._snapshot
+        changed = current is None or current.version != version
+        snap = UniverseSnapshot(records if changed else current.records, version, now, "download")
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(tmp, "w", encoding="utf-8") as f: json.dump(snap.to_json(), f)
+        os.replace(tmp, self.path)
+        with self._lock:
+            self._snapshot, self._mtime = snap, os.stat(self.path).st_mtime
+        return changed
+
+    def refresh_async(self):
+        """Refresco en segundo plano (uno a la vez por proceso); mientras, se sirve lo que hay."""
+        with self._lock:
+            if self._refreshing: return
+            self._refreshing = True
+
+        def _run():
+            fetch_priority.set(BACKGROUND)
+            try:
+                self.refresh()
+                self.last_error = None
+            except Exception as e:
+                # Sin red: no reintentar en cada consulta, sino pasado un rato
+                self.last_error = str(e)
+                self._retry_at = time.time() + config.UNIVERSE_RETRY
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=_run, name="universe-refresh", daemon=True).start()
+
+    # --- CONSULTAS ---
+    def members(self, sector: str = None) -> List[Dict]:
+        """Registros (Ticker, Name, Sector, SubIndustry) del sector, en el orden del índice."""
+        return self.snapshot.by_sector.get(normalize_sector(sector), [])
+
+    def lookup(self, ticker: str) -> Optional[Dict]:
+        return self.snapshot.by_ticker.get(ticker.upper().replace(".", "-"))
+
+    def sectors(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for r in self.snapshot.records: counts[r["Sector"]] = counts.get(r["Sector"], 0) + 1
+        return counts
+
+    def info(self) -> dict:
+        snap = self.snapshot
+        return {"version": snap.version, "source": snap.source, "fetched": snap.fetched or None,
+                "size": len(snap.records), "sectors": self.sectors(), "last_error": self.last_error}
+
+
+if __name__ == "__main__":
+    # Sólo para mantenimiento: vuelca el CSV actual de constituyentes a la ruta indicada
+    if len(sys.argv) == 3 and sys.argv[1] == "--export":
+        index = UniverseIndex()
+        text = index._download()
+        print(f"{len(parse_constituents(text))} tickers")
+        with open(sys.argv[2], "w", encoding="utf-8", newline="") as f: f.write(text)
+    else:
+        print(__doc__)
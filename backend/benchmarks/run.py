@@ -0,0 +1,249 @@
+# Archivo: backend/benchmarks/run.py
+"""
+Suite de benchmarks offline (sin red) de los caminos calientes: kernel de griegas,
+agregación GEX por strike, búsqueda del gamma flip, cálculo completo del perfil,
+métricas transversales, un escaneo de punta a punta y la latencia de los endpoints
+(TestClient de FastAPI contra el proveedor sintético con la caché real delante).
+
+Uso (desde backend/):
+    python -m benchmarks.run --out bench/abc123.json
+    python -m benchmarks.run --quick --compare bench/base.json --threshold 0.15
+
+El JSON lleva commit, versiones y, por benchmark, min/mediana/p95/media en ms; con
+--compare se imprime la razón frente a otra ejecución y se marcan las regresiones.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+from typing import Callable, Dict, List
+
+import numpy as np
+
+# Antes de importar la app: caché en un directorio temporal y escaneos en el propio proceso
+os.environ.setdefault("QUANTDESK_CACHE_DIR", tempfile.mkdtemp(prefix="quantdesk-bench-"))
+os.environ.setdefault("QUANTDESK_SCAN_BACKEND", "inline")
+os.environ.setdefault("QUANTDESK_LOG_LEVEL", "WARNING")
+
+from app.core import config  # noqa: E402
+from app.core.cross_section import metrics_table  # noqa: E402
+from app.core.engine import BlackScholes, GammaFlipSolver, GexEngine, GreeksBuffer  # noqa: E402
+from benchmarks.synthetic import (CHAIN_PROFILES, SIZES, AsyncSyntheticProvider, SyntheticProvider,  # noqa: E402
+                                  synthetic_chain)
+
+
+def measure(fn: Callable, min_time: float = 0.5, min_iters: int = 5, max_iters: int = 1000, warmup: int = 2) -> Dict:
+    """Repite fn hasta acumular min_time segundos (y al menos min_iters veces); tiempos en ms."""
+    for _ in range(warmup): fn()
+    times: List[float] = []
+    start = time.perf_counter()
+    while len(times) < max_iters and (len(times) < min_iters or time.perf_counter() - start < min_time):
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1e3)
+    arr = np.asarray(times)
+    return {"min_ms": float(arr.min()), "median_ms": float(np.median(arr)),
+            "p95_ms": float(np.percentile(arr, 95)), "mean_ms": float(arr.mean()), "iters": len(times)}
+
+
+def chain_arrays(df, spot):
+    return (df["strike"].to_numpy(), df["daysToEx"].to_numpy() / 365.0, df["impliedVolatility"].to_numpy(),
+            df["openInterest"].to_numpy(), np.where(df["type"].to_numpy() == "call", 1.0, -1.0))
+
+
+# --- MICROBENCHMARKS DEL MOTOR ---
+def bench_engine(sizes, min_time) -> Dict[str, Dict]:
+    out = {}
+    spot, r = 500.0, 0.045
+    for n in sizes:
+        df = synthetic_chain(n, spot)
+        K, T, iv, oi, sign = chain_arrays(df, spot)
+        is_call = sign > 0
+        buf = GreeksBuffer(dtype=config.GREEKS_DTYPE)
+        g = BlackScholes.greeks(spot, K, T, r, iv, is_call, dtype=config.GREEKS_DTYPE, out=buf)
+        gex = g["gamma"] * oi * sign * 100 * spot
+
+        out[f"engine.gamma[{n}]"] = measure(lambda: BlackScholes.get_gamma(spot, K, T, r, iv), min_time)
+        out[f"engine.greeks[{n}]"] = measure(
+            lambda: BlackScholes.greeks(spot, K, T, r, iv, is_call, dtype=config.GREEKS_DTYPE, out=buf), min_time)
+        out[f"engine.aggregate_by_strike[{n}]"] = measure(
+            lambda: GexEngine.aggregate_by_strike(K, [gex, oi]), min_time)
+        solver = GammaFlipSolver(K, T, iv, oi, sign, r)
+        out[f"engine.flip_solve[{n}]"] = measure(
+            lambda: solver.solve(spot, 0.7, 1.3, config.GEX_FLIP_GRID_POINTS, config.GEX_FLIP_TOL), min_time)
+        out[f"engine.flip_all_roots[{n}]"] = measure(
+            lambda: solver.solve(spot, 0.7, 1.3, config.GEX_FLIP_GRID_POINTS, config.GEX_FLIP_TOL, True), min_time)
+        out[f"engine.gex_compute[{n}]"] = measure(
+            lambda: GexEngine.compute(spot, K, T, iv, oi, sign, r, dtype=config.GREEKS_DTYPE, out=buf), min_time)
+        # Malla por defecto de /scenarios: 41 spots x 5 shifts de IV x 4 días
+        spots = np.linspace(spot * 0.9, spot * 1.1, 41)
+        out[f"engine.scenarios[{n}]"] = measure(
+            lambda: GexEngine.scenarios(K, T, iv, oi, sign, spots, (-0.1, -0.05, 0, 0.05, 0.1), (0, 1, 5, 10), r,
+                                        dtype=config.SCENARIO_DTYPE), min_time)
+        prices = df["lastPrice"].to_numpy(np.float64)
+        out[f"engine.implied_vol[{n}]"] = measure(
+            lambda: BlackScholes.implied_vol(prices, spot, K, T, r, is_call), min_time)
+    return out
+
+
+# --- SERVICIOS (proveedor sintético, sin caché) ---
+def bench_services(min_time, quick) -> Dict[str, Dict]:
+    import diskcache
+    from app.services.contract_store import ContractStore
+    from app.services.quant_engine import QuantService
+    out = {}
+    # Cadena ya cacheada por otro proceso (fallo de la LRU en memoria): vista sobre el mmap frente a unpickle
+    store = ContractStore(tempfile.mkdtemp(prefix="quantdesk-bench-contracts-"))
+    disk = diskcache.Cache(tempfile.mkdtemp(prefix="quantdesk-bench-disk-"))
+    for name, n in CHAIN_PROFILES.items():
+        if quick and n > CHAIN_PROFILES["spy"]: continue
+        quant = QuantService(SyntheticProvider(chain_size=n))
+        df = quant.provider.get_aggregated_options("SPY", 45)
+        out[f"service.gex_from_contracts[{name}]"] = measure(lambda: quant.gex_from_contracts(df, 500.0), min_time)
+        store.put(name, df, time.time() + 3600, time.time() + 3600)
+        disk.set(name, (df, 0.0))
+        out[f"service.chain_read[contract_store,{name}]"] = measure(lambda: store.get(name), min_time)
+        out[f"service.chain_read[diskcache,{name}]"] = measure(lambda: disk.get(name), min_time)
+    # Etapa transversal del escaneo: 500 tickers x 126 barras en una sola matriz
+    rng = np.random.default_rng(0)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.015, (500, 126)), axis=1))
+    tickers = [f"T{i}" for i in range(500)]
+    out["service.metrics_table[500x126]"] = measure(lambda: metrics_table(tickers, close, 20), min_time)
+    return out
+
+
+# --- DE PUNTA A PUNTA (app real, proveedor sintético detrás de la caché) ---
+def install_synthetic_providers(chain_size: int):
+    """Sustituye los proveedores de factory antes de que rutas y screener los importen."""
+    from app.services import factory
+    from app.services.cache import AsyncCachedProvider, CachedProvider
+    from app.services.universe import UniverseIndex
+
+    sync = CachedProvider(SyntheticProvider(chain_size=chain_size))
+    asyn = AsyncCachedProvider(AsyncSyntheticProvider(chain_size=chain_size),
+                               cache=sync.cache, stats=sync.stats, flight=sync.flight)
+    # ttl infinito: la copia empaquetada del universo nunca se intenta refrescar (sin red)
+    universe = UniverseIndex(ttl=float("inf"), governor=factory.get_governor())
+    factory.get_provider = lambda: sync
+    factory.get_async_provider = lambda: asyn
+    factory.get_universe = lambda: universe
+
+
+def bench_endpoints(min_time, quick) -> Dict[str, Dict]:
+    install_synthetic_providers(CHAIN_PROFILES["spy"])
+    from fastapi.testclient import TestClient
+    from app import routes
+    from app.main import app
+    from app.routes import ScannerConfig
+    from app.services.screener import scan_market
+
+    out = {}
+    with TestClient(app) as client:
+        url = "/api/v1/asset/SPY"
+        first = client.get(url)
+        first.raise_for_status()
+        etag = first.headers["etag"]
+
+        def compute():
+            routes.responses.clear()
+            client.get(url).raise_for_status()
+
+        out["api.asset[compute]"] = measure(compute, min_time)
+        out["api.asset[columnar,compute]"] = measure(
+            lambda: (routes.responses.clear(), client.get(url, params={"format": "columnar"})), min_time)
+        out["api.asset[cached]"] = measure(lambda: client.get(url), min_time)
+        out["api.asset[304]"] = measure(lambda: client.get(url, headers={"If-None-Match": etag}), min_time)
+        # Un solo escenario (lo que pide un slider) con los arrays de la cadena ya en memoria
+        out["api.scenarios[slice,compute]"] = measure(
+            lambda: (routes.responses.clear(), client.get(url + "/scenarios", params={"iv_shifts": "0.05", "days": "5"})),
+            min_time)
+
+        # Escaneo completo en el event loop propio (la cadena por ticker es la del vencimiento más próximo)
+        scans = routes.scans
+        num = 50 if quick else 200
+
+        def scan():
+            cfg = ScannerConfig(sector="todos", num_tickers=num, max_dte=45, lookback=20)
+            task_id, _ = scans.start(cfg)
+            asyncio.run(scan_market(cfg, task_id, scans.reporter(task_id)))
+            return task_id
+
+        task_id = scan()
+        out[f"scan.scan_market[{num}]"] = measure(scan, min_time, min_iters=3, warmup=1)
+        status = f"/api/v1/scanner/status/{task_id}"
+        for fmt in ("rows", "columnar"):
+            out[f"api.scanner_status[{fmt},compute]"] = measure(
+                lambda: (routes.responses.clear(), client.get(status, params={"format": fmt})), min_time)
+    return out
+
+
+# --- RESULTADOS ---
+def metadata() -> Dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    import pandas as pd
+    return {"commit": commit, "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+            "numpy": np.__version__, "pandas": pd.__version__, "platform": platform.platform(),
+            "greeks_dtype": np.dtype(config.GREEKS_DTYPE).name}
+
+
+def compare(results: Dict[str, Dict], base_path: str, threshold: float) -> int:
+    """Imprime mediana actual / base por benchmark; retorna el número de regresiones."""
+    with open(base_path, encoding="utf-8") as f: base = json.load(f)["results"]
+    regressions = 0
+    for name, res in results.items():
+        if name not in base: continue
+        ratio = res["median_ms"] / max(base[name]["median_ms"], 1e-9)
+        flag = ""
+        if ratio > 1 + threshold:
+            flag, regressions = "  <-- REGRESIÓN", regressions + 1
+        elif ratio < 1 - threshold:
+            flag = "  (mejora)"
+        print(f"{name:45s} {base[name]['median_ms']:10.3f} -> {res['median_ms']:10.3f} ms  x{ratio:5.2f}{flag}")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks offline de QuantDesk")
+    parser.add_argument("--out", help="fichero JSON de resultados")
+    parser.add_argument("--quick", action="store_true", help="menos tamaños y menos tiempo por benchmark")
+    parser.add_argument("--only", choices=("engine", "services", "endpoints"), action="append",
+                        help="grupo a ejecutar (repetible); por defecto todos")
+    parser.add_argument("--compare", help="JSON de una ejecución anterior con la que comparar")
+    parser.add_argument("--threshold", type=float, default=0.10, help="margen de regresión (0.10 = +10%%)")
+    args = parser.parse_args(argv)
+
+    groups = args.only or ["engine", "services", "endpoints"]
+    min_time = 0.2 if args.quick else 1.0
+    sizes = (1_000, 10_000, 50_000) if args.quick else SIZES
+
+    results: Dict[str, Dict] = {}
+    if "engine" in groups: results.update(bench_engine(sizes, min_time))
+    if "services" in groups: results.update(bench_services(min_time, args.quick))
+    if "endpoints" in groups: results.update(bench_endpoints(min_time, args.quick))
+
+    for name, res in results.items():
+        print(f"{name:45s} mediana {res['median_ms']:10.3f} ms  p95 {res['p95_ms']:10.3f} ms  ({res['iters']} it)")
+
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"meta": metadata(), "results": results}, f, indent=2)
+        print(f"Resultados en {args.out}")
+
+    if args.compare:
+        print(f"\nComparación con {args.compare}:")
+        if compare(results, args.compare, args.threshold): return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+# Archivo: backend/benchmarks/synthetic.py
+"""
+Datos sintéticos deterministas (misma semilla -> mismos datos) con la forma y el
+tamaño de los reales: cadenas de 1k a 50k contratos como las de un valor suelto,
+QQQ o SPY dentro de 45 DTE, e históricos OHLCV diarios. Sin red.
+"""
+import zlib
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from app.core import config
+from app.core.engine import BlackScholes
+from app.services.async_provider import AsyncMarketDataProvider
+from app.services.chain_engine import CONTRACT_DTYPES, CONTRACT_TYPES
+from app.services.data_provider import MarketDataProvider, OptionChain
+
+# Tamaños de cadena (contratos) representativos
+CHAIN_PROFILES = {"single": 1_000, "qqq": 10_000, "spy": 25_000, "max": 50_000}
+SIZES = (1_000, 5_000, 10_000, 25_000, 50_000)
+
+
+def rng_for(key) -> np.random.Generator:
+    return np.random.default_rng(zlib.crc32(str(key).encode()))
+
+
+def synthetic_chain(n_contracts: int, spot: float = 500.0, max_dte: int = 45, seed=None) -> pd.DataFrame:
+    """
+    Tabla de contratos con el esquema de normalize_contracts: vencimientos casi diarios,
+    strikes más anchos cuanto más lejano el vencimiento, sonrisa de IV con skew y OI
+    concentrado cerca del dinero (y en strikes redondos).
+    """
+    rng = rng_for(seed if seed is not None else n_contracts)
+    dtes = np.unique(np.linspace(0, max_dte, min(max_dte + 1, max(4, n_contracts // 1000))).astype(np.int16))
+    per_leg = -(-n_contracts // (2 * len(dtes)))
+
+    dte = np.repeat(dtes, per_leg)
+    T = np.maximum(dte, 1) / 365.0
+    width = np.clip(0.08 + 0.9 * np.sqrt(T), 0.1, 0.5)
+    u = np.tile(np.linspace(-1.0, 1.0, per_leg), len(dtes))
+    strike = np.round(spot * (1.0 + u * width) * 2) / 2
+    m = np.log(strike / spot)
+
+    n = len(dte)
+    iv = np.clip(0.16 + 0.02 * np.sqrt(T) - 0.35 * m + 0.9 * m ** 2 + rng.normal(0, 0.005, n), 0.05, 2.5)
+    round_bonus = np.where(strike % 5 == 0, 3.0, 1.0)
+    oi = np.floor(rng.lognormal(6.0, 1.0, n) * np.exp(-(m / (0.05 + width * 0.2)) ** 2) * round_bonus)
+    oi[rng.random(n) < 0.05] = 0.0
+
+    legs = []
+    for kind in ("call", "put"):
+        # Primas coherentes con la IV (mismo T que el motor): el solver de IV las recupera
+        price = BlackScholes.price(spot, strike, dte / 365.0, 0.045, iv, kind == "call")
+        legs.append(pd.DataFrame({
+            "strike": strike, "lastPrice": price, "bid": price * 0.98, "ask": price * 1.02,
+            "volume": np.floor(oi * rng.random(n) * 0.3), "openInterest": oi,
+            "impliedVolatility": iv, "daysToEx": dte, "type": kind,
+        }))
+    df = pd.concat(legs, ignore_index=True).iloc[:n_contracts]
+    df = df.astype(CONTRACT_DTYPES)
+    df["type"] = df["type"].astype(CONTRACT_TYPES)
+    today = pd.Timestamp.today().normalize()
+    df["expirationDate"] = pd.Categorical(
+        (today + pd.to_timedelta(df["daysToEx"].astype(int), unit="D")).dt.strftime("%Y-%m-%d").to_numpy(object))
+    return df.reset_index(drop=True)
+
+
+def synthetic_history(ticker: str, bars: int = 260, start_price: float = None) -> pd.DataFrame:
+    """OHLCV diario (días hábiles hasta hoy) con paseo aleatorio log-normal."""
+    rng = rng_for(("history", ticker))
+    start_price = start_price or float(rng.uniform(20, 600))
+    close = start_price * np.exp(np.cumsum(rng.normal(0.0003, 0.015, bars)))
+    spread = np.abs(rng.normal(0, 0.008, bars))
+    idx = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=bars, name="Date")
+    return pd.DataFrame({"Open": close * (1 + rng.normal(0, 0.004, bars)), "High": close * (1 + spread),
+                         "Low": close * (1 - spread), "Close": close,
+                         "Volume": np.floor(rng.lognormal(15, 0.5, bars))}, index=idx)
+
+
+def synthetic_universe(n: int = 500) -> List[Dict]:
+    sectors = ["Information Technology", "Financials", "Health Care", "Industrials", "Energy"]
+    return [{"Ticker": f"SYN{i:03d}", "Name": f"Synthetic {i}", "Sector": sectors[i % len(sectors)],
+             "SubIndustry": ""} for i in range(n)]
+
+
+class SyntheticProvider(MarketDataProvider):
+    """Proveedor sin red: cada ticker tiene su histórico y su cadena de `chain_size` contratos."""
+    def __init__(self, chain_size: int = CHAIN_PROFILES["qqq"], bars: int = 260):
+        self.chain_size = chain_size
+        self.bars = bars
+
+    def get_history(self, ticker: str, period: str = "1y") -> pd.DataFrame:
+        return synthetic_history(ticker, self.bars)
+
+    def get_spot_price(self, ticker: str) -> float:
+        return float(synthetic_history(ticker, self.bars)["Close"].iloc[-1])
+
+    def get_aggregated_options(self, ticker: str, max_dte: int = config.DEFAULT_MAX_DTE) -> pd.DataFrame:
+        return synthetic_chain(self.chain_size, self.get_spot_price(ticker), max_dte, seed=ticker)
+
+    def get_options_chain(self, ticker: str, expiration: str = None):
+        df = self.get_aggregated_options(ticker)
+        df = df[df["daysToEx"] == df["daysToEx"].min()] if expiration is None else df[df["expirationDate"] == expiration]
+        cols = [c for c in df.columns if c not in ("type", "daysToEx", "expirationDate")]
+        return OptionChain(df.loc[df["type"] == "call", cols].reset_index(drop=True),
+                           df.loc[df["type"] == "put", cols].reset_index(drop=True))
+
+    def get_sp500_tickers(self) -> List[Dict]:
+        return synthetic_universe()
+
+
+class AsyncSyntheticProvider(AsyncMarketDataProvider):
+    """SyntheticProvider con la interfaz asyncio (para las rutas y scan_market)."""
+    def __init__(self, chain_size: int = CHAIN_PROFILES["qqq"], bars: int = 260):
+        self.sync = SyntheticProvider(chain_size, bars)
+
+    async def get_history(self, ticker: str, period: str = "1y") -> pd.DataFrame:
+        return self.sync.get_history(ticker, period)
+
+    async def get_spot_price(self, ticker: str) -> float:
+        return self.sync.get_spot_price(ticker)
+
+    async def get_aggregated_options(self, ticker: str, max_dte: int = config.DEFAULT_MAX_DTE) -> pd.DataFrame:
+        return self.sync.get_aggregated_options(ticker, max_dte)
+
+    async def get_options_chain(self, ticker: str, expiration: str = None):
+        return self.sync.get_options_chain(ticker, expiration)
+
+    async def get_sp500_tickers(self) -> List[Dict]:
+        return self.sync.get_sp500_tickers()
+
+
+if __name__ == "__main__":
+    # Snapshot sintético del universo empaquetado para el modo replay (QUANTDESK_MARKET_DATA=replay)
+    import argparse
+    from app.services.replay import record_snapshot
+    from app.services.universe import BUNDLED_PATH, parse_constituents
+
+    parser = argparse.ArgumentParser(description="Genera un snapshot de replay con datos sintéticos")
+    parser.add_argument("--snapshot", required=True, help="directorio de salida")
+    parser.add_argument("--tickers", type=int, default=500)
+    parser.add_argument("--chain-size", type=int, default=CHAIN_PROFILES["single"])
+    args = parser.parse_args()
+
+    with open(BUNDLED_PATH, encoding="utf-8") as f: members = parse_constituents(f.read())[:args.tickers]
+    manifest = record_snapshot(SyntheticProvider(chain_size=args.chain_size), args.snapshot, members,
+                               source="synthetic")
+    print(f"{len(manifest['tickers'])} tickers en {args.snapshot}")
@@ -0,0 +1,11 @@
+# Archivo: backend/tests/conftest.py
+import os
+import sys
+import tempfile
+
+# Como test_manual.py: la carpeta 'app' importable sin instalar nada
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Caché, stores y cola en un directorio desechable, antes de que se importe app.core.config
+os.environ.setdefault("QUANTDESK_CACHE_DIR", tempfile.mkdtemp(prefix="quantdesk-tests-"))
+os.environ.setdefault("QUANTDESK_LOG_LEVEL", "WARNING")
@@ -0,0 +1,139 @@
+# Archivo: backend/tests/test_async_provider.py
+import asyncio
+
+import httpx
+import pytest
+
+from app.services.async_provider import AsyncYahooProvider
+from app.services.chain_engine import empty_contracts
+from app.services.data_provider import is_mock
+from app.services.governor import UpstreamGovernor
+from app.services.history_store import HistoryStore
+
+DAY = 86400
+T0 = 1_767_225_600  # 2026-01-01 00:00 UTC
+
+
+def _chart(symbol, closes, splits=None):
+    ts = [T0 + i * DAY for i in range(len(closes))]
+    return {"meta": {"symbol": symbol, "exchangeTimezoneName": "UTC"}, "timestamp": ts,
+            "indicators": {"quote": [{c: list(closes) for c in ("open", "high", "low", "close")} |
+                                     {"volume": [100] * len(closes)}],
+                           "adjclose": [{"adjclose": list(closes)}]},
+            "events": {"splits": splits} if splits else {}}
+
+
+def _provider(handler, tmp_path):
+    return AsyncYahooProvider(base_url="http://yahoo.test", cookie_url="", transport=httpx.MockTransport(handler),
+                              history_store=HistoryStore(str(tmp_path / "history")),
+                              governor=UpstreamGovernor(rate=1000, burst=1000, retries=0))
+
+
+def test_expired_crumb_is_renewed_once(tmp_path):
+    crumbs, seen = iter(["old", "new"]), []
+
+    def handler(request):
+        if request.url.path == "/v1/test/getcrumb": return httpx.Response(200, text=next(crumbs))
+        seen.append(request.url.params["crumb"])
+        if request.url.params["crumb"] == "old": return httpx.Response(401)
+        return httpx.Response(200, json={"optionChain": {"result": [{"expirationDates": [], "options": []}]}})
+
+    async def main():
+        p = _provider(handler, tmp_path)
+        assert await p._options("SPY") == {"expirationDates": [], "options": []}
+        assert await p._options("SPY") == {"expirationDates": [], "options": []}
+        await p.aclose()
+    asyncio.run(main())
+    assert seen == ["old", "new", "new"]
+
+
+def test_malformed_payloads_serve_flagged_fallbacks(tmp_path):
+    def handler(request):
+        if request.url.path == "/v1/test/getcrumb": return httpx.Response(200, text="c")
+        return httpx.Response(200, json=[1, 2])
+
+    async def main():
+        p = _provider(handler, tmp_path)
+        out = await asyncio.gather(p.get_spot_price("SPY"), p.get_history("SPY", "6mo"),
+                                   p.get_aggregated_options("SPY"), p.get_options_chain("SPY"))
+        await p.aclose()
+        return out
+    spot, hist, contracts, chain = asyncio.run(main())
+    assert is_mock(spot) and is_mock(hist) and is_mock(contracts) and is_mock(chain.calls)
+
+
+def test_ticker_without_expirations_returns_the_contract_schema(tmp_path):
+    def handler(request):
+        if request.url.path == "/v1/test/getcrumb": return httpx.Response(200, text="c")
+        return httpx.Response(200, json={"optionChain": {"result": [{"expirationDates": [], "options": []}]}})
+
+    async def main():
+        p = _provider(handler, tmp_path)
+        out = await p.get_aggregated_options("SPY")
+        await p.aclose()
+        return out
+    df = asyncio.run(main())
+    assert df.empty and not is_mock(df)
+    assert dict(df.dtypes.astype(str)) == dict(empty_contracts().dtypes.astype(str))
+
+
+def test_history_is_synced_into_the_store(tmp_path):
+    def handler(request):
+        return httpx.Response(200, json={"chart": {"result": [_chart("SPY", [10.0, 11.0, 12.0])]}})
+
+    async def main():
+        p = _provider(handler, tmp_path)
+        first = await p.get_history("SPY", "max")
+        second = await p.get_history("SPY", "max")
+        await p.aclose()
+        return first, second
+    first, second = asyncio.run(main())
+    assert list(first["Close"]) == [10.0, 11.0, 12.0] and not is_mock(first)
+    assert second.equals(first)
+
+
+def _spark(symbols, dividend=None, adjclose=True):
+    out = []
+    for s in symbols:
+        chart = _chart(s, [10.0, 10.0, 9.0, 9.0])
+        if not adjclose: del chart["indicators"]["adjclose"]
+        if dividend: chart["events"] = {"dividends": {str(T0 + 2 * DAY): {"date": T0 + 2 * DAY, "amount": dividend}}}
+        out.append({"symbol": s, "response": [chart]})
+    return {"spark": {"result": out}}
+
+
+def test_scan_batches_use_one_spark_request_per_group_and_warm_the_store(tmp_path, monkeypatch):
+    monkeypatch.setattr("app.core.config.HISTORY_SPARK_SYMBOLS", 2)
+    requests = []
+
+    def handler(request):
+        requests.append(request.url.params["symbols"])
+        return httpx.Response(200, json=_spark(request.url.params["symbols"].split(",")))
+
+    async def scan(p):
+        return [panel async for panel in p.iter_history_batches(["A", "B", "C"], "6mo", chunk_size=10)]
+
+    p = _provider(handler, tmp_path)
+    first = asyncio.run(scan(p))
+    assert requests == ["A,B", "C"]
+    assert sorted(first[0].columns.get_level_values(0).unique()) == ["A", "B", "C"]
+    # Segundo escaneo: los cierres salen del store, sin peticiones
+    second = asyncio.run(scan(p))
+    assert len(requests) == 2 and second[0]["A"]["Close"].tolist() == [10.0, 10.0, 9.0, 9.0]
+    # Para el OHLCV completo un histórico de sólo cierres no cuenta
+    assert p.history_store.needs_sync("A") and not p.history_store.needs_sync("A", closes="6mo")
+    assert p.history_store.sync_start("A") is None
+
+
+def test_spark_closes_without_adjclose_are_adjusted_for_dividends(tmp_path):
+    def handler(request):
+        return httpx.Response(200, json=_spark(["A"], dividend=1.0, adjclose=False))
+
+    async def main():
+        p = _provider(handler, tmp_path)
+        out = await p._spark(["A"], "6mo")
+        await p.aclose()
+        return out
+    close = asyncio.run(main())["A"]["Close"].tolist()
+    # Dividendo de 1 sobre un cierre previo de 10: lo anterior se escala por 0.9
+    assert close == pytest.approx([9.0, 9.0, 9.0, 9.0])
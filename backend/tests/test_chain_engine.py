@@ -0,0 +1,53 @@
+# Archivo: backend/tests/test_chain_engine.py
+import threading
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from app.services.chain_engine import ChainFetchEngine
+from app.services.governor import BACKGROUND, INTERACTIVE, fetch_priority
+
+EXPIRIES = ["2026-01-09", "2026-01-16", "2026-01-23", "2026-06-19"]
+TODAY = date(2026, 1, 5)
+
+
+def _legs(exp):
+    row = {"strike": [100.0], "openInterest": [10], "impliedVolatility": [0.2]}
+    return pd.DataFrame(row), pd.DataFrame(row)
+
+
+def test_fetch_keeps_the_dte_window():
+    df = ChainFetchEngine(2).fetch(EXPIRIES, _legs, max_dte=30, today=TODAY)
+    assert sorted(df["expirationDate"].astype(str).unique()) == EXPIRIES[:3]
+    assert set(df["type"].astype(str)) == {"call", "put"}
+
+
+def test_fetch_runs_with_the_caller_priority():
+    seen = []
+
+    def fetch(exp):
+        seen.append(fetch_priority.get())
+        return _legs(exp)
+
+    def background():
+        fetch_priority.set(BACKGROUND)
+        ChainFetchEngine(2).fetch(EXPIRIES, fetch, max_dte=30, today=TODAY)
+
+    t = threading.Thread(target=background)
+    t.start(); t.join(5)
+    assert seen == [BACKGROUND] * 3
+    assert fetch_priority.get() == INTERACTIVE
+
+
+def test_fetch_skips_failed_expiries_and_raises_when_all_fail():
+    def flaky(exp):
+        if exp == EXPIRIES[0]: raise ConnectionError(exp)
+        return _legs(exp)
+
+    df = ChainFetchEngine(2).fetch(EXPIRIES, flaky, max_dte=30, today=TODAY)
+    assert EXPIRIES[0] not in set(df["expirationDate"].astype(str))
+
+    def down(exp): raise ConnectionError(exp)
+    with pytest.raises(ConnectionError):
+        ChainFetchEngine(2).fetch(EXPIRIES, down, max_dte=30, today=TODAY)
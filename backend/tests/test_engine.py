@@ -0,0 +1,52 @@
+# Archivo: backend/tests/test_engine.py
+import numpy as np
+import pytest
+
+from app.core.engine import BlackScholes
+
+# Valores de referencia de libro (Hull): (S, K, T, r, sigma, es call, prima)
+KNOWN = [
+    (100.0, 100.0, 1.0, 0.05, 0.20, True, 10.4506),
+    (100.0, 100.0, 1.0, 0.05, 0.20, False, 5.5735),
+    (42.0, 40.0, 0.5, 0.10, 0.20, True, 4.7594),
+    (42.0, 40.0, 0.5, 0.10, 0.20, False, 0.8086),
+]
+
+
+@pytest.mark.parametrize("S, K, T, r, sigma, is_call, premium", KNOWN)
+def test_price_matches_reference(S, K, T, r, sigma, is_call, premium):
+    assert BlackScholes.price(S, K, T, r, sigma, is_call) == pytest.approx(premium, abs=1e-4)
+
+
+@pytest.mark.parametrize("S, K, T, r, sigma, is_call, premium", KNOWN)
+def test_implied_vol_recovers_reference_sigma(S, K, T, r, sigma, is_call, premium):
+    iv, converged = BlackScholes.implied_vol(np.array([premium]), S, np.array([K]), np.array([T]), r,
+                                             np.array([is_call]))
+    assert converged[0]
+    assert iv[0] == pytest.approx(sigma, abs=1e-4)
+
+
+def test_implied_vol_round_trip_over_a_chain():
+    S, r = 100.0, 0.045
+    K = np.tile(np.linspace(60, 140, 41), 2)
+    T = np.repeat([7 / 365, 0.5], 41)
+    is_call = np.arange(K.size) % 2 == 0
+    sigma = np.linspace(0.1, 1.5, K.size)
+    price = BlackScholes.price(S, K, T, r, sigma, is_call)
+    iv, converged = BlackScholes.implied_vol(price, S, K, T, r, is_call)
+    assert np.allclose(iv[converged], sigma[converged], rtol=1e-4)
+    assert np.isnan(iv[~converged]).all()
+    # Sólo se quedan sin IV los contratos sin valor temporal (muy ITM/OTM a 7 días)
+    X = K * np.exp(-r * T)
+    time_value = price - np.maximum(np.where(is_call, S - X, X - S), 0.0)
+    assert converged[time_value > 1e-3].all()
+
+
+def test_implied_vol_without_solution_is_nan():
+    S, r, T = 100.0, 0.05, np.full(4, 0.25)
+    K = np.array([100.0, 100.0, 50.0, 100.0])
+    # Precio nulo, por encima del subyacente, sin valor temporal y strike inválido
+    price = np.array([0.0, 150.0, 50.0 + 0.6, 5.0])
+    K[3] = 0.0
+    iv, converged = BlackScholes.implied_vol(price, S, K, T, r, np.ones(4, dtype=bool))
+    assert np.isnan(iv).all() and not converged.any()
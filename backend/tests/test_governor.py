@@ -0,0 +1,164 @@
+# Archivo: backend/tests/test_governor.py
+import asyncio
+
+import httpx
+import pytest
+
+from app.services.governor import (BACKGROUND, INTERACTIVE, AIMDLimiter, InteractiveBeacon, TokenBucket,
+                                   UpstreamGovernor, fetch_priority)
+
+
+def test_token_bucket_burst_then_waits():
+    bucket = TokenBucket(rate=10, burst=3)
+    assert [bucket._take(1, INTERACTIVE) for _ in range(3)] == [0.0, 0.0, 0.0]
+    wait = bucket._take(1, INTERACTIVE)
+    assert 0 < wait <= 0.1
+
+
+def test_token_bucket_keeps_the_reserve_for_interactive():
+    bucket = TokenBucket(rate=0.001, burst=4, reserve=2)
+    assert bucket._take(1, BACKGROUND) == 0.0
+    assert bucket._take(1, BACKGROUND) == 0.0
+    assert bucket._take(1, BACKGROUND) > 0
+    assert bucket._take(1, INTERACTIVE) == 0.0
+    assert bucket._take(1, INTERACTIVE) == 0.0
+    assert bucket._take(1, INTERACTIVE) > 0
+
+
+def test_aimd_additive_increase_and_multiplicative_decrease():
+    limiter = AIMDLimiter(initial=4, minimum=1, maximum=5, cooldown=0)
+    for _ in range(8):
+        assert limiter._try_enter(INTERACTIVE)
+        limiter.release("ok", 0.01)
+    assert limiter.limit == 5  # tope en maximum
+    assert limiter._try_enter(INTERACTIVE)
+    limiter.release("throttled")
+    assert limiter.limit == 2.5
+    for _ in range(3):
+        assert limiter._try_enter(INTERACTIVE)
+        limiter.release("throttled")
+    assert limiter.limit == 1  # suelo en minimum
+    assert limiter.stats()["decreases"] == 4
+
+
+def test_aimd_cooldown_and_latency_target():
+    limiter = AIMDLimiter(initial=8, minimum=1, maximum=8, latency_target=0.5, cooldown=60)
+    for outcome, latency in (("throttled", 0), ("throttled", 0), ("ok", 2.0)):
+        assert limiter._try_enter(INTERACTIVE)
+        limiter.release(outcome, latency)
+    # Una sola bajada por ventana de cooldown; la respuesta lenta cuenta pero no vuelve a bajar
+    assert limiter.limit == 4
+    assert limiter.stats()["slow"] == 1
+    # Un error que no es de carga (404) no toca el límite
+    assert limiter._try_enter(INTERACTIVE)
+    limiter.release("error")
+    assert limiter.limit == 4
+
+
+def test_aimd_caps_background_while_interactive_waits():
+    hint = [False]
+    limiter = AIMDLimiter(initial=4, minimum=1, maximum=4, background_share=0.5, interactive_hint=lambda: hint[0])
+    assert limiter._try_enter(BACKGROUND) and limiter._try_enter(BACKGROUND)
+    limiter.waiting_interactive = 1
+    assert not limiter._try_enter(BACKGROUND)
+    assert limiter._try_enter(INTERACTIVE)
+    limiter.waiting_interactive = 0
+    assert limiter._try_enter(BACKGROUND)
+    limiter.release("ok"); limiter.release("ok")
+    hint[0] = True  # tráfico interactivo en otro proceso
+    assert not limiter._try_enter(BACKGROUND)
+
+
+def test_aimd_async_interactive_enters_before_background():
+    limiter = AIMDLimiter(initial=2, minimum=1, maximum=2, background_share=0.5)
+    order = []
+
+    async def run(priority, name):
+        await limiter.acquire_async(priority)
+        order.append(name)
+        limiter.release("ok")
+
+    async def main():
+        limiter._try_enter(INTERACTIVE); limiter._try_enter(INTERACTIVE)
+        tasks = [asyncio.create_task(run(BACKGROUND, "background"))]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(run(INTERACTIVE, "interactive")))
+        await asyncio.sleep(0)
+        # Con una interactiva esperando, la de segundo plano no pasa de la mitad del límite
+        limiter.release("ok")
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    assert order == ["interactive", "background"]
+
+
+def _governor(tmp_path, **kw):
+    return UpstreamGovernor(rate=1000, burst=1000, backoff_base=0.001, backoff_max=0.01,
+                            beacon=InteractiveBeacon(str(tmp_path / "beacon")), **kw)
+
+
+def _client(statuses):
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.path)
+        return httpx.Response(statuses[min(len(calls), len(statuses)) - 1], json={})
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler)), calls
+
+
+def test_call_async_retries_throttling(tmp_path):
+    governor = _governor(tmp_path, retries=3)
+    client, calls = _client([429, 503, 200])
+
+    async def get():
+        r = await client.get("http://yahoo.test/quote")
+        r.raise_for_status()
+        return r.status_code
+
+    assert asyncio.run(governor.call_async(get)) == 200
+    assert len(calls) == 3
+    stats = governor.stats()
+    assert stats["calls"]["retries"] == 2
+    assert stats["concurrency"]["throttled"] == 2 and stats["concurrency"]["in_flight"] == 0
+
+
+def test_call_async_does_not_retry_other_errors(tmp_path):
+    governor = _governor(tmp_path, retries=3)
+    client, calls = _client([404])
+
+    async def get():
+        (await client.get("http://yahoo.test/quote")).raise_for_status()
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(governor.call_async(get))
+    assert len(calls) == 1
+    assert governor.stats()["concurrency"]["error"] == 1
+
+
+def test_call_gives_up_after_the_retries(tmp_path):
+    governor = _governor(tmp_path, retries=2)
+    attempts = []
+
+    def fail():
+        attempts.append(1)
+        raise RuntimeError("Too Many Requests. Rate limited")
+
+    with pytest.raises(RuntimeError):
+        governor.call(fail)
+    assert len(attempts) == 3
+    assert governor.stats()["calls"]["gave_up"] == 1
+
+
+def test_priority_comes_from_the_context(tmp_path):
+    governor = _governor(tmp_path)
+
+    def background():
+        fetch_priority.set(BACKGROUND)
+        return governor.call(lambda: "ok")
+
+    assert governor.call(lambda: "ok") == "ok"
+    assert asyncio.run(asyncio.to_thread(background)) == "ok"
+    calls = governor.stats()["calls"]
+    assert calls["interactive"] == 1 and calls["background"] == 1
+    assert governor.beacon.active()
@@ -0,0 +1,79 @@
+# Archivo: backend/tests/test_job_queue.py
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.job_queue import ScanJobQueue
+
+
+def _config(**kw):
+    return SimpleNamespace(**{"sector": "All", "num_tickers": 10, "max_dte": 45, "lookback": 20, **kw})
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return ScanJobQueue(path=str(tmp_path / "scans.db"), lease=60)
+
+
+def test_start_deduplicates_and_claim_hands_out_each_job_once(queue):
+    job_id, new = queue.start(_config())
+    assert new and queue.start(_config()) == (job_id, False)
+    assert queue.counts() == {"pending": 1}
+    assert queue.claim("w1") == (job_id, {"sector": "All", "num_tickers": 10, "max_dte": 45, "lookback": 20})
+    assert queue.claim("w2") is None
+    assert queue.counts() == {"running": 1}
+
+
+def test_expired_lease_fails_the_job(queue):
+    job_id, _ = queue.start(_config())
+    queue.claim("w1")
+    queue.lease = -1  # cualquier latido está ya caducado
+    assert queue.claim("w2") is None
+    status = queue.status(job_id)
+    assert status["status"] == "failed" and "perdido" in status["error"]
+
+
+def test_cancel_is_seen_by_the_worker_and_final(queue):
+    job_id, _ = queue.start(_config())
+    queue.claim("w1")
+    assert not queue.cancelled(job_id)
+    assert queue.cancel(job_id) is True
+    assert queue.cancelled(job_id)
+    assert queue.cancel(job_id) is False
+    # Lo que publique después el worker ya no cambia el estado
+    queue.publish(job_id, "done", {"status": "completed"})
+    assert queue.status(job_id)["status"] == "cancelled"
+    assert queue.cancel("nope") is None
+
+
+def test_batched_reporter_writes_in_order_on_flush(queue):
+    job_id, _ = queue.start(_config())
+    queue.claim("w1")
+    reporter = queue.reporter(job_id)
+    for i in range(3):
+        reporter.result({"Ticker": f"T{i}", "score": float(i)})
+        reporter.progress(30 * (i + 1))
+    assert queue.status(job_id)["total"] == 0
+    asyncio.run(reporter.flush())
+    reporter.done()
+    asyncio.run(reporter.flush())
+    status = queue.status(job_id, offset=1, limit=5)
+    assert status["status"] == "completed" and status["total"] == 3
+    assert [r["Ticker"] for r in status["data"]] == ["T1", "T2"]
+    assert [r["event"] for r in queue.events(job_id)] == ["result", "progress"] * 3 + ["done"]
+
+
+def test_sse_resumes_after_last_event_id(queue):
+    job_id, _ = queue.start(_config())
+    queue.claim("w1")
+    for i in range(3): queue.publish(job_id, "result", {"Ticker": f"T{i}"})
+    queue.publish(job_id, "done", {"status": "completed"})
+
+    async def read(last_id):
+        return [chunk async for chunk in queue.subscribe(job_id, last_id, poll=0.01)]
+    frames = asyncio.run(read(2))
+    assert [f.split("\n")[0] for f in frames] == ["id: 3", "id: 4"]
+    assert json.loads(frames[-1].split("data: ")[1]) == {"status": "completed", "count": 3}
+    assert queue.subscribe("nope") is None
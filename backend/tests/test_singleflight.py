@@ -0,0 +1,99 @@
+# Archivo: backend/tests/test_singleflight.py
+import asyncio
+import threading
+
+import pytest
+
+from app.services.singleflight import LeaderCancelled, SingleFlight
+
+
+def test_do_shares_one_execution_between_threads():
+    flight, started, release = SingleFlight(), threading.Event(), threading.Event()
+    calls, results = [], []
+
+    def fetch():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 42
+
+    leader = threading.Thread(target=lambda: results.append(flight.do("k", fetch)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flight.do("k", fetch))) for _ in range(3)]
+    for t in followers: t.start()
+    while flight.stats()["shared"] < 3: pass
+    release.set()
+    for t in [leader, *followers]: t.join(5)
+    assert results == [42] * 4 and len(calls) == 1
+    assert flight.stats() == {"calls": 4, "executed": 1, "shared": 3, "in_flight": 0}
+
+
+def test_error_reaches_every_caller():
+    async def main():
+        flight = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError("upstream")
+
+        out = await asyncio.gather(*(flight.do_async("k", fail) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(e, ValueError) for e in out)
+        assert flight.stats()["executed"] == 1
+    asyncio.run(main())
+
+
+def test_cancelled_follower_does_not_affect_the_others():
+    async def main():
+        flight, release = SingleFlight(), asyncio.Event()
+
+        async def fetch():
+            await release.wait()
+            return "ok"
+
+        leader = asyncio.create_task(flight.do_async("k", fetch))
+        await asyncio.sleep(0)
+        followers = [asyncio.create_task(flight.do_async("k", fetch)) for _ in range(3)]
+        await asyncio.sleep(0)
+        followers[0].cancel()
+        await asyncio.sleep(0)
+        release.set()
+        assert await leader == "ok"
+        assert await asyncio.gather(*followers[1:]) == ["ok", "ok"]
+        with pytest.raises(asyncio.CancelledError): await followers[0]
+        assert flight.stats()["in_flight"] == 0
+    asyncio.run(main())
+
+
+def test_cancelled_leader_hands_over_to_a_follower():
+    async def main():
+        flight, calls = SingleFlight(), []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.05 if len(calls) == 1 else 0)
+            return len(calls)
+
+        leader = asyncio.create_task(flight.do_async("k", fetch))
+        await asyncio.sleep(0)
+        followers = [asyncio.create_task(flight.do_async("k", fetch)) for _ in range(2)]
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError): await leader
+        # Sin CancelledError para los seguidores: uno reintenta como líder y el otro lo comparte
+        assert await asyncio.gather(*followers) == [2, 2]
+        assert len(calls) == 2
+    asyncio.run(main())
+
+
+def test_thread_follower_of_a_cancelled_leader_retries():
+    flight = SingleFlight()
+    fut, leader = flight._join("k")
+    assert leader
+    result = []
+    t = threading.Thread(target=lambda: result.append(flight.do("k", lambda: "retry")))
+    t.start()
+    while flight.stats()["shared"] < 1: pass
+    flight._finish("k", fut, error=LeaderCancelled("k"))
+    t.join(5)
+    assert result == ["retry"]
@@ -0,0 +1,126 @@
+# Archivo: backend/tests/test_stores.py
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.services.chain_engine import normalize_contracts
+from app.services.contract_store import ContractStore
+from app.services.history_store import HistoryStore
+
+
+def _bars(start, n, base=100.0):
+    idx = pd.bdate_range(start, periods=n)
+    close = base + np.arange(n, dtype=float)
+    return pd.DataFrame({"Open": close - 1, "High": close + 1, "Low": close - 2, "Close": close,
+                         "Volume": np.full(n, 1000.0)}, index=idx)
+
+
+def test_history_round_trip_and_append(tmp_path):
+    store = HistoryStore(str(tmp_path))
+    first = _bars("2025-01-01", 300)
+    store.upsert("spy", first)
+    assert store.rows("SPY") == 300
+    pd.testing.assert_frame_equal(store.read("SPY"), first, check_freq=False, check_names=False, check_index_type=False)
+
+    # Append puro y solape con la última vela (se reescribe)
+    store.upsert("SPY", _bars(first.index[-1], 5, base=500.0))
+    out = store.read("SPY")
+    assert len(out) == 304
+    assert out["Close"].iloc[299] == 500.0 and out.index.is_monotonic_increasing
+    assert store.last_date("SPY") == np.datetime64(out.index[-1].date(), "D")
+
+
+def test_history_period_slice(tmp_path):
+    store = HistoryStore(str(tmp_path))
+    store.upsert("QQQ", _bars("2024-01-01", 600))
+    out = store.read("QQQ", "6mo")
+    assert out.index[0] >= out.index[-1] - pd.DateOffset(months=6)
+    assert out.index[0] - pd.Timedelta(days=5) < out.index[-1] - pd.DateOffset(months=6)
+    assert store.read("NOPE").empty
+
+
+def test_history_sync_state(tmp_path):
+    store = HistoryStore(str(tmp_path))
+    assert store.needs_sync("IWM") and store.sync_start("IWM") is None
+    store.upsert("IWM", _bars("2025-01-01", 10))
+    assert not store.needs_sync("IWM")
+    assert store.needs_sync("IWM", now=time.time() + 7 * 86400)
+    store.touch("IWM")
+    assert not store.needs_sync("IWM")
+    assert store.sync_start("IWM") is not None
+
+
+def test_history_close_only_entries(tmp_path):
+    store = HistoryStore(str(tmp_path))
+    store.upsert("DIA", _bars("2025-01-01", 60)[["Close"]], replace=True, close_only="3mo")
+    assert store.close_only("DIA")
+    assert not store.needs_sync("DIA", closes="3mo")
+    # Para quien pide OHLCV (o cierres de otro period) no cuenta como guardado
+    assert store.needs_sync("DIA") and store.needs_sync("DIA", closes="1y")
+    assert store.sync_start("DIA") is None
+    assert store.read("DIA")["Open"].isna().all()
+
+    store.upsert("DIA", _bars("2025-01-01", 60), replace=True)
+    assert not store.close_only("DIA") and not store.needs_sync("DIA")
+
+
+def _chain(n, expiries=("2026-01-16", "2026-02-20"), seed=0):
+    rng = np.random.default_rng(seed)
+    half = n // 2
+    return normalize_contracts([pd.DataFrame({
+        "strike": rng.uniform(50, 150, half).round(1), "lastPrice": rng.uniform(0, 10, half),
+        "bid": rng.uniform(0, 10, half), "ask": rng.uniform(0, 10, half),
+        "volume": rng.integers(0, 1000, half), "openInterest": rng.integers(0, 5000, half),
+        "impliedVolatility": rng.uniform(0.1, 0.8, half), "daysToEx": np.full(half, 10 * i),
+        "type": "call" if i % 2 == 0 else "put", "expirationDate": exp,
+    }) for i, exp in enumerate(expiries)])
+
+
+def test_contract_store_round_trip(tmp_path):
+    store = ContractStore(str(tmp_path), max_rows=10_000)
+    df = _chain(200)
+    assert store.accepts(df) and not store.accepts(pd.DataFrame({"x": [1]}))
+    now = time.time()
+    view = store.put(("SPY", 30), df, now + 60, now + 600)
+    pd.testing.assert_frame_equal(view, df, check_categorical=False)
+    got, expires_at = store.get(("SPY", 30))
+    assert expires_at == now + 60
+    assert dict(got.dtypes.astype(str)) == dict(df.dtypes.astype(str))
+    assert list(got["type"].cat.categories) == ["call", "put"]
+    assert sorted(got["expirationDate"].cat.categories) == ["2026-01-16", "2026-02-20"]
+    pd.testing.assert_frame_equal(got, df, check_categorical=False)
+
+    # Otra instancia (otro proceso) ve la entrada por el índice en disco
+    again, _ = ContractStore(str(tmp_path)).get(("SPY", 30))
+    pd.testing.assert_frame_equal(again, df, check_categorical=False)
+    assert store.get(("QQQ", 30)) is None
+
+
+def test_contract_store_expiry_and_empty(tmp_path):
+    store = ContractStore(str(tmp_path), max_rows=10_000)
+    now = time.time()
+    store.put("stale", _chain(20), now - 10, now - 1)
+    assert store.get("stale") is None
+    store.put("empty", _chain(0), now + 60, now + 600)
+    got, _ = store.get("empty")
+    assert got.empty and set(got.columns) == set(_chain(0).columns)
+
+
+def test_contract_store_compaction_keeps_live_entries(tmp_path):
+    store = ContractStore(str(tmp_path), max_rows=500)
+    now = time.time()
+    live = _chain(200, seed=1)
+    store.put("live", live, now + 60, now + 600)
+    store.put("dead", _chain(200, seed=2), now + 60, now + 0.2)
+    time.sleep(0.3)
+    before = store.stats()
+    fresh = _chain(200, seed=3)
+    store.put("fresh", fresh, now + 60, now + 600)
+    after = store.stats()
+    assert after["generation"] == before["generation"] + 1
+    assert after["entries"] == 2 and after["rows"] == 400 == after["live_rows"]
+    assert not (tmp_path / f"arena-{before['generation']}").exists()
+    pd.testing.assert_frame_equal(store.get("live")[0], live, check_categorical=False)
+    pd.testing.assert_frame_equal(store.get("fresh")[0], fresh, check_categorical=False)
+    assert store.get("dead") is None
@@ -1,6 +1,7 @@
-import React, { useMemo } from 'react';
+import React, { useEffect, useMemo, useState } from 'react';
 import Plot from 'react-plotly.js';
-import { Activity, ArrowUpCircle, ArrowDownCircle, Zap, Layers, BarChart3 } from 'lucide-react';
+import { Activity, ArrowUpCircle, ArrowDownCircle, Zap, Layers, BarChart3, SlidersHorizontal } from 'lucide-react';
+import { getScenarios } from '../services/api';
 
 // --- UTILIDAD: CALCULAR MEDIAS MÓVILES (SMA) ---
 // Calculamos esto en el navegador para no sobrecargar el backend
@@ -19,6 +20,84 @@ const calculateSMA = (data, period) => {
   return sma;
 };
 
+// --- ESCENARIOS WHAT-IF (NetGEX/NetDEX al mover spot, IV y tiempo) ---
+// Cada posición de los sliders pide un solo escenario al backend (arrays de la cadena ya en memoria)
+const ScenarioPanel = ({ ticker }) => {
+  const [ivShift, setIvShift] = useState(0); // puntos de volatilidad
+  const [days, setDays] = useState(0);
+  const [scenario, setScenario] = useState(null);
+
+  useEffect(() => {
+    let cancelled = false;
+    // Pequeño debounce: mientras se arrastra el slider sólo sale la última petición
+    const timer = setTimeout(async () => {
+      try {
+        const res = await getScenarios(ticker, { ivShift: ivShift / 100, days });
+        if (!cancelled) setScenario(res);
+      } catch (error) {
+        console.error("Error fetching scenarios:", error);
+      }
+    }, 120);
+    return () => { cancelled = true; clearTimeout(timer); };
+  }, [ticker, ivShift, days]);
+
+  const gex = scenario ? scenario.net_gex[0][0] : [];
+  const dex = scenario ? scenario.net_dex[0][0] : [];
+  const flip = scenario ? scenario.gamma_flip[0][0] : null;
+
+  return (
+    <div className="bg-[#131722] rounded-2xl border border-white/5 shadow-lg overflow-hidden">
+      <div className="p-4 border-b border-white/5 bg-white/[0.02] flex flex-wrap gap-6 items-center justify-between">
+        <h3 className="text-sm font-bold text-gray-400 flex items-center gap-2">
+          <SlidersHorizontal className="w-4 h-4"/> ESCENARIOS (SPOT × IV × TIEMPO)
+        </h3>
+        <div className="flex gap-6 text-xs text-gray-400 font-bold uppercase">
+          <label className="flex items-center gap-2">
+            IV {ivShift >= 0 ? '+' : ''}{ivShift} pts
+            <input type="range" min={-15} max={15} step={1} value={ivShift}
+                   onChange={e => setIvShift(Number(e.target.value))} />
+          </label>
+          <label className="flex items-center gap-2">
+            +{days} días
+            <input type="range" min={0} max={30} step={1} value={days}
+                   onChange={e => setDays(Number(e.target.value))} />
+          </label>
+          <span className="text-purple-400 font-mono">Flip: {flip ? `$${flip.toFixed(2)}` : '—'}</span>
+        </div>
+      </div>
+      {scenario && (
+        <Plot
+          data={[
+            { x: scenario.spots, y: gex, type: 'scatter', mode: 'lines', name: 'Net GEX',
+              line: { color: '#00D4AA', width: 2 } },
+            { x: scenario.spots, y: dex, type: 'scatter', mode: 'lines', name: 'Net DEX',
+              line: { color: '#facc15', width: 1.5, dash: 'dot' }, yaxis: 'y2' },
+          ]}
+          layout={{
+            autosize: true, height: 320,
+            paper_bgcolor: '#131722', plot_bgcolor: '#131722',
+            font: { family: 'Inter, sans-serif', color: '#64748b' },
+            margin: { l: 60, r: 60, t: 20, b: 40 },
+            legend: { orientation: 'h', y: 1.1 },
+            xaxis: { gridcolor: '#1e293b', tickprefix: '$' },
+            yaxis: { gridcolor: '#1e293b', zeroline: true, zerolinecolor: '#475569', title: { text: 'NET GEX' } },
+            yaxis2: { overlaying: 'y', side: 'right', showgrid: false, title: { text: 'NET DEX' } },
+            shapes: [
+              { type: 'line', yref: 'paper', y0: 0, y1: 1, x0: scenario.spot, x1: scenario.spot,
+                line: { color: 'white', width: 1, dash: 'dot' }, opacity: 0.5 },
+              ...(flip ? [{ type: 'line', yref: 'paper', y0: 0, y1: 1, x0: flip, x1: flip,
+                            line: { color: '#a855f7', width: 1, dash: 'dash' }, opacity: 0.6 }] : []),
+            ],
+          }}
+          useResizeHandler={true}
+          style={{ width: "100%" }}
+          config={{ displayModeBar: false }}
+        />
+      )}
+    </div>
+  );
+};
+
 const AssetDashboard = ({ data }) => {
   if (!data) return null;
 
@@ -272,8 +351,13 @@ const AssetDashboard = ({ data }) => {
             }}
           />
       </div>
+
+      {/* 3. ESCENARIOS WHAT-IF (ANCHO COMPLETO) */}
+      <div className="lg:col-span-4">
+        <ScenarioPanel ticker={data.ticker} />
+      </div>
     </div>
   );
 };
 
-export default AssetDashboard;
\ No newline at end of file
+export default AssetDashboard;
\ No newline at end of file
@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
-import { startScanner, getScannerStatus } from '../services/api';
-import { Play, Loader2, TrendingUp, ArrowRight, Filter, Calendar, BarChart3, Star, ArrowUp, ArrowDown } from 'lucide-react';
+import { startScanner, getScannerStreamUrl, cancelScanner } from '../services/api';
+import { Play, Square, Loader2, TrendingUp, ArrowRight, Filter, Calendar, BarChart3, Star, ArrowUp, ArrowDown } from 'lucide-react';
 
 const SECTORS = [
   "Todos", "Communication Services", "Consumer Discretionary", "Consumer Staples",
@@ -36,28 +36,56 @@ const Screener = ({ onSelectTicker, onScanComplete, initialResults, watchlist, o
     }
   };
 
+  const handleStop = () => {
+    if (taskId) cancelScanner(taskId).catch(console.error);
+  };
+
+  // Resultados en vivo por SSE: cada fila llega en cuanto el backend la calcula
   useEffect(() => {
-    let interval;
-    if (taskId) {
-      interval = setInterval(async () => {
-        const statusData = await getScannerStatus(taskId);
-        if (statusData) {
-          setProgress((prev) => Math.max(prev, statusData.progress || 0));
-          if (statusData.status === 'completed') {
-            setResults(statusData.data);
-            if (onScanComplete) onScanComplete(statusData.data);
-            setLoading(false);
-            setTaskId(null);
-            setProgress(100);
-          } else if (statusData.status === 'failed') {
-            setLoading(false);
-            setTaskId(null);
-            alert("Error: " + statusData.error);
-          }
-        }
-      }, 1500);
-    }
-    return () => clearInterval(interval);
+    if (!taskId) return;
+    const rows = [];
+    let finished = false;
+    const source = new EventSource(getScannerStreamUrl(taskId));
+    // Si el usuario se va (cierra la pestaña o cambia de vista) el escaneo deja de consumir upstream
+    const abandon = () => { if (!finished) cancelScanner(taskId, true); };
+    window.addEventListener('pagehide', abandon);
+
+    source.addEventListener('result', (e) => {
+      const row = JSON.parse(e.data);
+      rows.push(row);
+      setResults((prev) => [...prev, row]);
+    });
+    source.addEventListener('progress', (e) => {
+      const { progress: p } = JSON.parse(e.data);
+      setProgress((prev) => Math.max(prev, p || 0));
+    });
+    source.addEventListener('done', () => {
+      finished = true;
+      source.close();
+      if (onScanComplete) onScanComplete(rows);
+      setLoading(false);
+      setTaskId(null);
+      setProgress(100);
+    });
+    source.addEventListener('failed', (e) => {
+      finished = true;
+      source.close();
+      setLoading(false);
+      setTaskId(null);
+      alert("Error: " + JSON.parse(e.data).error);
+    });
+    source.addEventListener('cancelled', () => {
+      finished = true;
+      source.close();
+      setLoading(false);
+      setTaskId(null);
+    });
+
+    return () => {
+      window.removeEventListener('pagehide', abandon);
+      source.close();
+      abandon();
+    };
   }, [taskId]);
 
   const handleSort = (key) => {
@@ -126,7 +154,9 @@ const Screener = ({ onSelectTicker, onScanComplete, initialResults, watchlist, o
                   </button>
                 ) : (
                   <div className="w-full bg-[#0b0e14] border border-primary/30 rounded-xl p-3 flex flex-col items-center justify-center gap-1 relative overflow-hidden">
-                    <div className="flex items-center gap-2 text-primary text-xs font-bold z-10"><Loader2 className="w-4 h-4 animate-spin" /> {progress}%</div>
+                    <div className="flex items-center gap-2 text-primary text-xs font-bold z-10"><Loader2 className="w-4 h-4 animate-spin" /> {progress}%
+                      <button onClick={handleStop} title="Detener" className="ml-2 text-gray-400 hover:text-white"><Square className="w-3.5 h-3.5" /></button>
+                    </div>
                     <div className="absolute bottom-0 left-0 h-1 bg-primary transition-all duration-300" style={{width: `${progress}%`}}></div>
                   </div>
                 )}
@@ -189,4 +219,4 @@ const Screener = ({ onSelectTicker, onScanComplete, initialResults, watchlist, o
   );
 };
 
-export default Screener;
\ No newline at end of file
+export default Screener;
\ No newline at end of file
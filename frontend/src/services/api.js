@@ -23,4 +23,24 @@ export const startScanner = async (config) => {
 export const getScannerStatus = async (taskId) => {
   const response = await axios.get(`${API_URL}/scanner/status/${taskId}`);
   return response.data;
-};
\ No newline at end of file
+};
+
+// Stream SSE del escaneo: eventos 'result' (fila a fila), 'progress', 'done', 'failed' y 'cancelled'
+export const getScannerStreamUrl = (taskId) => `${API_URL}/scanner/stream/${taskId}`;
+
+// Detiene el escaneo. Con beacon=true usa navigator.sendBeacon (sobrevive al cierre de la página)
+export const cancelScanner = async (taskId, beacon = false) => {
+  const url = `${API_URL}/scanner/cancel/${taskId}`;
+  if (beacon && navigator.sendBeacon) return navigator.sendBeacon(url);
+  const response = await axios.post(url);
+  return response.data;
+};
+
+// Malla what-if de NetGEX/NetDEX (spot x desplazamiento de IV x días). Un solo escenario
+// (ivShift y days escalares) responde en decenas de ms: pensado para moverlo con sliders
+export const getScenarios = async (ticker, { ivShift = 0, days = 0, spotRange = 0.1, spotSteps = 41 } = {}) => {
+  const response = await axios.get(`${API_URL}/asset/${ticker}/scenarios`, {
+    params: { iv_shifts: ivShift, days, spot_range: spotRange, spot_steps: spotSteps },
+  });
+  return response.data;
+};